@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Custom 的传输后端
+
+    DdsBackend  真机：MotionSwitcherClient 释放模式 + rt/lowcmd / rt/lowstate DDS 通道
+    SimBackend  本地仿真：29 个 PD 驱动的独立关节，不需要机器人和 DDS 网络
+
+后端接口：
+    Init(custom)                  建立发布/订阅，设置 custom.pub，LowState 回调到 custom.LowStateHandler
+    CreateLoop(interval, target, **sched)
+                                  返回带 Start() 的周期线程，每 interval 秒调用一次 target；
+                                  sched 透传给 scheduler.DeadlineLoop（超时策略、SCHED_FIFO、绑核）
+SimBackend 另有 clock()（仿真时间，供插值计时）和 run(target, seconds)：不睡眠地连续推进，
+比实时快得多，用于压测和回归。
+
+DDS 通道和 MotionSwitcherClient 只在 DdsBackend.Init 里导入；SimBackend 仍用 SDK 的 LowState 消息类型和 CRC，
+所以需要装好 unitree_sdk2py（连同它依赖的 cyclonedds Python 包），但不需要机器人、网卡或 DDS 网络。
+"""
+
+import time, operator
+import numpy as np
+
+# ---------- Unitree SDK‑2（仅消息类型与 CRC） ----------
+from unitree_sdk2py.idl.default import unitree_hg_msg_dds__LowState_
+from unitree_sdk2py.utils.crc import CRC
+# -----------------------------------
+from scheduler import DeadlineLoop
+
+G1_NUM_MOTOR = 29
+
+
+# ---------------- 真机 ----------------
+class DdsBackend:
+    def Init(self, custom):
+        from unitree_sdk2py.core.channel import ChannelPublisher, ChannelSubscriber
+        from unitree_sdk2py.idl.unitree_hg.msg.dds_ import LowCmd_, LowState_
+        from unitree_sdk2py.comm.motion_switcher.motion_switcher_client import MotionSwitcherClient
+
+        # 添加 MotionSwitcherClient 初始化
+        self.msc = MotionSwitcherClient()
+        self.msc.SetTimeout(5.0)
+        self.msc.Init()
+
+        # 检查并释放当前模式
+        status, result = self.msc.CheckMode()
+        while result['name']:
+            self.msc.ReleaseMode()
+            status, result = self.msc.CheckMode()
+            time.sleep(1)
+
+        # 创建发布者和订阅者
+        self.pub = ChannelPublisher("rt/lowcmd", LowCmd_)
+        self.pub.Init()
+        self.sub = ChannelSubscriber("rt/lowstate", LowState_)
+        self.sub.Init(custom.LowStateHandler, 10)
+        custom.pub = self.pub
+
+    def CreateLoop(self, interval, target, **sched):
+        return DeadlineLoop(interval, target, name="control", **sched)
+
+
+# ---------------- 仿真 ----------------
+# 每个关节等效为转动惯量 + 粘滞阻尼，力矩按 G1 电机量级限幅
+_INERTIA = np.array(
+    [0.06, 0.06, 0.04, 0.08, 0.02, 0.02] * 2 +   # legs
+    [0.05, 0.04, 0.04] +                          # waist
+    [0.02, 0.02, 0.015, 0.015, 0.005, 0.005, 0.005] * 2,  # arms
+    dtype=np.float64)
+_TAU_LIMIT = np.array(
+    [88, 88, 88, 139, 50, 50] * 2 +
+    [88, 50, 50] +
+    [25, 25, 25, 25, 25, 5, 5] * 2,
+    dtype=np.float64)
+_DAMPING = 0.05
+
+
+class SimBackend:
+    """
+    同时充当发布者（custom.pub.Write 收下 LowCmd）和 LowState 来源。
+
+    每个控制拍：Write 记下 q/dq/tau/kp/kd → step() 按 PD 律积分 → publish_state()
+    把合成的 LowState 交给 LowStateHandler。check_crc=True 时逐拍核对 LowCmd.crc。
+    """
+
+    def __init__(self, dt=0.002, substeps=4, initial_q=None, mode_machine=0, check_crc=True):
+        self.dt = dt
+        self.substeps = substeps
+        n = G1_NUM_MOTOR
+        self.q = np.zeros(n) if initial_q is None else np.asarray(initial_q, dtype=np.float64).copy()
+        self.dq = np.zeros(n)
+        self.tau = np.zeros(n)
+        self.q_des, self.dq_des, self.tau_ff = np.zeros(n), np.zeros(n), np.zeros(n)
+        self.kp, self.kd = np.zeros(n), np.zeros(n)
+        self.enabled = np.zeros(n, dtype=bool)
+
+        self.low_state = unitree_hg_msg_dds__LowState_()
+        self.low_state.mode_machine = mode_machine
+        self._motor_states = [self.low_state.motor_state[i] for i in range(n)]
+        self._get_cmd = operator.attrgetter("mode", "q", "dq", "tau", "kp", "kd")
+
+        self.crc = CRC() if check_crc else None
+        self.crc_errors = 0
+        self.commands = 0
+        self.tick = 0
+        self.handler = None
+
+    # ---------- 后端接口 ----------
+    def Init(self, custom):
+        self.handler = custom.LowStateHandler
+        custom.pub = self
+        self.publish_state()  # 先给一帧，Custom 才能记录初始姿态和 mode_machine
+
+    def CreateLoop(self, interval, target, **sched):
+        # 按墙钟节拍实时运行：每拍先跑控制，再推进物理并回传 LowState
+        def tick():
+            target()
+            self.step()
+            self.publish_state()
+        return DeadlineLoop(interval, tick, name="control", **sched)
+
+    def clock(self):
+        return self.tick * self.dt
+
+    # ---------- 发布者接口 ----------
+    def Write(self, cmd):
+        if self.crc is not None and cmd.crc != self.crc.Crc(cmd):
+            self.crc_errors += 1
+        fields = np.array(list(map(self._get_cmd, cmd.motor_cmd[:G1_NUM_MOTOR])), dtype=np.float64)
+        self.enabled[:] = fields[:, 0] != 0
+        self.q_des[:], self.dq_des[:], self.tau_ff[:] = fields[:, 1], fields[:, 2], fields[:, 3]
+        self.kp[:], self.kd[:] = fields[:, 4], fields[:, 5]
+        self.commands += 1
+        return True
+
+    # ---------- 物理 ----------
+    def step(self):
+        h = self.dt / self.substeps
+        for _ in range(self.substeps):
+            tau = self.kp * (self.q_des - self.q) + self.kd * (self.dq_des - self.dq) + self.tau_ff
+            tau = np.where(self.enabled, np.clip(tau, -_TAU_LIMIT, _TAU_LIMIT), 0.0)
+            self.dq += h * (tau - _DAMPING * self.dq) / _INERTIA   # 半隐式欧拉
+            self.q += h * self.dq
+        self.tau = tau
+        self.tick += 1
+
+    def publish_state(self):
+        for ms, q, dq, tau in zip(self._motor_states, self.q.tolist(), self.dq.tolist(), self.tau.tolist()):
+            ms.q, ms.dq, ms.tau_est = q, dq, tau
+        self.low_state.tick = int(self.tick * self.dt * 1000) & 0xFFFFFFFF  # ms
+        self.handler(self.low_state)
+
+    def run(self, target, seconds):
+        """不睡眠地推进 seconds 仿真秒，返回实际耗时（秒）"""
+        n = int(round(seconds / self.dt))
+        t0 = time.perf_counter()
+        for _ in range(n):
+            target()
+            self.step()
+            self.publish_state()
+        return time.perf_counter() - t0
+
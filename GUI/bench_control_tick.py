@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测量 Custom.LowCmdWrite 单拍耗时（不连机器人）
+
+    python3 bench_control_tick.py [拍数]
+
+发布者换成空实现，只统计 Python 侧的命令填写 + CRC 开销。
+同时跑一遍改动前的逐电机循环写法（_legacy_tick），方便前后对比。
+"""
+
+import sys, time
+import numpy as np
+from unitree_sdk2py.utils.crc import CRC
+
+from robot_control import Custom, G1_NUM_MOTOR, Kp, Kd, Mode
+
+_CRC = CRC()   # 改动前每拍用 SDK 的 CRC 整包重算；Custom 现在用 LowCmdEncoder
+
+
+class _NullPublisher:
+    def Write(self, msg):
+        pass
+
+
+def _legacy_tick(self):
+    # 改动前的 LowCmdWrite：每拍重写全部静态字段，逐元素计算 q
+    self._update_ui_pose(time.perf_counter())
+    self.time_ += self.control_dt_
+    for i in range(G1_NUM_MOTOR):
+        self.low_cmd.motor_cmd[i].mode = 1
+        self.low_cmd.motor_cmd[i].tau = 0.0
+        self.low_cmd.motor_cmd[i].dq = 0.0
+        self.low_cmd.motor_cmd[i].kp = Kp[i]
+        self.low_cmd.motor_cmd[i].kd = Kd[i]
+    if self.time_ < self.duration_:
+        ratio = np.clip(self.time_ / self.duration_, 0.0, 1.0)
+        for i in range(G1_NUM_MOTOR):
+            self.low_cmd.motor_cmd[i].q = (1.0 - ratio) * self.initial_pose[i] + ratio * self.ui_pose[i]
+    else:
+        for i in range(G1_NUM_MOTOR):
+            self.low_cmd.motor_cmd[i].q = self.ui_pose[i]
+    self.low_cmd.mode_pr = Mode.PR
+    self.low_cmd.mode_machine = self.mode_machine_
+    self.low_cmd.crc = _CRC.Crc(self.low_cmd)
+    self.pub.Write(self.low_cmd)
+
+
+def _time_ticks(tick, custom, n):
+    samples = np.empty(n, dtype=np.int64)
+    for k in range(n):
+        if k % 2000 == 0:
+            custom.time_ = 0.0      # 交替覆盖插值段与保持段（_legacy_tick 按拍累加）
+            custom._seg_t0 = None   # LowCmdWrite 按时钟计时，从本拍重新开始
+        t0 = time.perf_counter_ns()
+        tick()
+        samples[k] = time.perf_counter_ns() - t0
+    return samples / 1000.0  # us
+
+
+def _make_custom():
+    custom = Custom()
+    custom.pub = _NullPublisher()
+    custom.initial_pose[:] = np.random.uniform(-0.5, 0.5, G1_NUM_MOTOR)
+    custom.ui_pose[:] = np.random.uniform(-0.5, 0.5, G1_NUM_MOTOR)
+    return custom
+
+
+def main(n=10000):
+    for label, make_tick in (
+        ("before", lambda c: (lambda: _legacy_tick(c))),
+        ("after ", lambda c: c.LowCmdWrite),
+    ):
+        custom = _make_custom()
+        us = _time_ticks(make_tick(custom), custom, n)
+        print(f"{label}: mean {us.mean():7.1f} us | p50 {np.percentile(us, 50):7.1f} us | "
+              f"p99 {np.percentile(us, 99):7.1f} us | max {us.max():7.1f} us  ({n} ticks)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准：控制循环 2 ms 路径 + GUI 拖拽/加载路径
+
+    python3 bench_suite.py                          # 全部跑一遍，打印表格
+    python3 bench_suite.py --json base.json         # 另存报告
+    python3 bench_suite.py --compare base.json      # 与旧报告对比，退化超过阈值时返回 1
+    python3 bench_suite.py --only interp,fk         # 只跑名字包含这些子串的项
+
+测量项：
+    control_tick       Custom.LowCmdWrite（空发布者，插值段/保持段交替），需要 unitree_sdk2py
+    state_push         StateRingBuffer.push：DDS 回调里每帧 LowState 写一行（q/dq/tau/IMU）
+    record_cmd_push    CommandRingBuffer.push：开遥测录制时控制线程每拍多做的事
+    interp_*           单姿态过渡：sinusoidal / linear 混合，按批量姿态计算
+    fk_update_joints   MyGLViewWidget.update_joints，每次事件换一组随机整姿态（全部关节都变）
+    fk_drag_*          MyGLViewWidget.update_joints，每次事件只拖动一个关节（增量 FK 的典型场景）
+    fk_yourdfpy        对照：yourdfpy update_cfg + 每个 link 的 get_transform
+    pick_ray           picking.Picker.pick，射向随机 link 附近的射线（约一半命中），包围体已构建
+    urdf_load          URDF.load（与 RobotViewer 相同参数，不让 yourdfpy 解析网格）
+    mesh_load          mesh_loader.load_link_meshes（不带缓存，逐个解析 STL 并合并）
+    mesh_lod_build     mesh_loader.build_lods，全部 link 生成各级简化网格
+    mesh_cache_cold    MeshCache.load(lods=True)，每次先清空缓存（线程池并行构建 + LOD + 写盘）
+    mesh_cache_warm    MeshCache.load(lods=True)，缓存全部命中（内存映射，不解析 STL）
+
+每项给出 p50/p99/mean/max（us），以及单独一轮 tracemalloc 统计的 Python/numpy 分配峰值。
+依赖缺失的项记为 skipped 并写明原因，不影响其它项。
+仓库里没有 meshes/ 目录时，按 URDF 里的文件名生成同名的替身 STL（icosphere），报告里会注明。
+"""
+
+import os, sys, json, time, types, platform, argparse, tempfile, tracemalloc, subprocess
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+URDF_PATH = os.path.join(HERE, "g1_29dof.urdf")
+
+
+class Skip(Exception):
+    pass
+
+
+# ---------------- 计时工具 ----------------
+def _time_calls(fn, n, warmup=0):
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(n, dtype=np.int64)
+    for k in range(n):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples[k] = time.perf_counter_ns() - t0
+    return samples / 1000.0  # us
+
+
+def _peak_kb(fn, reps):
+    """单独跑 reps 次，统计 tracemalloc 分配峰值（计时轮不开 tracemalloc，避免拖慢）"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(reps):
+        fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - base) / 1024.0
+
+
+def _stats(us, peak_kb, **extra):
+    out = {
+        "n": int(us.size),
+        "p50_us": float(np.percentile(us, 50)),
+        "p99_us": float(np.percentile(us, 99)),
+        "mean_us": float(us.mean()),
+        "max_us": float(us.max()),
+        "peak_kb": float(peak_kb),
+    }
+    out.update(extra)
+    return out
+
+
+# ---------------- 控制循环 ----------------
+def bench_control_tick(n):
+    try:
+        from bench_control_tick import _make_custom, _time_ticks
+    except ImportError as e:
+        raise Skip(f"robot_control 无法导入（{e}）")
+    custom = _make_custom()
+    us = _time_ticks(custom.LowCmdWrite, custom, n)
+    custom = _make_custom()
+    return _stats(us, _peak_kb(custom.LowCmdWrite, 2000))
+
+
+def bench_state_push(n):
+    from state_buffer import StateRingBuffer
+    from telemetry import _fake_low_state, _set_state
+    state = StateRingBuffer(29, 2500)
+    msg = _fake_low_state()
+    _set_state(msg, 0.3)
+
+    def call():
+        state.push(msg, 0.0)
+    return _stats(_time_calls(call, n, warmup=200), _peak_kb(call, 2000))
+
+
+def bench_record_cmd_push(n):
+    from state_buffer import CommandRingBuffer
+    cmds = CommandRingBuffer(29, 2500)
+    q = np.random.default_rng(0).uniform(-1, 1, 29).astype(np.float32)
+
+    def call():
+        cmds.push(q, 0.0, 0)
+    return _stats(_time_calls(call, n, warmup=200), _peak_kb(call, 2000))
+
+
+def _interp_bench(blend, n, batch):
+    rng = np.random.default_rng(0)
+    q0 = rng.uniform(-1, 1, (batch, 29)).astype(np.float32)
+    q1 = rng.uniform(-1, 1, (batch, 29)).astype(np.float32)
+    ratios = rng.uniform(0, 1, (n, batch, 1)).astype(np.float32)
+    it = iter(range(1 << 62))
+
+    def call():
+        blend(q0, q1, ratios[next(it) % n])
+    us = _time_calls(call, n, warmup=min(n, 200))
+    return _stats(us, _peak_kb(call, 200), batch=batch, per_pose_ns=float(np.percentile(us, 50) * 1e3 / batch))
+
+
+def _linear_blend(q0, q1, r):
+    return q0 + r * (q1 - q0)
+
+
+def bench_interp(kind, n, batch):
+    if kind == "sinusoidal":
+        try:
+            from robot_control import sinusoidal_interpolation as blend
+        except ImportError as e:
+            raise Skip(f"robot_control 无法导入（{e}）")
+    else:
+        blend = _linear_blend
+    return _interp_bench(blend, n, batch)
+
+
+# ---------------- GUI 路径 ----------------
+def _mesh_base_dir(robot_cls):
+    """URDF 引用的网格都在时返回 URDF 所在目录；否则生成替身 STL，返回临时目录"""
+    import trimesh
+    robot = robot_cls.load(URDF_PATH, load_meshes=False, build_scene_graph=False)
+    names = sorted({v.geometry.mesh.filename for link in robot.link_map.values()
+                    for v in link.visuals if v.geometry.mesh})
+    if all(os.path.exists(os.path.join(HERE, f)) for f in names):
+        return HERE, False
+    tmp = tempfile.mkdtemp(prefix="g1_bench_meshes_")
+    sphere = trimesh.creation.icosphere(subdivisions=4, radius=0.03)  # 5120 面，与 G1 单个 STL 同量级
+    for f in names:
+        path = os.path.join(tmp, f)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        sphere.export(path)
+    return tmp, True
+
+
+def bench_urdf_load(n, base_dir):
+    from yourdfpy import URDF
+    path = os.path.join(base_dir, os.path.basename(URDF_PATH))
+    if not os.path.exists(path):
+        os.symlink(URDF_PATH, path)
+
+    def call():
+        URDF.load(path, mesh_dir=base_dir, load_meshes=False)
+    us = _time_calls(call, n, warmup=1)
+    return _stats(us, _peak_kb(call, 1))
+
+
+def bench_mesh_load(n, base_dir):
+    from yourdfpy import URDF
+    from mesh_loader import load_link_meshes
+    robot = URDF.load(URDF_PATH, load_meshes=False)
+    meshes = load_link_meshes(robot, base_dir)
+    faces = sum(m[1].shape[0] for m in meshes.values())
+
+    def call():
+        load_link_meshes(robot, base_dir)
+    us = _time_calls(call, n, warmup=1)
+    return _stats(us, _peak_kb(call, 1), links=len(meshes), faces=int(faces))
+
+
+def bench_pick_ray(n, base_dir):
+    from yourdfpy import URDF
+    from mesh_loader import load_link_meshes
+    from kinematics import KinematicTree
+    from picking import Picker
+    robot = URDF.load(URDF_PATH, load_meshes=False)
+    picker = Picker(load_link_meshes(robot, base_dir))
+    picker.build_all()
+    kin = KinematicTree(robot)
+    transforms = kin.world[[kin.link_index[name] for name in picker.link_names]]
+    rng = np.random.default_rng(0)
+    d = rng.normal(size=(256, 3))
+    d /= np.linalg.norm(d, axis=1, keepdims=True)
+    origins = transforms[rng.integers(len(transforms), size=256), :3, 3] + rng.normal(scale=0.03, size=(256, 3)) - 2.0 * d
+    hits = sum(picker.pick(o, di, transforms)[0] is not None for o, di in zip(origins, d))
+    it = iter(range(1 << 62))
+
+    def call():
+        k = next(it) % 256
+        picker.pick(origins[k], d[k], transforms)
+    us = _time_calls(call, n, warmup=20)
+    return _stats(us, _peak_kb(call, 50), hit_rate=hits / 256)
+
+
+def bench_mesh_lod_build(n, base_dir):
+    from yourdfpy import URDF
+    from mesh_loader import load_link_meshes, build_lods, LOD_RATIOS
+    meshes = list(load_link_meshes(URDF.load(URDF_PATH, load_meshes=False), base_dir).values())
+    levels = [build_lods(m) for m in meshes]
+    faces = [int(sum(l[level][1].shape[0] for l in levels)) for level in range(len(LOD_RATIOS) + 1)]
+
+    def call():
+        for m in meshes:
+            build_lods(m)
+    us = _time_calls(call, n)
+    return _stats(us, _peak_kb(call, 1), faces_per_level=faces)
+
+
+def bench_mesh_cache(n, base_dir, warm):
+    from yourdfpy import URDF
+    from mesh_loader import MeshCache
+    robot = URDF.load(URDF_PATH, load_meshes=False)
+    cache = MeshCache(tempfile.mkdtemp(prefix="g1_bench_cache_"))
+
+    def call():
+        if not warm:
+            cache.clear()
+        cache.load(robot, base_dir, lods=True)
+    call()
+    us = _time_calls(call, n)
+    peak = _peak_kb(call, 1)
+    hits, misses = cache.hits, cache.misses
+    cache.clear()
+    return _stats(us, peak, hits=hits, misses=misses, workers=cache.workers)
+
+
+class _NullItem:
+    def setTransform(self, transform):
+        pass
+
+
+def _fk_setup():
+    from yourdfpy import URDF
+    robot = URDF.load(URDF_PATH, load_meshes=False)
+    links = [name for name, link in robot.link_map.items() if link.visuals]
+
+    # 预先生成一批限位内的随机姿态，模拟连续拖拽
+    rng = np.random.default_rng(0)
+    poses = []
+    for _ in range(256):
+        jv = {name: 0.0 for name in robot.joint_names}
+        for name in robot.actuated_joint_names:
+            lim = robot.joint_map[name].limit
+            lo, hi = (lim.lower, lim.upper) if lim is not None and lim.lower is not None else (-1.0, 1.0)
+            jv[name] = float(rng.uniform(lo, hi))
+        poses.append(jv)
+    return robot, links, poses
+
+
+def _fk_view(robot, links, joint_values):
+    try:
+        from windows_gui import MyGLViewWidget
+    except ImportError as e:
+        raise Skip(f"windows_gui 无法导入（{e}）")
+    from kinematics import KinematicTree
+    from pose_state import PoseState
+    # update_joints 只用到 kin / pose / _kin_slots / link_items / n_flushes / update，这里绑到轻量对象上
+    pose = PoseState.from_urdf(robot, robot.actuated_joint_names)
+    pose.q[:] = [joint_values[name] for name in pose.names]
+    kin = KinematicTree(robot)
+    slots = kin.slots(pose.names)
+    kin.update_values(slots, pose.q)
+    view = types.SimpleNamespace(kin=kin, robot=robot, pose=pose, _kin_slots=slots,
+                                 link_items={name: _NullItem() for name in links},
+                                 n_flushes=0, on_pose_changed=None, collision=None, update=lambda: None)
+    return view, MyGLViewWidget.update_joints
+
+
+def bench_fk_update_joints(n):
+    robot, links, poses = _fk_setup()
+    view, update_joints = _fk_view(robot, links, poses[0])
+    arrays = [np.array([jv[name] for name in view.pose.names], dtype=np.float32) for jv in poses]
+    it = iter(range(1 << 62))
+
+    def call():
+        view.pose.q[:] = arrays[next(it) % len(arrays)]
+        update_joints(view)
+    us = _time_calls(call, n, warmup=20)
+    return _stats(us, _peak_kb(call, 50), links=len(links))
+
+
+def bench_fk_drag(joint, n):
+    robot, links, poses = _fk_setup()
+    view, update_joints = _fk_view(robot, links, poses[0])
+    i = view.pose.index[joint]
+    lo, hi = poses[0][joint] - 0.5, poses[0][joint] + 0.5
+    steps = np.linspace(lo, hi, 256).tolist()
+    it = iter(range(1 << 62))
+
+    def call():
+        view.pose.q[i] = steps[next(it) % 256]
+        update_joints(view)
+    us = _time_calls(call, n, warmup=20)
+    return _stats(us, _peak_kb(call, 50), joint=joint)
+
+
+def bench_fk_yourdfpy(n):
+    robot, links, poses = _fk_setup()
+    it = iter(range(1 << 62))
+
+    def call():
+        robot.update_cfg(poses[next(it) % len(poses)])
+        for name in links:
+            Transform3D(*robot.get_transform(name, frame_from=None).flatten())
+    from pyqtgraph import Transform3D
+    us = _time_calls(call, n, warmup=5)
+    return _stats(us, _peak_kb(call, 20), links=len(links))
+
+
+# ---------------- 报告 ----------------
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(only=None, quick=False):
+    k = 5 if quick else 1
+    base_dir, synthetic = None, False
+    cases = [
+        ("control_tick",        lambda: bench_control_tick(20000 // k)),
+        ("state_push",          lambda: bench_state_push(20000 // k)),
+        ("record_cmd_push",     lambda: bench_record_cmd_push(20000 // k)),
+        ("interp_linear_b1",    lambda: bench_interp("linear", 20000 // k, 1)),
+        ("interp_linear_b1024", lambda: bench_interp("linear", 2000 // k, 1024)),
+        ("interp_sinusoidal_b1",    lambda: bench_interp("sinusoidal", 20000 // k, 1)),
+        ("interp_sinusoidal_b1024", lambda: bench_interp("sinusoidal", 2000 // k, 1024)),
+        ("fk_update_joints",    lambda: bench_fk_update_joints(2000 // k)),
+        ("fk_drag_wrist",       lambda: bench_fk_drag("right_wrist_roll_joint", 5000 // k)),
+        ("fk_drag_waist",       lambda: bench_fk_drag("waist_yaw_joint", 5000 // k)),
+        ("fk_yourdfpy",         lambda: bench_fk_yourdfpy(200 // k)),
+        ("pick_ray",            lambda: bench_pick_ray(2000 // k, base_dir)),
+        ("urdf_load",           lambda: bench_urdf_load(max(10 // k, 3), base_dir)),
+        ("mesh_load",           lambda: bench_mesh_load(max(10 // k, 3), base_dir)),
+        ("mesh_lod_build",      lambda: bench_mesh_lod_build(max(5 // k, 2), base_dir)),
+        ("mesh_cache_cold",     lambda: bench_mesh_cache(max(10 // k, 3), base_dir, warm=False)),
+        ("mesh_cache_warm",     lambda: bench_mesh_cache(max(50 // k, 10), base_dir, warm=True)),
+    ]
+    results = {}
+    for name, fn in cases:
+        if only and not any(s in name for s in only):
+            continue
+        if name.startswith(("urdf_load", "mesh_", "pick_")) and base_dir is None:
+            from yourdfpy import URDF
+            base_dir, synthetic = _mesh_base_dir(URDF)
+        try:
+            results[name] = fn()
+        except Skip as e:
+            results[name] = {"skipped": str(e)}
+        print(format_row(name, results[name]), flush=True)
+
+    try:
+        import resource
+        maxrss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        maxrss_kb = None
+    meta = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu": platform.processor() or platform.machine(),
+        "quick": quick,
+        "synthetic_meshes": synthetic,
+        "maxrss_kb": maxrss_kb,
+    }
+    return {"meta": meta, "results": results}
+
+
+HEADER = f"{'benchmark':<26}{'p50 us':>12}{'p99 us':>12}{'mean us':>12}{'max us':>12}{'peak KB':>10}"
+
+
+def format_row(name, r):
+    if "skipped" in r:
+        return f"{name:<26}  skipped: {r['skipped']}"
+    return (f"{name:<26}{r['p50_us']:>12.1f}{r['p99_us']:>12.1f}{r['mean_us']:>12.1f}"
+            f"{r['max_us']:>12.1f}{r['peak_kb']:>10.0f}")
+
+
+def compare(base, cur, threshold):
+    """逐项对比 p50/p99/峰值内存，返回退化项列表"""
+    regressions = []
+    print(f"\n{'benchmark':<26}{'p50':>28}{'p99':>28}{'peak KB':>28}")
+    for name, r in cur["results"].items():
+        b = base["results"].get(name)
+        if b is None or "skipped" in r or "skipped" in b:
+            continue
+        cells = []
+        for key in ("p50_us", "p99_us", "peak_kb"):
+            ratio = r[key] / b[key] if b[key] > 0 else 1.0
+            flag = " !" if ratio > 1.0 + threshold else "  "
+            if flag == " !" and key != "p99_us":  # p99 抖动大，只提示不判退化
+                regressions.append((name, key, ratio))
+            cells.append(f"{b[key]:.1f}→{r[key]:.1f} ({ratio:4.2f}x){flag}")
+        print(f"{name:<26}" + "".join(f"{c:>28}" for c in cells))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="G1 控制/GUI 性能基准")
+    parser.add_argument("--json", help="把报告写到这个文件")
+    parser.add_argument("--compare", help="与旧报告对比")
+    parser.add_argument("--threshold", type=float, default=0.10, help="判为退化的相对增幅（默认 10%%）")
+    parser.add_argument("--only", help="逗号分隔的名字子串")
+    parser.add_argument("--quick", action="store_true", help="减少迭代次数")
+    args = parser.parse_args(argv)
+
+    os.chdir(HERE)
+    print(HEADER)
+    report = run(args.only.split(",") if args.only else None, args.quick)
+    if report["meta"]["synthetic_meshes"]:
+        print("（meshes/ 缺失，urdf_load/mesh_load 使用替身 STL）")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"报告已写入 {args.json}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"对比基线 {args.compare}（git {base['meta'].get('git')}，{base['meta'].get('time')}）")
+        regressions = compare(base, report, args.threshold)
+        if regressions:
+            print("退化：" + "，".join(f"{n}.{k} {r:.2f}x" for n, k, r in regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
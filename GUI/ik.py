@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阻尼最小二乘（DLS）位置逆解
+
+拖手或脚时，目标是末端的一个点（base_link 坐标系），只动一条链上的关节（肩/肘/腕或髋/膝/踝），
+其余关节保持不变：
+    dq = Jᵀ (J Jᵀ + λ² I)⁻¹ e        e = 目标 - 当前末端位置
+J 由 KinematicTree.jacobian 按当前 world 解析算出，每步之后只增量重算这条链下面的子树。
+已经顶在 URDF 限位上、且这一步还要往外推的关节本步不参与；单步最大转角 MAX_STEP，结果限幅到限位内。
+腿伸直时末端在竖直方向一阶不可动（奇异），DLS 原地打转；误差不再下降时在零空间里把关节往限位中点拉一点
+（膝会弯起来），离开奇异位形后继续正常迭代。误差在下降时不加，拖拽时不会无故改动姿态。
+达到精度、迭代次数或时间预算（GUI 里为半帧）任一条件即停，拖拽时目标每帧只移动一点，通常几步就收敛。
+
+    python3 ik.py    # 解析雅可比与数值差分对比 + 随机目标收敛率、迭代次数、单次求解耗时
+"""
+
+import sys, copy, time
+import numpy as np
+
+DAMPING = 0.02     # λ（米），目标够不到或接近奇异时保持步长有界
+MAX_ITERS = 50
+TOL = 1e-4         # 末端位置误差（米）
+MAX_STEP = 0.2     # 单步单关节最大转角（弧度）
+STALL_RATIO = 0.9  # 一步误差降不到上一步的这个比例算停滞（如伸直的腿往上拖），此时加零空间偏置
+STALL_GAIN = 0.1   # 停滞时往限位中点拉的比例
+
+
+class IKSolver:
+    def __init__(self, kin, names, lower, upper, damping=DAMPING, max_iters=MAX_ITERS, tol=TOL, max_step=MAX_STEP):
+        """kin：KinematicTree（复制一份自用，迭代时不动调用方的）；names/lower/upper：姿态数组的关节顺序和限位"""
+        self.kin = copy.deepcopy(kin)
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self._slots = self.kin.slots(self.names)
+        self.damping = damping
+        self.max_iters = max_iters
+        self.tol = tol
+        self.max_step = max_step
+
+    def solve(self, q, chain, link, target, point=None, budget=None):
+        """
+        q：names 顺序的全身姿态；chain：参与的关节名；link/point：末端 link 及其上一点（默认原点）；
+        target：base_link 坐标系下的目标位置；budget：时间预算（秒）。
+        返回 (新姿态 float64，剩余误差（米），迭代次数)。
+        """
+        t_end = np.inf if budget is None else time.perf_counter() + budget
+        q = np.array(q, dtype=np.float64)
+        idx = np.array([self.index[name] for name in chain], dtype=np.intp)
+        slots = self._slots[idx]
+        lo, hi = self.lower[idx], self.upper[idx]
+        kin = self.kin
+        kin.update_values(self._slots, q)
+        target = np.asarray(target, dtype=np.float64)
+        lam2 = self.damping ** 2 * np.eye(3)
+        mid = (lo + hi) / 2
+        it = 0
+        prev = np.inf
+        while True:
+            e = target - kin.point(link, point)
+            err = float(np.sqrt(e @ e))
+            if err < self.tol or it >= self.max_iters or time.perf_counter() > t_end:
+                return q, err, it
+            stalled = err > STALL_RATIO * prev
+            prev = err
+            jac = kin.jacobian(slots, link, point)
+            qc = q[idx]
+            push = jac.T @ e   # 各关节沿误差下降方向的分量
+            free = ~(((qc <= lo) & (push < 0)) | ((qc >= hi) & (push > 0)))
+            jf = jac[:, free]
+            dq = np.zeros(len(qc))
+            dq[free] = jf.T @ np.linalg.solve(jf @ jf.T + lam2, e)
+            if stalled:
+                # 零空间偏置作用于整条链：顶在限位上的关节（如反折到底的膝）也能被拉回来
+                bias = STALL_GAIN * (mid - qc)
+                dq += bias - jac.T @ np.linalg.solve(jac @ jac.T + lam2, jac @ bias)
+            peak = np.abs(dq).max(initial=0.0)
+            if peak > self.max_step:
+                dq *= self.max_step / peak
+            qc = np.clip(qc + dq, lo, hi)
+            q[idx] = qc
+            kin.update_values(slots, qc)
+            it += 1
+
+
+# ---------------- 自检 ----------------
+ARM = ("shoulder_pitch", "shoulder_roll", "shoulder_yaw", "elbow", "wrist_roll", "wrist_pitch", "wrist_yaw")
+LEG = ("hip_pitch", "hip_roll", "hip_yaw", "knee", "ankle_pitch", "ankle_roll")
+
+
+def self_check(urdf_path="g1_29dof.urdf", n=500, seed=0):
+    from yourdfpy import URDF
+    from kinematics import KinematicTree
+    from pose_state import control_joints, urdf_limits
+
+    robot = URDF.load(urdf_path, load_meshes=False)
+    kin = KinematicTree(robot)
+    lower, upper, _ = urdf_limits(robot, control_joints)
+    solver = IKSolver(kin, control_joints, lower, upper)
+    rng = np.random.default_rng(seed)
+    hand = "left_rubber_hand" if "left_rubber_hand" in kin.link_index else "left_wrist_yaw_link"
+    cases = {"左手": ([f"left_{j}_joint" for j in ARM], hand),
+             "右脚": ([f"right_{j}_joint" for j in LEG], "right_ankle_roll_link")}
+
+    # 1) 解析雅可比 vs 中心差分
+    slots = kin.slots(control_joints)
+    max_err = 0.0
+    for _ in range(50):
+        q = rng.uniform(lower, upper)
+        for chain, link in cases.values():
+            kin.update_values(slots, q)
+            jac = kin.jacobian(kin.slots(chain), link)
+            num = np.zeros_like(jac)
+            for c, name in enumerate(chain):
+                i = control_joints.index(name)
+                for sign in (1, -1):
+                    qq = q.copy()
+                    qq[i] += sign * 1e-6
+                    kin.update_values(slots, qq)
+                    num[:, c] += sign * kin.point(link) / 2e-6
+            max_err = max(max_err, np.abs(jac - num).max())
+    print(f"解析雅可比与中心差分最大偏差 {max_err:.1e}")
+
+    # 2) 随机可达目标：从另一个随机姿态出发（大跳），以及从目标附近出发（拖拽一帧）
+    ok = max_err < 1e-6
+    for label, (chain, link) in cases.items():
+        idx = [control_joints.index(name) for name in chain]
+        for mode, spread in (("大跳", None), ("拖拽", 0.05)):
+            iters, times, errs = [], [], []
+            for _ in range(n):
+                goal = rng.uniform(lower, upper)
+                kin.update_values(slots, goal)
+                target = kin.point(link)
+                start = goal.copy()
+                if spread is None:
+                    start[idx] = rng.uniform(lower[idx], upper[idx])
+                else:
+                    start[idx] = np.clip(goal[idx] + rng.normal(scale=spread, size=len(idx)), lower[idx], upper[idx])
+                t0 = time.perf_counter()
+                _, err, it = solver.solve(start, chain, link, target)
+                times.append(time.perf_counter() - t0)
+                iters.append(it)
+                errs.append(err)
+            conv = np.mean(np.array(errs) < solver.tol)
+            print(f"{label} {mode}：收敛 {conv * 100:.1f}%，迭代中位数 {np.median(iters):.0f}，"
+                  f"耗时 p50 {np.median(times) * 1e3:.2f} ms，p99 {np.percentile(times, 99) * 1e3:.2f} ms")
+            if spread is not None:
+                ok &= conv > 0.99
+
+    # 3) 奇异位形：零位（腿伸直）把脚往上抬
+    chain, link = cases["右脚"]
+    kin.update_values(slots, np.zeros(len(control_joints)))
+    foot = kin.point(link)
+    for dz in (0.005, 0.05):
+        _, err, it = solver.solve(np.zeros(len(control_joints)), chain, link, foot + [0.0, 0.0, dz])
+        print(f"伸直的腿抬脚 {dz * 1e3:.0f} mm：剩余误差 {err * 1e3:.3f} mm，{it} 步")
+        ok &= err < solver.tol
+    return bool(ok)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check(*sys.argv[1:2]) else 1)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量正运动学
+
+KinematicTree 从 URDF 一次性“编译”出运动学树：link 按深度优先先序排列，
+父节点下标、关节原点、转轴都放在 NumPy 数组里，任意 link 的子树是一段连续下标。
+拖拽时只比较关节值，找出变化的关节，只重算它们下面那段子树，并返回变化过的 link 名，
+GUI 只给这些 link 的 GLMeshItem 推新变换。结果与 yourdfpy 的 update_cfg + get_transform 一致。
+
+    python3 kinematics.py    # 与 yourdfpy 的数值对比 + 单次拖拽事件耗时对比
+"""
+
+import sys, time
+import numpy as np
+
+FIXED, REVOLUTE, PRISMATIC = 0, 1, 2
+_JOINT_TYPES = {"fixed": FIXED, "revolute": REVOLUTE, "continuous": REVOLUTE, "prismatic": PRISMATIC}
+
+
+class KinematicTree:
+    def __init__(self, robot):
+        """robot：yourdfpy.URDF（只读取结构，不依赖其场景图）"""
+        children = {}
+        joint_to = {}
+        for joint in robot.robot.joints:
+            if joint.type not in _JOINT_TYPES:
+                raise ValueError(f"不支持的关节类型 {joint.type!r}（{joint.name}）")
+            if joint.mimic is not None:
+                raise ValueError(f"不支持 mimic 关节（{joint.name}）")
+            children.setdefault(joint.parent, []).append(joint.child)
+            joint_to[joint.child] = joint
+
+        # 深度优先先序：父节点总在子节点之前，每个子树占一段连续下标 [i, end[i])
+        order, stack = [], [robot.base_link]
+        while stack:
+            link = stack.pop()
+            order.append(link)
+            stack.extend(reversed(children.get(link, [])))
+        n = len(order)
+        index = {name: i for i, name in enumerate(order)}
+
+        self.link_names = order
+        self.link_index = index
+        self.parent = np.full(n, -1, dtype=np.intp)
+        self.origin = np.tile(np.eye(4), (n, 1, 1))   # 关节原点（父 link → 关节）
+        self.axis = np.zeros((n, 3))
+        self.jtype = np.zeros(n, dtype=np.int8)
+        self.joint_of = {}                             # 关节名 → 其子 link 下标（只含可动关节）
+        for name, joint in joint_to.items():
+            i = index[name]
+            self.parent[i] = index[joint.parent]
+            if joint.origin is not None:
+                self.origin[i] = joint.origin
+            self.jtype[i] = _JOINT_TYPES[joint.type]
+            if self.jtype[i] != FIXED:
+                axis = np.asarray(joint.axis, dtype=np.float64)
+                self.axis[i] = axis / np.linalg.norm(axis)
+                self.joint_of[joint.name] = i
+
+        self.end = np.arange(1, n + 1)
+        for i in range(n - 1, 0, -1):
+            p = self.parent[i]
+            self.end[p] = max(self.end[p], self.end[i])
+
+        # 转动关节的 Rodrigues 常量：R = I + sin(q) K + (1 - cos(q)) K²
+        k = np.zeros((n, 3, 3))
+        x, y, z = self.axis.T
+        k[:, 0, 1], k[:, 0, 2], k[:, 1, 2] = -z, y, -x
+        k[:, 1, 0], k[:, 2, 0], k[:, 2, 1] = z, -y, x
+        self._k, self._kk = k, k @ k
+
+        self.q = np.zeros(n)                 # 每个 link 的父关节当前值
+        self.local = self.origin.copy()      # 父 link → 本 link
+        self.world = np.tile(np.eye(4), (n, 1, 1))
+        self._recompute(np.arange(n))
+
+    # ---------------- 计算 ----------------
+    def _update_local(self, idx):
+        """按 self.q 批量重算 idx 中各 link 的局部变换"""
+        q = self.q[idx]
+        motion = np.tile(np.eye(4), (len(idx), 1, 1))
+        rev = self.jtype[idx] == REVOLUTE
+        if rev.any():
+            r = idx[rev]
+            s, c = np.sin(q[rev])[:, None, None], np.cos(q[rev])[:, None, None]
+            motion[rev, :3, :3] += s * self._k[r] + (1.0 - c) * self._kk[r]
+        pri = self.jtype[idx] == PRISMATIC
+        if pri.any():
+            motion[pri, :3, 3] = q[pri, None] * self.axis[idx[pri]]
+        np.matmul(self.origin[idx], motion, out=motion)
+        self.local[idx] = motion
+
+    def _recompute(self, links):
+        """links 须按先序排列（父在前）；重算它们的世界变换"""
+        world, local, parent = self.world, self.local, self.parent
+        for i in links.tolist():
+            p = parent[i]
+            if p < 0:
+                world[i] = local[i]
+            else:
+                np.matmul(world[p], local[i], out=world[i])
+
+    def update(self, joint_values):
+        """
+        joint_values：{关节名: 值}（可以含固定关节或未知名字，忽略）。
+        只重算值有变化的关节下面的子树，返回变换有变化的 link 名列表（先序）。
+        """
+        changed = []
+        q = self.q
+        for name, i in self.joint_of.items():
+            v = joint_values.get(name)
+            if v is not None and v != q[i]:
+                q[i] = v
+                changed.append(i)
+        if not changed:
+            return []
+        changed.sort()
+        return self._propagate(np.array(changed, dtype=np.intp))
+
+    def slots(self, joint_names):
+        """关节名列表 → 各自子 link 的下标，配合 update_values 使用"""
+        return np.array([self.joint_of[name] for name in joint_names], dtype=np.intp)
+
+    def update_values(self, slots, values):
+        """与 update 相同，但关节值是按 slots 顺序排列的数组，变化检测一次向量比较完成"""
+        values = np.asarray(values, dtype=np.float64)
+        diff = values != self.q[slots]
+        if not diff.any():
+            return []
+        changed = slots[diff]
+        self.q[changed] = values[diff]
+        return self._propagate(np.sort(changed))
+
+    def _propagate(self, changed):
+        """changed：值已写入 self.q 的关节（子 link 下标，升序）"""
+        self._update_local(changed)
+
+        # 合并子树区间：先序下，落在已选子树内的关节不用再单独处理
+        spans, stop = [], -1
+        for i in changed.tolist():
+            if i >= stop:
+                spans.append((i, self.end[i]))
+                stop = self.end[i]
+        links = np.concatenate([np.arange(a, b) for a, b in spans])
+        self._recompute(links)
+        names = self.link_names
+        return [names[i] for i in links.tolist()]
+
+    def transform(self, link_name):
+        """base_link 坐标系下的 4x4 变换（内部数组的视图，调用方不要修改）"""
+        return self.world[self.link_index[link_name]]
+
+    def point(self, link_name, point=None):
+        """link 上一点（link 坐标系，默认原点）在 base_link 坐标系下的位置"""
+        t = self.world[self.link_index[link_name]]
+        return t[:3, 3].copy() if point is None else t[:3, :3] @ point + t[:3, 3]
+
+    def jacobian(self, slots, link_name, point=None):
+        """
+        link 上一点对 slots 各关节的位置雅可比 (3, len(slots))，按当前 world 解析计算：
+        转动关节一列为 a × (p - o)，移动关节为 a；a 为子 link 的世界旋转乘 axis，o 为子 link 的世界原点。
+        不在该 link 祖先链上的关节那一列为 0。
+        """
+        i = self.link_index[link_name]
+        tip = self.point(link_name, point)
+        frames = self.world[slots]
+        ax, ay, az = np.einsum("nij,nj->in", frames[:, :3, :3], self.axis[slots])
+        rx, ry, rz = (tip - frames[:, :3, 3]).T
+        jac = np.array([ay * rz - az * ry, az * rx - ax * rz, ax * ry - ay * rx])   # a × r，按分量写比 np.cross 快
+        pri = self.jtype[slots] == PRISMATIC
+        if pri.any():
+            jac[:, pri] = ax[pri], ay[pri], az[pri]
+        jac[:, (slots > i) | (self.end[slots] <= i)] = 0.0   # 先序下 i 在 slot 的子树 [slot, end) 里才受它影响
+        return jac
+
+    # ---------------- 批量 ----------------
+    def batch_points(self, joint_names, values, points):
+        """
+        一批姿态下若干个 link 固连点的位置（离线校验用）。
+        joint_names：values 各列对应的关节名；未给出的关节取树的当前值 self.q。
+        values：(N, len(joint_names))，float32 输入按 float32 计算（快约一半，误差 ~1e-6 m）。
+        points：[(link 名, link 坐标系下的 (3,) 点), ...]。返回 (N, len(points), 3)，base_link 坐标系。
+        只沿这些 link 的祖先链计算；旋转/平移分开存，父旋转乘常量矩阵时 reshape 成一次 (3N, 3) 的 GEMM。
+        """
+        values = np.asarray(values)
+        dtype = np.float32 if values.dtype == np.float32 else np.float64
+        values = values.astype(dtype, copy=False)
+        n = len(values)
+        eye = np.eye(3, dtype=dtype)
+        col = {self.joint_of[name]: j for j, name in enumerate(joint_names) if name in self.joint_of}
+        need = set()
+        for link, _ in points:
+            i = self.link_index[link]
+            while i >= 0 and i not in need:
+                need.add(i)
+                i = self.parent[i]
+        rot, pos = {}, {}
+        for i in sorted(need):   # 先序：父节点先算
+            o_rot, o_pos = self.origin[i, :3, :3].astype(dtype), self.origin[i, :3, 3].astype(dtype)
+            p = self.parent[i]
+            if p < 0:
+                r_p, p_p = np.broadcast_to(eye, (n, 3, 3)), np.zeros((n, 3), dtype=dtype)
+            else:
+                r_p, p_p = rot[p], pos[p]
+            flat = r_p.reshape(-1, 3)
+            t = p_p + (flat @ o_pos).reshape(n, 3)
+            r = (flat @ o_rot).reshape(n, 3, 3)
+            if self.jtype[i] != FIXED:
+                q = values[:, col[i]] if i in col else np.full(n, self.q[i], dtype=dtype)
+            if self.jtype[i] == REVOLUTE:
+                # 关节转动 I + sin q K + (1 - cos q) K² 按行展开成 (N, 9) 连续数组，再做一次批量 3x3 乘
+                motion = np.sin(q)[:, None] * self._k[i].astype(dtype).ravel()
+                motion += (1.0 - np.cos(q))[:, None] * self._kk[i].astype(dtype).ravel()
+                motion += eye.ravel()
+                r = r @ motion.reshape(n, 3, 3)
+            elif self.jtype[i] == PRISMATIC:
+                t = t + q[:, None] * (r @ self.axis[i].astype(dtype))
+            rot[i], pos[i] = r, t
+        out = np.empty((n, len(points), 3), dtype=dtype)
+        for k, (link, point) in enumerate(points):
+            i = self.link_index[link]
+            out[:, k] = pos[i] + rot[i] @ np.asarray(point, dtype=dtype)
+        return out
+
+
+# ---------------- 对比 ----------------
+def _random_cfg(robot, rng):
+    jv = {}
+    for name in robot.actuated_joint_names:
+        lim = robot.joint_map[name].limit
+        lo, hi = (lim.lower, lim.upper) if lim is not None and lim.lower is not None else (-np.pi, np.pi)
+        jv[name] = float(rng.uniform(lo, hi))
+    return jv
+
+
+def self_check(urdf_path="g1_29dof.urdf", n=200, seed=0):
+    from yourdfpy import URDF
+    robot = URDF.load(urdf_path, load_meshes=False)
+    kin = KinematicTree(robot)
+    links = [name for name, link in robot.link_map.items() if link.visuals]
+    rng = np.random.default_rng(seed)
+
+    # 1) 数值一致：随机整姿态 + 随机单关节拖动交替
+    jv = {name: 0.0 for name in robot.joint_names}
+    max_err = 0.0
+    for k in range(n):
+        if k % 2 == 0:
+            jv.update(_random_cfg(robot, rng))
+        else:
+            name = robot.actuated_joint_names[rng.integers(len(robot.actuated_joint_names))]
+            jv[name] += 0.01
+        kin.update(jv)
+        robot.update_cfg(jv)
+        for name in robot.link_map:
+            err = np.abs(robot.get_transform(name, frame_from=None) - kin.transform(name)).max()
+            max_err = max(max_err, err)
+    print(f"与 yourdfpy 对比 {n} 个姿态 × {len(robot.link_map)} 个 link：最大误差 {max_err:.2e}")
+
+    # 2) 单次拖拽事件：改一个关节，算出需要推给 GLMeshItem 的全部变换
+    print(f"{'拖动关节':<28}{'yourdfpy us':>14}{'增量 us':>12}{'更新 link':>10}")
+    for joint in ("right_wrist_roll_joint", "left_elbow_joint", "left_shoulder_pitch_joint",
+                  "left_hip_pitch_joint", "waist_yaw_joint"):
+        def drag_yourdfpy():
+            jv[joint] += 0.001
+            robot.update_cfg(jv)
+            for name in links:
+                robot.get_transform(name, frame_from=None).flatten()
+
+        updated = [0]
+
+        def drag_tree():
+            jv[joint] += 0.001
+            names = kin.update(jv)
+            for name in names:
+                kin.transform(name).flatten()
+            updated[0] = len(names)
+
+        t_ref = _time_per_call(drag_yourdfpy, 100)
+        t_new = _time_per_call(drag_tree, 2000)
+        print(f"{joint:<28}{t_ref:>14.1f}{t_new:>12.1f}{updated[0]:>10}")
+    return max_err < 1e-9
+
+
+def _time_per_call(fn, n):
+    samples = np.empty(n)
+    for k in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples[k] = time.perf_counter() - t0
+    return float(np.median(samples) * 1e6)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check() else 1)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+控制循环计时统计
+
+每拍记录三项时间，落到固定桶宽的直方图里：
+    start   实际开始时刻相对理想时刻（上一理想时刻 + 周期）的迟到
+    exec    LowCmdWrite 执行耗时
+    h2c     最新 LowState 到达 → 本拍命令发出 的时延
+另有计数：超周期执行（overrun）、整拍错过（missed）、GC 次数与耗时。
+
+所有计数和直方图都放在一块预分配的共享内存文件里（默认 /dev/shm/g1_loop_metrics），
+控制线程只做整数下标和原地加法，标量计数每 32 拍写回一次；其它进程直接映射同一文件读取：
+
+    python3 loop_metrics.py [--path /dev/shm/g1_loop_metrics] [--interval 1]
+"""
+
+import os, sys, gc, time, argparse, tempfile, threading
+import numpy as np
+
+MAGIC = 0x47314C4D   # "G1LM"
+BUCKET_US = 10       # 桶宽 10 us
+N_BUCKETS = 1000     # 覆盖 0 ~ 10 ms，最后一桶兼作溢出
+
+# 头部 int64 字段
+(H_MAGIC, H_BUCKET_US, H_N_BUCKETS, H_PERIOD_US, H_TICKS, H_OVERRUNS, H_MISSED,
+ H_MAX_START_US, H_MAX_EXEC_US, H_MAX_H2C_US, H_GC_COUNT, H_GC_US, H_PID) = range(13)
+HEADER_LEN = 16
+HISTS = ("start", "exec", "h2c")
+
+
+def default_path():
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "g1_loop_metrics")
+
+
+def _map(path, mode):
+    return np.memmap(path, dtype=np.int64, mode=mode,
+                     shape=(HEADER_LEN + len(HISTS) * N_BUCKETS,))
+
+
+def hist_percentile(hist, p):
+    total = hist.sum()
+    if total == 0:
+        return 0.0
+    idx = int(np.searchsorted(np.cumsum(hist), total * p / 100.0))
+    return (idx + 0.5) * BUCKET_US
+
+
+class LoopMetrics:
+    def __init__(self, period, path=None):
+        self.path = path or default_path()
+        self.period_us = int(round(period * 1e6))
+        self._mmap = _map(self.path, "w+")
+        self._buf = self._mmap.view(np.ndarray)  # 普通 ndarray 视图，避开 memmap 子类的下标开销
+        self._buf[:] = 0
+        self.header = self._buf[:HEADER_LEN]
+        self.hist = {name: self._buf[HEADER_LEN + k * N_BUCKETS:HEADER_LEN + (k + 1) * N_BUCKETS]
+                     for k, name in enumerate(HISTS)}
+        # 热路径通过 memoryview 原地加一，比 ndarray 标量下标快一倍多
+        self._h_start, self._h_exec, self._h_h2c = (memoryview(self.hist[n]) for n in HISTS)
+        h = self.header
+        h[H_MAGIC], h[H_BUCKET_US], h[H_N_BUCKETS] = MAGIC, BUCKET_US, N_BUCKETS
+        h[H_PERIOD_US], h[H_PID] = self.period_us, os.getpid()
+
+        self._expected = None   # 下一拍的理想开始时刻（秒）
+        self._period = self.period_us * 1e-6
+        # 标量计数先记在 Python 属性里，每 FLUSH_EVERY 拍整体写回共享内存头部
+        self._ticks = self._overruns = self._missed = 0
+        self._max_start = self._max_exec = self._max_h2c = 0
+        self._gc_t0 = 0.0
+        self._reporter = None
+        gc.callbacks.append(self._on_gc)
+
+    FLUSH_EVERY = 32
+
+    # ---------------- 热路径 ----------------
+    def record(self, t_start, t_end, t_state=None):
+        """t_* 均为 time.perf_counter() 秒；t_state 为最新 LowState 的接收时刻"""
+        period = self._period
+        exp = self._expected
+        if exp is None or t_start < exp:
+            exp = t_start                      # 首拍或提前到达：重新对齐
+        late = t_start - exp
+        if late >= period:                     # 整拍错过，计数后对齐到本拍所在周期
+            slipped = int(late / period)
+            self._missed += slipped
+            exp += slipped * period
+            late -= slipped * period
+        self._expected = exp + period
+
+        start_us = int(late * 1e6)
+        exec_us = int((t_end - t_start) * 1e6)
+        self._h_start[min(start_us // BUCKET_US, N_BUCKETS - 1)] += 1
+        self._h_exec[min(exec_us // BUCKET_US, N_BUCKETS - 1)] += 1
+        if start_us > self._max_start:
+            self._max_start = start_us
+        if exec_us > self._max_exec:
+            self._max_exec = exec_us
+        if exec_us > self.period_us:
+            self._overruns += 1
+        if t_state is not None:
+            h2c_us = int((t_end - t_state) * 1e6)
+            if h2c_us >= 0:
+                self._h_h2c[min(h2c_us // BUCKET_US, N_BUCKETS - 1)] += 1
+                if h2c_us > self._max_h2c:
+                    self._max_h2c = h2c_us
+        self._ticks += 1
+        if self._ticks % self.FLUSH_EVERY == 0:
+            self.flush()
+
+    def flush(self):
+        h = self.header
+        h[H_TICKS:H_MAX_H2C_US + 1] = (self._ticks, self._overruns, self._missed,
+                                       self._max_start, self._max_exec, self._max_h2c)
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_t0 = time.perf_counter()
+        else:
+            self.header[H_GC_COUNT] += 1
+            self.header[H_GC_US] += int((time.perf_counter() - self._gc_t0) * 1e6)
+
+    # ---------------- 周期汇总 ----------------
+    def start_reporter(self, interval=10.0):
+        """后台线程每 interval 秒打印一行这段时间内的统计"""
+        self._reporter = threading.Thread(target=self._report_loop, args=(interval,),
+                                          name="loop_metrics", daemon=True)
+        self._reporter.start()
+
+    def _report_loop(self, interval):
+        prev = np.array(self._buf)
+        while True:
+            time.sleep(interval)
+            self.flush()
+            cur = np.array(self._buf)
+            print(summary_line(cur, prev))
+            prev = cur
+
+    def close(self):
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        self.flush()
+        self._mmap.flush()
+
+
+def summary_line(cur, prev=None):
+    """cur/prev 为整块缓冲的拷贝；给 prev 时统计两者之差（最大值仍为累计）"""
+    d = cur if prev is None else cur - prev
+    h = cur[:HEADER_LEN]
+    dh = d[:HEADER_LEN]
+    hists = {name: d[HEADER_LEN + k * N_BUCKETS:HEADER_LEN + (k + 1) * N_BUCKETS]
+             for k, name in enumerate(HISTS)}
+    ex, st, hc = hists["exec"], hists["start"], hists["h2c"]
+    return (f"[loop] ticks {dh[H_TICKS]} | "
+            f"exec p50 {hist_percentile(ex, 50):.0f} p99 {hist_percentile(ex, 99):.0f} max {h[H_MAX_EXEC_US]} us | "
+            f"start p99 {hist_percentile(st, 99):.0f} max {h[H_MAX_START_US]} us | "
+            f"h2c p50 {hist_percentile(hc, 50):.0f} p99 {hist_percentile(hc, 99):.0f} us | "
+            f"overrun {dh[H_OVERRUNS]} missed {dh[H_MISSED]} | "
+            f"gc {dh[H_GC_COUNT]} ({dh[H_GC_US]} us)")
+
+
+# ---------------- 外部读取 ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="读取 robot_control.py 的控制循环统计")
+    parser.add_argument("--path", default=default_path())
+    parser.add_argument("--interval", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    buf = _map(args.path, "r")
+    if buf[H_MAGIC] != MAGIC:
+        print(f"{args.path} 不是 loop metrics 文件", file=sys.stderr)
+        return 1
+    print(f"pid {buf[H_PID]}，周期 {buf[H_PERIOD_US]} us，桶宽 {buf[H_BUCKET_US]} us")
+    prev = np.array(buf)
+    try:
+        while True:
+            time.sleep(args.interval)
+            cur = np.array(buf)
+            print(summary_line(cur, prev))
+            prev = cur
+    except KeyboardInterrupt:
+        print(summary_line(np.array(buf)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
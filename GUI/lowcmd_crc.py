@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+hg LowCmd 的增量 CRC
+
+SDK 的 CRC().Crc(low_cmd) 每拍把 35 个电机的全部字段逐个取出、struct 打包、
+再拆成 uint32 列表交给 CRC-32/MPEG-2（多项式 0x04C11DB7，初值 0xFFFFFFFF，
+每个小端 uint32 从最高位开始送入，不含最后的 crc 字）。控制循环里只有 q 每拍变化。
+
+LowCmdEncoder 把整条命令按 SDK 相同的格式打包进一块常驻 bytearray，每拍只把 q
+写进对应位置，再利用 CRC 的线性：
+    crc(buf) = base ^ XOR_p T[p][buf[p]]     p 取遍 q 所在的 29*4 个字节
+base 是 q 全零时的 CRC，T[p] 是第 p 个字节取各值时对结果的贡献（256 项查表）。
+其它字段（kp/kd/mode/mode_machine …）改动后调用 rebase() 重新打包。
+
+    python3 lowcmd_crc.py [--n 2000]    # 与 SDK 的 CRC.Crc 逐位对比（未装 SDK 时与其纯 Python 实现的移植对比）
+"""
+
+import sys, time, struct, zlib, argparse, types
+import numpy as np
+
+# 与 unitree_sdk2py.utils.crc 中 hg LowCmd 的打包格式一致：1004 字节
+HG_LOWCMD = struct.Struct('<2B2x' + 'B3x5fI' * 35 + '5I')
+MOTOR_SLOTS = 35
+MOTOR_OFFSET = 4      # mode_pr, mode_machine, 2 字节填充
+MOTOR_SIZE = 28       # mode(B3x) q dq tau kp kd reserve
+Q_OFFSET = 4          # q 在单个电机结构里的偏移
+CRC_WORDS = HG_LOWCMD.size // 4 - 1   # 最后一个字是 crc 本身，不参与计算
+
+POLY = 0x04C11DB7
+_MASK = 0xFFFFFFFF
+
+
+def _byte_table():
+    table = []
+    for b in range(256):
+        c = b << 24
+        for _ in range(8):
+            c = ((c << 1) ^ POLY) & _MASK if c & 0x80000000 else (c << 1) & _MASK
+        table.append(c)
+    return table
+
+
+_TABLE = _byte_table()
+_BITREV8 = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+def _bitrev32(x):
+    r = _BITREV8
+    return (r[x & 0xFF] << 24) | (r[(x >> 8) & 0xFF] << 16) | (r[(x >> 16) & 0xFF] << 8) | r[x >> 24]
+
+
+def crc32_words(buf, n_words=CRC_WORDS):
+    """
+    整块计算，与 SDK 结果一致：每个 uint32 按位反转后，MSB 优先的 MPEG-2 就变成
+    zlib 的反射 CRC-32（初值相同、不做末尾取反），查表部分全在 C 里完成。
+    """
+    data = np.frombuffer(buf, dtype='<u4', count=n_words).byteswap().tobytes().translate(_BITREV8)
+    return _bitrev32(~zlib.crc32(data) & _MASK)
+
+
+def _stream_pos(offset):
+    # 缓冲区里的小端字节 → 送入 CRC 的字节序号（每个字高字节先送）
+    return (offset & ~3) + 3 - (offset & 3)
+
+
+def _contribution_tables(offsets, n_bytes):
+    """每个偏移处字节取 0..255 时对 CRC（零初值）的贡献，返回 (len(offsets), 256) uint32"""
+    # 字节 v 送入后还要经过 zeros 个零字节；按 zeros 从小到大依次推进 8 个单比特基向量
+    zeros = [n_bytes - 1 - _stream_pos(o) for o in offsets]
+    order = sorted(range(len(offsets)), key=zeros.__getitem__)
+    basis = [_TABLE[1 << k] for k in range(8)]
+    done = 0
+    per_pos = [None] * len(offsets)
+    for i in order:
+        for _ in range(zeros[i] - done):
+            basis = [((c << 8) & _MASK) ^ _TABLE[c >> 24] for c in basis]
+        done = zeros[i]
+        per_pos[i] = basis
+    basis = np.array(per_pos, dtype=np.uint32)                                # (P, 8)
+    bits = ((np.arange(256)[:, None] >> np.arange(8)) & 1).astype(bool)       # (256, 8)
+    return np.bitwise_xor.reduce(np.where(bits[None], basis[:, None, :], np.uint32(0)), axis=2)
+
+
+def pack_lowcmd(cmd, out=None):
+    """按 SDK 的字段顺序打包 hg LowCmd（含 crc 字段本身）"""
+    values = [cmd.mode_pr, cmd.mode_machine]
+    for m in cmd.motor_cmd[:MOTOR_SLOTS]:
+        values += (m.mode, m.q, m.dq, m.tau, m.kp, m.kd, m.reserve)
+    values += cmd.reserve
+    values.append(cmd.crc)
+    if out is None:
+        return bytearray(HG_LOWCMD.pack(*values))
+    HG_LOWCMD.pack_into(out, 0, *values)
+    return out
+
+
+class LowCmdEncoder:
+    """
+    常驻打包缓冲 + 只更新 q 的增量 CRC。控制线程独占使用。
+
+        enc = LowCmdEncoder(low_cmd, 29)
+        low_cmd.crc = enc.update_q(q)     # 每拍
+        enc.rebase()                      # 改过 q 以外的字段后
+    """
+
+    def __init__(self, low_cmd, num_motor):
+        self.low_cmd = low_cmd
+        self.num_motor = num_motor
+        self.buf = bytearray(HG_LOWCMD.size)
+        base = MOTOR_OFFSET + Q_OFFSET
+        # q 在缓冲区里的 float32 视图（步长 28 字节），以及同一位置的逐字节视图
+        self.q = np.ndarray((num_motor,), dtype='<f4', buffer=self.buf, offset=base, strides=(MOTOR_SIZE,))
+        self._q_bytes = np.ndarray((num_motor, 4), dtype=np.uint8, buffer=self.buf, offset=base,
+                                   strides=(MOTOR_SIZE, 1))
+        offsets = [base + i * MOTOR_SIZE + j for i in range(num_motor) for j in range(4)]
+        # 查表展平成一维，第 p 个字节的表从 p*256 开始；每拍只做一次加法、一次取数、一次异或归约
+        self._table = _contribution_tables(offsets, CRC_WORDS * 4).ravel()
+        self._table_offsets = (np.arange(num_motor * 4) * 256).reshape(num_motor, 4)
+        self._idx = np.empty((num_motor, 4), dtype=np.intp)
+        self._base = 0
+        self.rebase()
+
+    def _q_term(self):
+        np.add(self._table_offsets, self._q_bytes, out=self._idx)
+        return int(np.bitwise_xor.reduce(self._table[self._idx], axis=None))
+
+    def rebase(self):
+        """从 low_cmd 重新打包全部字段，重算 q 以外部分的 CRC"""
+        pack_lowcmd(self.low_cmd, self.buf)
+        self._base = crc32_words(self.buf) ^ self._q_term()
+
+    def update_q(self, q):
+        """把本拍的 q 写进缓冲，返回整条命令的 CRC（与 CRC().Crc(low_cmd) 逐位一致）"""
+        self.q[:] = q
+        return self._base ^ self._q_term()
+
+
+# ---------------- 逐位对比 ----------------
+def _reference_crc(cmd):
+    """SDK 纯 Python 路径（CRC._crc_py）的逐位移植，未安装 SDK 时作为对照"""
+    packed = pack_lowcmd(cmd)
+    words = struct.unpack_from(f'<{CRC_WORDS}I', packed)
+    crc = _MASK
+    for current in words:
+        bit = 1 << 31
+        for _ in range(32):
+            if crc & 0x80000000:
+                crc = ((crc << 1) & _MASK) ^ POLY
+            else:
+                crc = (crc << 1) & _MASK
+            if current & bit:
+                crc ^= POLY
+            bit >>= 1
+    return crc
+
+
+def _plain_lowcmd():
+    motor = lambda: types.SimpleNamespace(mode=0, q=0.0, dq=0.0, tau=0.0, kp=0.0, kd=0.0, reserve=0)
+    return types.SimpleNamespace(mode_pr=0, mode_machine=0, reserve=[0, 0, 0, 0], crc=0,
+                                 motor_cmd=[motor() for _ in range(MOTOR_SLOTS)])
+
+
+def self_check(n=2000, num_motor=29, seed=0):
+    try:
+        from unitree_sdk2py.idl.default import unitree_hg_msg_dds__LowCmd_
+        from unitree_sdk2py.utils.crc import CRC
+        cmd, reference, label = unitree_hg_msg_dds__LowCmd_(), CRC().Crc, "SDK CRC.Crc"
+    except ImportError:
+        cmd, reference, label = _plain_lowcmd(), _reference_crc, "SDK _crc_py 移植"
+
+    rng = np.random.default_rng(seed)
+    enc = LowCmdEncoder(cmd, num_motor)
+    mismatches = 0
+    for k in range(n):
+        if k % 100 == 0:
+            # 定期随机改动静态字段并 rebase，覆盖 q 以外的部分
+            cmd.mode_pr, cmd.mode_machine = int(rng.integers(0, 2)), int(rng.integers(0, 256))
+            for m in cmd.motor_cmd:
+                m.mode, m.kp, m.kd = int(rng.integers(0, 2)), float(rng.uniform(0, 200)), float(rng.uniform(0, 5))
+                m.dq, m.tau = float(rng.uniform(-1, 1)), float(rng.uniform(-10, 10))
+            cmd.crc = int(rng.integers(0, 1 << 32))   # crc 字段本身不参与计算
+            enc.rebase()
+        q = rng.uniform(-3.2, 3.2, num_motor)
+        if k % 7 == 0:
+            q[rng.integers(0, num_motor)] = 0.0
+        q32 = q.astype(np.float32)
+        for m, qi in zip(cmd.motor_cmd, q32.tolist()):
+            m.q = qi
+        got = enc.update_q(q32)
+        if got != reference(cmd) or got != crc32_words(enc.buf):
+            mismatches += 1
+
+    reps = 2000 if reference is not _reference_crc else 100   # 纯 Python 对照很慢，少跑几次
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        reference(cmd)
+    t_ref = (time.perf_counter() - t0) / reps * 1e6
+    t0 = time.perf_counter()
+    for _ in range(20000):
+        enc.update_q(q32)
+    t_enc = (time.perf_counter() - t0) / 20000 * 1e6
+
+    print(f"对照 {label}：{n} 组，不一致 {mismatches}")
+    print(f"每次耗时：对照 {t_ref:.1f} us，LowCmdEncoder.update_q {t_enc:.1f} us")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LowCmdEncoder 与 SDK CRC 的逐位对比")
+    parser.add_argument("--n", type=int, default=2000)
+    args = parser.parse_args()
+    sys.exit(0 if self_check(args.n) else 1)
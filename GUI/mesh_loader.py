@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+URDF 可视几何加载：每个 link 的全部 visual 合并成一组 (vertices, faces, face_colors)
+
+不依赖 Qt/OpenGL，GUI 和 bench_suite.py 共用同一份加载逻辑。
+
+MeshCache 把合并后的结果存成 .npy（vertices float32 / faces int32 / face_colors float32），
+下次启动直接内存映射，不再解析 STL。每个 link 的缓存键由该 link 的
+visual 描述（几何类型、文件名、scale、origin、颜色）和所引用网格文件的大小 + mtime
+（或可选的内容哈希）算出，URDF 或 STL 改动后自动失效。未命中的 link 用线程池并行构建。
+MeshCache.stream 逐个产出已就绪的 link，GUI 启动时用它把占位骨架一个个换成真实网格。
+
+构建时顺带生成几级简化网格（LOD，顶点聚类，三角面数约为原来的 LOD_RATIOS 倍）存进同一条缓存，
+GUI 在拖拽/转动相机时换用低精度级别，见 MeshCache.load(lods=True) 和 pick_lod_level。
+
+    python3 mesh_loader.py [--workers 8] [--hash]    # 测冷启动 / 热启动耗时
+"""
+
+import os, sys, time, json, shutil, hashlib, argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import numpy as np
+import trimesh
+
+DEFAULT_RGBA = (0.7, 0.7, 0.7, 1.0)
+CACHE_VERSION = 2
+LOD_RATIOS = (0.3, 0.1, 0.03)   # 第 1.. 级相对原网格的三角面比例，第 0 级是原网格
+LOD_MIN_FACES = 64            # 面数低于此值的 link 不再简化
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "g1_gui", "meshes")
+
+
+def load_visual(vis, base_dir):
+    """单个 visual → 已应用 scale 和 origin 的 trimesh；不支持或加载失败返回 None"""
+    geom = vis.geometry
+    try:
+        if geom.mesh:
+            mesh_path = os.path.join(base_dir, geom.mesh.filename)
+            tri = trimesh.load(mesh_path, force='mesh')
+            if geom.mesh.scale:
+                tri.apply_scale(geom.mesh.scale)
+        elif geom.box:
+            tri = trimesh.creation.box(extents=geom.box.size)
+        elif geom.cylinder:
+            tri = trimesh.creation.cylinder(radius=geom.cylinder.radius, height=geom.cylinder.length)
+        elif geom.sphere:
+            tri = trimesh.creation.icosphere(radius=geom.sphere.radius)
+        else:
+            return None
+        if vis.origin is not None:
+            tri.apply_transform(vis.origin)
+    except Exception:
+        return None
+    return tri
+
+
+def load_link_mesh(link_obj, base_dir):
+    """合并一个 link 的所有 visual，返回 (vertices, faces, face_colors)；没有可用几何返回 None"""
+    vertices, faces, face_colors, v_offset = [], [], [], 0
+    for vis in link_obj.visuals:
+        tri = load_visual(vis, base_dir)
+        if tri is None:
+            continue
+        v, f = tri.vertices, tri.faces
+        vertices.append(v)
+        faces.append(f + v_offset)
+        rgba = vis.material.color.rgba if (vis.material and vis.material.color) else DEFAULT_RGBA
+        face_colors.append(np.tile(rgba, (f.shape[0], 1)))
+        v_offset += v.shape[0]
+
+    if not vertices:
+        return None
+    # 与 GLMeshItem 内部使用的精度一致，缓存也按这个格式存
+    return (np.vstack(vertices).astype(np.float32),
+            np.vstack(faces).astype(np.int32),
+            np.vstack(face_colors).astype(np.float32))
+
+
+def load_link_meshes(robot, base_dir):
+    """{link_name: (vertices, faces, face_colors)}，按 robot.link_map 的顺序"""
+    meshes = {}
+    for link_name, link_obj in robot.link_map.items():
+        mesh = load_link_mesh(link_obj, base_dir)
+        if mesh is not None:
+            meshes[link_name] = mesh
+    return meshes
+
+
+# ---------------- 网格简化（LOD） ----------------
+def _cluster(vertices, faces, cell):
+    """按边长 cell 的网格聚类顶点，返回 (每个顶点所属的簇, 簇数, 去掉退化和重复后保留的原面下标)"""
+    keys = np.floor((vertices - vertices.min(axis=0)) / cell).astype(np.int64)
+    dims = keys.max(axis=0) + 1
+    flat = keys[:, 0] + dims[0] * (keys[:, 1] + dims[1] * keys[:, 2])
+    uniq, inv = np.unique(flat, return_inverse=True)
+    inv = inv.ravel()
+    f = inv[faces]
+    keep = np.flatnonzero((f[:, 0] != f[:, 1]) & (f[:, 1] != f[:, 2]) & (f[:, 0] != f[:, 2]))
+    # 合并后重复的三角形（不计顶点顺序）只留第一个；三个簇号编码成一个 int64 去重
+    s = np.sort(f[keep], axis=1)
+    n = len(uniq)
+    _, first = np.unique((s[:, 0] * n + s[:, 1]) * n + s[:, 2], return_index=True)
+    return inv, n, keep[np.sort(first)]
+
+
+def decimate(vertices, faces, face_colors, target_faces, iters=8):
+    """
+    顶点聚类简化到不超过 target_faces 个三角面（对格子边长二分查找）。
+    比二次误差简化粗糙，但只用 NumPy、速度快，交互时的低精度显示够用。
+    """
+    if faces.shape[0] <= target_faces:
+        return vertices, faces, face_colors
+    v = np.asarray(vertices, dtype=np.float64)
+    f = np.asarray(faces)
+    extent = float(np.ptp(v, axis=0).max()) or 1.0
+    lo, hi = np.log(extent / 1024), np.log(extent)   # 在对数空间二分格子边长
+    best = None
+    for _ in range(iters):
+        mid = 0.5 * (lo + hi)
+        inv, n, kept = _cluster(v, f, np.exp(mid))
+        if len(kept) <= target_faces:
+            hi = mid
+            if best is None or len(kept) > len(best[2]):
+                best = (inv, n, kept)
+        else:
+            lo = mid
+    if best is None or len(best[2]) == 0:
+        return vertices, faces, face_colors
+    inv, n, kept = best
+    # 簇内顶点取均值，再去掉没被保留面引用的簇
+    counts = np.bincount(inv, minlength=n)
+    merged = np.stack([np.bincount(inv, weights=v[:, axis], minlength=n) for axis in range(3)], axis=1)
+    merged /= np.maximum(counts, 1)[:, None]
+    new_faces = inv[f[kept]]
+    used, remap = np.unique(new_faces, return_inverse=True)
+    return (merged[used].astype(np.float32),
+            remap.reshape(new_faces.shape).astype(np.int32),
+            np.ascontiguousarray(face_colors[kept], dtype=np.float32))
+
+
+def build_lods(mesh, ratios=LOD_RATIOS):
+    """[原网格, 第 1 级, ...]；面数已经很少的 link 各级直接复用上一级"""
+    levels = [mesh]
+    n = mesh[1].shape[0]
+    for ratio in ratios:
+        target = max(int(n * ratio), LOD_MIN_FACES)
+        prev = levels[-1]
+        levels.append(prev if prev[1].shape[0] <= target else decimate(*prev, target))
+    return levels
+
+
+def pick_lod_level(lod_meshes, budget):
+    """
+    lod_meshes：{link: [各级网格]}。返回全身三角面总数不超过 budget 的最精细级别
+    （0 表示原网格；都超出时返回最粗的一级）。
+    """
+    if not lod_meshes:
+        return 0
+    n_levels = min(len(levels) for levels in lod_meshes.values())
+    for level in range(n_levels):
+        if sum(levels[level][1].shape[0] for levels in lod_meshes.values()) <= budget:
+            return level
+    return n_levels - 1
+
+
+# ---------------- 磁盘缓存 ----------------
+def _visual_signature(vis, base_dir, hash_files):
+    geom = vis.geometry
+    sig = {"origin": None if vis.origin is None else np.asarray(vis.origin).round(12).tolist()}
+    if geom.mesh:
+        path = os.path.join(base_dir, geom.mesh.filename)
+        sig["mesh"] = geom.mesh.filename
+        sig["scale"] = None if geom.mesh.scale is None else np.asarray(geom.mesh.scale).tolist()
+        try:
+            st = os.stat(path)
+            if hash_files:
+                with open(path, "rb") as f:
+                    sig["file"] = hashlib.sha1(f.read()).hexdigest()
+            else:
+                sig["file"] = [st.st_size, st.st_mtime_ns]
+        except OSError:
+            sig["file"] = None
+    elif geom.box:
+        sig["box"] = np.asarray(geom.box.size).tolist()
+    elif geom.cylinder:
+        sig["cylinder"] = [geom.cylinder.radius, geom.cylinder.length]
+    elif geom.sphere:
+        sig["sphere"] = geom.sphere.radius
+    if vis.material and vis.material.color:
+        sig["rgba"] = np.asarray(vis.material.color.rgba).tolist()
+    return sig
+
+
+def link_cache_key(link_name, link_obj, base_dir, hash_files=False):
+    payload = json.dumps([CACHE_VERSION, LOD_RATIOS, LOD_MIN_FACES, link_name,
+                          [_visual_signature(v, base_dir, hash_files) for v in link_obj.visuals]],
+                         sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:20]
+
+
+_PARTS = ("v", "f", "c")
+
+
+def _save(path, arr):
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)  # 原子替换，中断时不会留下半个文件
+
+
+def _build_entry(args):
+    """线程/进程池任务：解析一个 link 的网格并生成各级 LOD，写入缓存，返回各级结果"""
+    link_obj, base_dir, prefix = args
+    mesh = load_link_mesh(link_obj, base_dir)
+    if mesh is None:
+        # 记一个空标记，下次不再尝试（文件出现或 mtime 变化后键会变）
+        open(prefix + ".none", "wb").close()
+        return None
+    levels = build_lods(mesh)
+    # 各级按行拼接成一个文件（每个 part 一次映射），.n.npy 记每级的行数；它最后写，读取时以它判断条目是否完整
+    for i, part in enumerate(_PARTS):
+        _save(f"{prefix}.{part}.npy", np.concatenate([level[i] for level in levels]))
+    _save(f"{prefix}.n.npy", np.array([[level[i].shape[0] for i in range(3)] for level in levels], dtype=np.int64))
+    return levels
+
+
+class MeshCache:
+    def __init__(self, cache_dir=None, workers=None, hash_files=False, processes=False):
+        self.cache_dir = cache_dir or os.environ.get("G1_MESH_CACHE", DEFAULT_CACHE_DIR)
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.hash_files = hash_files
+        self.processes = processes
+        self.hits = self.misses = 0
+
+    def _read(self, prefix, lods):
+        if os.path.exists(prefix + ".none"):
+            return None, True
+        try:
+            rows = np.load(prefix + ".n.npy")
+            # copy-on-write 映射：只读文件页按需载入，下游即使原地修改也不会写回缓存
+            data = [np.load(f"{prefix}.{part}.npy", mmap_mode="c") for part in _PARTS]
+        except (OSError, ValueError):
+            return None, False
+        ends = np.cumsum(rows, axis=0)
+        starts = ends - rows
+        n_levels = len(rows) if lods else 1
+        return [tuple(arr[starts[level, i]:ends[level, i]] for i, arr in enumerate(data))
+                for level in range(n_levels)], True
+
+    def stream(self, robot, base_dir, lods=False):
+        """
+        逐个产出 (link_name, 网格)，格式同 load 的值：先是缓存命中的（link_map 顺序），
+        再是未命中的（线程/进程池构建，哪个先完成先产出）。没有几何的 link 不产出。
+        GUI 用它边加载边显示；hits / misses 在第一次取值时就已统计好。
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = self.misses = 0
+        found_meshes, todo = [], []
+        for link_name, link_obj in robot.link_map.items():
+            if not link_obj.visuals:
+                continue
+            prefix = os.path.join(self.cache_dir, link_cache_key(link_name, link_obj, base_dir, self.hash_files))
+            mesh, found = self._read(prefix, lods)
+            if found:
+                self.hits += 1
+                found_meshes.append((link_name, mesh))
+            else:
+                self.misses += 1
+                todo.append((link_name, (link_obj, base_dir, prefix)))
+
+        for link_name, mesh in found_meshes:
+            if mesh is not None:
+                yield link_name, mesh if lods else mesh[0]
+        if todo:
+            pool_cls = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+            with pool_cls(max_workers=min(self.workers, len(todo))) as pool:
+                futures = {pool.submit(_build_entry, args): link_name for link_name, args in todo}
+                for future in as_completed(futures):
+                    mesh = future.result()
+                    if mesh is not None:
+                        yield futures[future], mesh if lods else mesh[0]
+
+    def load(self, robot, base_dir, lods=False):
+        """
+        与 load_link_meshes 返回相同的字典；命中的 link 是内存映射数组。
+        lods=True 时每个 link 对应 [原网格, LOD 1, ...] 列表。
+        """
+        results = dict(self.stream(robot, base_dir, lods))
+        # 保持 link_map 顺序
+        return {name: results[name] for name in robot.link_map if name in results}
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+# ---------------- 冷 / 热启动计时 ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="网格缓存冷/热启动计时")
+    parser.add_argument("--urdf", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "g1_29dof.urdf"))
+    parser.add_argument("--cache-dir", default=None, help="默认用临时目录，不动正式缓存")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--processes", action="store_true", help="用进程池构建")
+    parser.add_argument("--hash", action="store_true", help="按文件内容哈希而不是 mtime 判断失效")
+    args = parser.parse_args(argv)
+
+    import tempfile
+    from yourdfpy import URDF
+    base_dir = os.path.dirname(args.urdf)
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="g1_mesh_cache_")
+
+    def startup(cache):
+        t0 = time.perf_counter()
+        robot = URDF.load(args.urdf, mesh_dir=base_dir, load_meshes=False)
+        t1 = time.perf_counter()
+        meshes = cache.load(robot, base_dir) if cache is not None else load_link_meshes(robot, base_dir)
+        t2 = time.perf_counter()
+        return meshes, t1 - t0, t2 - t1
+
+    cache = MeshCache(cache_dir, args.workers, args.hash, args.processes)
+    cache.clear()
+    rows = []
+    meshes, t_urdf, t_mesh = startup(None)
+    rows.append(("无缓存（串行）", t_urdf, t_mesh, "-"))
+    _, t_urdf, t_mesh = startup(cache)
+    rows.append((f"冷启动（{'进程' if args.processes else '线程'}池 {cache.workers}）", t_urdf, t_mesh,
+                 f"{cache.hits}/{cache.misses}"))
+    warm, t_urdf, t_mesh = startup(cache)
+    rows.append(("热启动", t_urdf, t_mesh, f"{cache.hits}/{cache.misses}"))
+
+    faces = sum(m[1].shape[0] for m in meshes.values())
+    print(f"{len(meshes)} 个 link，{faces} 个三角面；缓存目录 {cache_dir}")
+    lod = cache.load(URDF.load(args.urdf, mesh_dir=base_dir, load_meshes=False), base_dir, lods=True)
+    print("各级 LOD 三角面：" + "，".join(
+        f"L{level} {sum(levels[level][1].shape[0] for levels in lod.values())}" for level in range(len(LOD_RATIOS) + 1)))
+    print(f"{'':<22}{'URDF ms':>10}{'网格 ms':>10}{'命中/未命中':>12}")
+    for label, a, b, hm in rows:
+        print(f"{label:<22}{a * 1e3:>10.1f}{b * 1e3:>10.1f}{hm:>12}")
+    same = all(np.array_equal(meshes[k][i], warm[k][i]) for k in meshes for i in range(3)) and meshes.keys() == warm.keys()
+    print("热启动结果与直接加载一致" if same else "热启动结果与直接加载不一致！")
+    if args.cache_dir is None:
+        cache.clear()
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
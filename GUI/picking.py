@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU 射线拾取
+
+替代 GL 的 itemsAt 选择模式：鼠标位置反投影成一条射线，在 CPU 上求最近的命中 link。
+包围体层次分三级，每级都是 NumPy 批量计算：
+    整机    每个 link 的包围盒（在 link 自身坐标系，射线逆变换过去再测）
+    link    三角形按质心 Morton 码排序后每 LEAF_SIZE 个一簇，每簇一个包围盒
+    三角形  只对射线穿过的簇做 Möller–Trumbore
+按包围盒入点距离从近到远检查 link，已经有更近的命中就提前结束。
+link 级的包围体在射线第一次进入该 link 包围盒时才构建，不占启动时间。
+
+    python3 picking.py    # 与逐三角形暴力求交对比 + 单次拾取耗时
+"""
+
+import sys, time
+import numpy as np
+
+LEAF_SIZE = 32
+_EPS = 1e-12
+
+
+def _slab(origin, inv_dir, lo, hi):
+    """
+    射线与一批轴对齐包围盒求交，返回 (t_enter, 是否命中)。
+    lo/hi 按分量存放 (3, N)；origin/inv_dir 为 (3, 1) 或每个盒子各一条射线的 (3, N)。
+    """
+    t1 = (lo - origin) * inv_dir
+    t2 = (hi - origin) * inv_dir
+    near, far = np.minimum(t1, t2), np.maximum(t1, t2)
+    # 逐分量比较，避免在长度为 3 的轴上做归约（小数组上慢得多）
+    t_enter = np.maximum(np.maximum(near[0], near[1]), np.maximum(near[2], 0.0))
+    t_exit = np.minimum(np.minimum(far[0], far[1]), far[2])
+    return t_enter, t_enter <= t_exit
+
+
+def _inv(direction):
+    with np.errstate(divide="ignore"):
+        return 1.0 / np.where(direction == 0.0, _EPS, direction)
+
+
+def _morton_order(points):
+    """按 10 位量化的 Morton 码排序，空间上相邻的三角形落在同一簇"""
+    lo = points.min(axis=0)
+    span = np.ptp(points, axis=0)
+    q = ((points - lo) / np.where(span > 0, span, 1.0) * 1023).astype(np.uint32)
+    code = np.zeros(len(points), dtype=np.uint32)
+    for bit in range(10):
+        for axis in range(3):
+            code |= ((q[:, axis] >> bit) & 1) << (3 * bit + axis)
+    return np.argsort(code, kind="stable")
+
+
+class LinkBVH:
+    """单个 link 网格（link 坐标系）的两级包围体：簇包围盒 + 三角形"""
+
+    def __init__(self, vertices, faces, leaf_size=LEAF_SIZE):
+        tri = np.asarray(vertices, dtype=np.float64)[np.asarray(faces)]     # (F, 3, 3)
+        tri = tri[_morton_order(tri.mean(axis=1))]
+        n = len(tri)
+        n_leaf = -(-n // leaf_size)
+        starts = np.arange(0, n, leaf_size)
+        self.leaf_lo = np.ascontiguousarray(np.minimum.reduceat(tri.min(axis=1), starts).T)   # (3, 簇数)
+        self.leaf_hi = np.ascontiguousarray(np.maximum.reduceat(tri.max(axis=1), starts).T)
+        self.lo = self.leaf_lo.min(axis=1)
+        self.hi = self.leaf_hi.max(axis=1)
+        # 每簇按分量连续存放 (簇, 9, leaf_size)：v0 xyz, e1 xyz, e2 xyz；末簇补零（退化三角形，永不命中）
+        soa = np.zeros((n_leaf * leaf_size, 9))
+        soa[:n, 0:3] = tri[:, 0]
+        soa[:n, 3:6] = tri[:, 1] - tri[:, 0]
+        soa[:n, 6:9] = tri[:, 2] - tri[:, 0]
+        self._tri = np.ascontiguousarray(soa.reshape(n_leaf, leaf_size, 9).transpose(0, 2, 1))
+        self.n_faces = n
+
+    def intersect(self, origin, direction, t_max=np.inf):
+        """最近命中距离（射线参数 t），没有比 t_max 更近的命中时返回 None"""
+        t_enter, hit = _slab(origin[:, None], _inv(direction)[:, None], self.leaf_lo, self.leaf_hi)
+        leaves = np.flatnonzero(hit & (t_enter < t_max))
+        if len(leaves) == 0:
+            return None
+        # Möller–Trumbore（不剔除背面），按分量展开；小批量下比 np.cross/einsum 少很多调用开销
+        v0x, v0y, v0z, e1x, e1y, e1z, e2x, e2y, e2z = self._tri[leaves].transpose(1, 0, 2)
+        dx, dy, dz = direction.tolist()
+        ox, oy, oz = origin.tolist()
+        px, py, pz = dy * e2z - dz * e2y, dz * e2x - dx * e2z, dx * e2y - dy * e2x
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_det = 1.0 / (e1x * px + e1y * py + e1z * pz)   # 退化/平行时为 inf，下面的比较自然不成立
+            sx, sy, sz = ox - v0x, oy - v0y, oz - v0z
+            u = (sx * px + sy * py + sz * pz) * inv_det
+            qx, qy, qz = sy * e1z - sz * e1y, sz * e1x - sx * e1z, sx * e1y - sy * e1x
+            v = (dx * qx + dy * qy + dz * qz) * inv_det
+            t = (e2x * qx + e2y * qy + e2z * qz) * inv_det
+            ok = (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > 0.0) & (t < t_max)
+        if not ok.any():
+            return None
+        return float(t[ok].min())
+
+
+class Picker:
+    """整机拾取：meshes 为 {link: (vertices, faces, ...)}，变换每次拾取时由调用方给出"""
+
+    def __init__(self, meshes, leaf_size=LEAF_SIZE):
+        self.link_names = list(meshes)
+        self.leaf_size = leaf_size
+        self._meshes = [(m[0], m[1]) for m in meshes.values()]
+        self.bvh = [None] * len(self._meshes)   # 按需构建
+        self.lo = np.array([np.asarray(v).min(axis=0) for v, _ in self._meshes], dtype=np.float64).T  # (3, link 数)
+        self.hi = np.array([np.asarray(v).max(axis=0) for v, _ in self._meshes], dtype=np.float64).T
+
+    def link_bvh(self, i):
+        bvh = self.bvh[i]
+        if bvh is None:
+            bvh = self.bvh[i] = LinkBVH(*self._meshes[i], self.leaf_size)
+        return bvh
+
+    def build_all(self):
+        for i in range(len(self.bvh)):
+            self.link_bvh(i)
+
+    def pick(self, origin, direction, transforms):
+        """
+        origin/direction：base 坐标系下的射线（direction 需为单位向量）。
+        transforms：(N, 4, 4)，与 self.link_names 一一对应的 link 位姿。
+        返回 (最近命中的 link 名, 距离)；没命中返回 (None, inf)。
+        """
+        rot = transforms[:, :3, :3]
+        # 刚体变换的逆：R^T (o - p)，方向只转不平移，长度不变所以 t 在各坐标系下相同
+        local_o = np.einsum("nji,nj->ni", rot, origin - transforms[:, :3, 3])
+        local_d = np.einsum("nji,j->ni", rot, direction)
+        t_enter, hit = _slab(local_o.T, _inv(local_d).T, self.lo, self.hi)
+        best, best_t = None, np.inf
+        for i in np.flatnonzero(hit)[np.argsort(t_enter[hit])].tolist():
+            if t_enter[i] >= best_t:
+                break   # 后面的 link 包围盒都更远
+            t = self.link_bvh(i).intersect(local_o[i], local_d[i], best_t)
+            if t is not None:
+                best, best_t = self.link_names[i], t
+        return best, best_t
+
+
+def ray_from_ndc(inv_mvp, x, y):
+    """NDC 坐标 (x, y) 经逆 MVP 反投影到近/远裁剪面，返回 base 坐标系下的 (起点, 单位方向)"""
+    near = inv_mvp @ np.array([x, y, -1.0, 1.0])
+    far = inv_mvp @ np.array([x, y, 1.0, 1.0])
+    near = near[:3] / near[3]
+    far = far[:3] / far[3]
+    d = far - near
+    return near, d / np.linalg.norm(d)
+
+
+# ---------------- 对比 ----------------
+def _brute_force(meshes, transforms, origin, direction):
+    """对照：变换到 base 坐标系后逐三角形求交（np.cross 写法，不经过包围体）"""
+    best, best_t = None, np.inf
+    for (name, m), T in zip(meshes.items(), transforms):
+        tri = np.asarray(m[0], dtype=np.float64)[np.asarray(m[1])] @ T[:3, :3].T + T[:3, 3]
+        e1, e2 = tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]
+        p = np.cross(direction, e2)
+        det = (e1 * p).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s = origin - tri[:, 0]
+            u = (s * p).sum(axis=1) / det
+            q = np.cross(s, e1)
+            v = (q @ direction) / det
+            t = (e2 * q).sum(axis=1) / det
+        ok = (np.abs(det) > _EPS) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > 0)
+        if ok.any() and t[ok].min() < best_t:
+            best, best_t = name, float(t[ok].min())
+    return best, best_t
+
+
+def self_check(urdf_path="g1_29dof.urdf", n=300, seed=0):
+    import os
+    from yourdfpy import URDF
+    from kinematics import KinematicTree
+    from mesh_loader import MeshCache
+
+    robot = URDF.load(urdf_path, load_meshes=False)
+    base_dir = os.path.dirname(os.path.abspath(urdf_path))
+    meshes = MeshCache().load(robot, base_dir)
+    if not meshes:
+        print(f"{base_dir} 下没有可用网格，无法对比")
+        return False
+    kin = KinematicTree(robot)
+    t0 = time.perf_counter()
+    picker = Picker(meshes)
+    t_init = (time.perf_counter() - t0) * 1e3
+    picker.build_all()
+    t_build = (time.perf_counter() - t0) * 1e3 - t_init
+    idx = np.array([kin.link_index[name] for name in picker.link_names])
+
+    rng = np.random.default_rng(seed)
+    mismatches, hits, samples = 0, 0, []
+    for k in range(n):
+        if k % 10 == 0:
+            kin.update({name: float(rng.uniform(-0.5, 0.5)) for name in kin.joint_of})
+        transforms = kin.world[idx]
+        # 从 2 m 外随机方向射向某个 link 附近（一半左右能命中）
+        target = transforms[rng.integers(len(idx)), :3, 3] + rng.normal(scale=0.03, size=3)
+        d = rng.normal(size=3)
+        d /= np.linalg.norm(d)
+        origin = target - 2.0 * d
+        t1 = time.perf_counter()
+        got = picker.pick(origin, d, transforms)
+        samples.append(time.perf_counter() - t1)
+        ref = _brute_force(meshes, transforms, origin, d)
+        hits += got[0] is not None
+        # 比较距离而不是名字：重合的网格（替身 STL 常见）距离相同，取哪个都对
+        if (got[0] is None) != (ref[0] is None) or (got[0] is not None and abs(got[1] - ref[1]) > 1e-9):
+            mismatches += 1
+    faces = sum(b.n_faces for b in picker.bvh)
+    print(f"{len(picker.link_names)} 个 link，{faces} 个三角面；初始化 {t_init:.1f} ms，全部包围体构建 {t_build:.1f} ms")
+    print(f"{n} 条随机射线（命中 {hits}）：与暴力求交不一致 {mismatches}；"
+          f"单次拾取 p50 {np.median(samples) * 1e6:.0f} us，max {np.max(samples) * 1e6:.0f} us")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check(*sys.argv[1:2]) else 1)
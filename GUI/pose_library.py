@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姿态库：一个 N × 29 float32 的内存映射数组文件 + 名字/标签索引
+
+目录结构：
+    meta.json   关节名顺序（创建时写一次）
+    poses.f32   行主序裸数组，没有文件头，行数由文件大小得出；追加只写文件末尾
+    index.tsv   每行一条 “名字<TAB>标签1,标签2”，与 poses.f32 的行一一对应，同样只追加
+先写数组再写索引；打开时以两者中较短的为准，追加到一半被打断时多出的部分截掉。
+按下标或名字取姿态都是 O(1)：数组行直接从映射里切，名字 → 下标的 dict 在打开时建一次。
+
+最近邻（关节空间欧氏距离）：scipy cKDTree 建在前 n_tree 行上，之后追加的行暴力比较，
+尾部超过 REBUILD_TAIL 行时 index_stale 为真，需要重建。
+29 维里查询点离库内姿态分布较远时 KD 树要剪很多枝（几十毫秒），GUI 用 NearestWorker
+在后台线程里查询和重建，cKDTree 的构建/查询都释放 GIL，不卡界面。
+
+    python3 pose_library.py demo [--n 1000000]        # 合成姿态库：追加 / 打开 / 建树 / 查询耗时
+    python3 pose_library.py add LIB a.npy [...] [--tags t1,t2]
+    python3 pose_library.py query LIB target_pose.npy [-k 5]
+命令行读写的 .npy 与 target_pose.npy 相同，是电机顺序（pose_state.motor_joints），进出库时换成库的 control_joints 顺序。
+"""
+
+import os, sys, json, time, queue, argparse, threading
+import numpy as np
+
+META_FILE  = "meta.json"
+DATA_FILE  = "poses.f32"
+INDEX_FILE = "index.tsv"
+REBUILD_TAIL = 4096   # 未进树的尾部超过这么多行就该重建
+LEAF_SIZE = 32
+
+
+def _check_text(value, what, forbidden):
+    if not value or any(c in value for c in forbidden):
+        raise ValueError(f"{what}不能为空，也不能包含 {forbidden!r}：{value!r}")
+    return value
+
+
+class PoseLibrary:
+    def __init__(self, path, joint_names=None):
+        """打开姿态库目录；不存在时用 joint_names 新建"""
+        self.path = os.path.abspath(path)
+        meta_path = os.path.join(self.path, META_FILE)
+        if not os.path.exists(meta_path):
+            if joint_names is None:
+                raise FileNotFoundError(f"{self.path} 不是姿态库，新建需要给出 joint_names")
+            os.makedirs(self.path, exist_ok=True)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"joint_names": list(joint_names), "dtype": "float32"}, f, ensure_ascii=False, indent=1)
+        with open(meta_path, encoding="utf-8") as f:
+            self.joint_names = json.load(f)["joint_names"]
+        if joint_names is not None and list(joint_names) != self.joint_names:
+            raise ValueError(f"{self.path} 的关节顺序与当前不同")
+        self.dim = len(self.joint_names)
+        self._row_bytes = self.dim * 4
+        self._data_path = os.path.join(self.path, DATA_FILE)
+        self._index_path = os.path.join(self.path, INDEX_FILE)
+        self._lock = threading.Lock()    # 追加与重新映射
+        self._load_index()
+        self._data = open(self._data_path, "ab")
+        self._index = open(self._index_path, "a", encoding="utf-8", newline="\n")
+        self._mm = None
+        self._tree = None                # (cKDTree, 建树时的行数)
+
+    # ---------------- 打开 ----------------
+    def _load_index(self):
+        n_rows = os.path.getsize(self._data_path) // self._row_bytes if os.path.exists(self._data_path) else 0
+        try:
+            with open(self._index_path, encoding="utf-8", newline="\n") as f:
+                text = f.read()
+        except FileNotFoundError:
+            text = ""
+        n_lines = text.count("\n")   # 最后一个换行之后若还有内容，是写了一半的行
+        n = min(n_rows, n_lines)
+        if n == n_lines:
+            end = text.rfind("\n") + 1
+        else:
+            end = 0
+            for _ in range(n):
+                end = text.index("\n", end) + 1
+        if end != len(text):
+            text = text[:end]
+            with open(self._index_path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(text)
+        if os.path.exists(self._data_path) and os.path.getsize(self._data_path) != n * self._row_bytes:
+            os.truncate(self._data_path, n * self._row_bytes)
+
+        # 每行恰好一个 TAB：整体换成换行再切一次，奇偶位置即名字/标签，省掉逐行 split
+        fields = text[:-1].replace("\t", "\n").split("\n") if text else []
+        self.names = fields[0::2]
+        self.tags = fields[1::2]
+        self.name_index = dict(zip(self.names, range(n)))
+        self._tag_index = None   # 标签 → 下标列表，第一次按标签查时再建
+        self._n = n
+
+    def _index_rows(self, names, tags):
+        start = len(self.names)
+        self.names.extend(names)
+        self.tags.extend([tags] * len(names))
+        self.name_index.update(zip(names, range(start, start + len(names))))
+        if self._tag_index is not None:
+            for tag in filter(None, tags.split(",")):
+                self._tag_index.setdefault(tag, []).extend(range(start, start + len(names)))
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+        self._mm = None
+
+    def __len__(self):
+        return self._n
+
+    # ---------------- 读取 ----------------
+    @property
+    def poses(self):
+        """(N, dim) 只读映射；追加后下次访问时重新映射（不复制数据）"""
+        mm = self._mm
+        if mm is None or len(mm) != self._n:
+            with self._lock:
+                if self._n == 0:
+                    mm = np.empty((0, self.dim), dtype=np.float32)
+                else:
+                    mm = np.memmap(self._data_path, dtype=np.float32, mode="r", shape=(self._n, self.dim))
+                self._mm = mm
+        return mm
+
+    def get(self, i):
+        return self.poses[i]
+
+    def find(self, name):
+        """名字 → 下标，没有返回 None"""
+        return self.name_index.get(name)
+
+    def with_tag(self, tag):
+        if self._tag_index is None:
+            index = {}
+            for i, tags in enumerate(self.tags):
+                for t in filter(None, tags.split(",")):
+                    index.setdefault(t, []).append(i)
+            self._tag_index = index
+        return self._tag_index.get(tag, [])
+
+    # ---------------- 追加 ----------------
+    def append(self, pose, name=None, tags=()):
+        return self.extend(np.asarray(pose, dtype=np.float32)[None], None if name is None else [name], tags)[0]
+
+    def extend(self, poses, names=None, tags=()):
+        """批量追加，tags 对每一行相同；返回新行的下标 range。名字重复时报错"""
+        poses = np.ascontiguousarray(poses, dtype=np.float32)
+        if poses.ndim != 2 or poses.shape[1] != self.dim:
+            raise ValueError(f"姿态形状应为 (n, {self.dim})，实际 {poses.shape}")
+        if not np.all(np.isfinite(poses)):
+            raise ValueError("姿态含 NaN/Inf")
+        start = self._n
+        if names is None:
+            names = [f"pose_{i}" for i in range(start, start + len(poses))]
+        names = [_check_text(str(n), "名字", "\t\n") for n in names]
+        if len(names) != len(poses) or len(set(names)) != len(names) or any(n in self.name_index for n in names):
+            raise ValueError("名字数量不符或有重复")
+        tag_str = ",".join(_check_text(str(t), "标签", "\t\n,") for t in tags)
+        with self._lock:
+            self._data.write(poses.tobytes())
+            self._data.flush()
+            self._index.write("".join(f"{n}\t{tag_str}\n" for n in names))
+            self._index.flush()
+            self._index_rows(names, tag_str)
+            self._n += len(poses)
+        return range(start, self._n)
+
+    # ---------------- 最近邻 ----------------
+    @property
+    def n_indexed(self):
+        """已进 KD 树的行数"""
+        tree = self._tree
+        return tree[1] if tree is not None else 0
+
+    @property
+    def index_stale(self):
+        return self._n - self.n_indexed > REBUILD_TAIL
+
+    def build_index(self):
+        """对当前所有行建 KD 树（可在后台线程调用，建好后原子替换）"""
+        from scipy.spatial import cKDTree
+        n = self._n
+        t0 = time.perf_counter()
+        tree = cKDTree(self.poses[:n], leafsize=LEAF_SIZE, balanced_tree=False, compact_nodes=False)
+        self._tree = (tree, n)
+        return time.perf_counter() - t0
+
+    def nearest(self, pose, k=5):
+        """
+        返回 (距离, 下标)，按距离升序，最多 k 个。
+        树里的行用 KD 树查，建树之后追加的行暴力比较，两者合并。
+        """
+        pose = np.asarray(pose, dtype=np.float32)
+        n = self._n
+        tree = self._tree
+        n_tree = tree[1] if tree is not None else 0
+        dist = np.empty(0)
+        idx = np.empty(0, dtype=np.intp)
+        if n_tree:
+            kk = min(k, n_tree)
+            d, i = tree[0].query(pose, k=kk)
+            dist, idx = np.atleast_1d(d), np.atleast_1d(i)
+        if n > n_tree:
+            tail = self.poses[n_tree:n]
+            d = np.sqrt(((tail - pose) ** 2).sum(axis=1, dtype=np.float64))
+            if len(d) > k:
+                part = np.argpartition(d, k)[:k]
+            else:
+                part = np.arange(len(d))
+            dist = np.concatenate([dist, d[part]])
+            idx = np.concatenate([idx, part + n_tree])
+        order = np.argsort(dist, kind="stable")[:k]
+        return dist[order], idx[order]
+
+
+class NearestWorker(threading.Thread):
+    """
+    后台最近邻：submit 不阻塞，排队时只保留最新的查询姿态；尾部过长时先重建 KD 树再查。
+    on_result(dist, idx, 查询秒数) / on_indexed(建树秒数) 在本线程里调用，GUI 需自行转回主线程。
+    """
+
+    def __init__(self, library, k=5, on_result=None, on_indexed=None):
+        super().__init__(name="pose_library_nearest", daemon=True)
+        self.library = library
+        self.k = k
+        self.on_result = on_result
+        self.on_indexed = on_indexed
+        self._jobs = queue.Queue(maxsize=1)
+
+    def submit(self, pose):
+        try:
+            self._jobs.get_nowait()   # 丢掉还没开始的旧查询
+        except queue.Empty:
+            pass
+        self._jobs.put(np.array(pose, dtype=np.float32))
+
+    def stop(self):
+        self.submit(np.empty(0, dtype=np.float32))
+
+    def run(self):
+        while True:
+            pose = self._jobs.get()
+            if pose.size == 0:
+                break
+            if self.library.index_stale:
+                seconds = self.library.build_index()
+                if self.on_indexed is not None:
+                    self.on_indexed(seconds)
+            t0 = time.perf_counter()
+            dist, idx = self.library.nearest(pose, self.k)
+            if self.on_result is not None:
+                self.on_result(dist, idx, time.perf_counter() - t0)
+
+
+# ---------------- 命令行 ----------------
+def _synthetic_poses(n, dim, rng):
+    """低维潜变量 + 噪声：设计出来的姿态彼此高度相关，比均匀随机更接近真实分布"""
+    latent = rng.normal(size=(n, 6)).astype(np.float32)
+    mix = rng.normal(size=(6, dim)).astype(np.float32) * 0.3
+    return latent @ mix + rng.normal(scale=0.02, size=(n, dim)).astype(np.float32)
+
+
+def run_demo(n, k=5, n_queries=200, seed=0, dim=29):
+    import tempfile
+    rng = np.random.default_rng(seed)
+    ok = True
+    with tempfile.TemporaryDirectory() as d:
+        lib = PoseLibrary(os.path.join(d, "lib"), [f"j{i}" for i in range(dim)])
+        poses = _synthetic_poses(n, lib.dim, rng)
+        t0 = time.perf_counter()
+        for start in range(0, n, 100000):
+            lib.extend(poses[start:start + 100000], tags=("demo",))
+        t_extend = time.perf_counter() - t0
+        lib.close()
+
+        t0 = time.perf_counter()
+        lib = PoseLibrary(os.path.join(d, "lib"))
+        t_open = time.perf_counter() - t0
+        t_build = lib.build_index()
+
+        # 单条追加不重写文件：记录追加前后的文件大小
+        size0 = os.path.getsize(lib._data_path)
+        t0 = time.perf_counter()
+        for j in range(100):
+            lib.append(poses[j] + 0.001, name=f"extra_{j}", tags=("extra",))
+        t_append = (time.perf_counter() - t0) / 100
+        ok &= os.path.getsize(lib._data_path) == size0 + 100 * lib.dim * 4
+
+        t0 = time.perf_counter()
+        for j in rng.integers(len(lib), size=10000):
+            lib.get(lib.find(lib.names[j]))
+        t_lookup = (time.perf_counter() - t0) / 10000
+        ok &= list(lib.with_tag("extra")) == list(range(n, n + 100)) and len(lib.with_tag("demo")) == n
+
+        queries = poses[rng.integers(n, size=n_queries)] + rng.normal(scale=0.05, size=(n_queries, lib.dim)).astype(np.float32)
+        samples = []
+        for q in queries:
+            t0 = time.perf_counter()
+            dist, idx = lib.nearest(q, k)
+            samples.append(time.perf_counter() - t0)
+        # 对照：全量暴力求最近的 k 个（抽查几条）
+        all_poses = np.asarray(lib.poses)
+        t0 = time.perf_counter()
+        for q in queries[:5]:
+            ref = np.sqrt(((all_poses - q) ** 2).sum(axis=1, dtype=np.float64))
+            ref_idx = np.argsort(ref, kind="stable")[:k]
+            dist, idx = lib.nearest(q, k)
+            ok &= np.allclose(dist, ref[ref_idx], rtol=1e-5, atol=1e-6)
+        t_brute = (time.perf_counter() - t0) / 5
+        lib.close()
+
+    print(f"{n} 个姿态 × {lib.dim} 关节：批量追加 {t_extend:.2f} s，打开 {t_open * 1e3:.0f} ms，建树 {t_build:.2f} s")
+    print(f"单条追加 {t_append * 1e6:.0f} us（文件只增长不重写），按名字取姿态 {t_lookup * 1e6:.2f} us")
+    print(f"k={k} 最近邻：p50 {np.median(samples) * 1e3:.2f} ms，max {np.max(samples) * 1e3:.2f} ms；"
+          f"暴力对照约 {t_brute * 1e3:.0f} ms；结果一致 {'是' if ok else '否'}")
+    return bool(ok)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="G1 姿态库")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("demo", help="合成姿态库上测追加/查询耗时")
+    p.add_argument("--n", type=int, default=1000000)
+    p = sub.add_parser("add", help="把 .npy 姿态（29 或 N×29）追加进姿态库")
+    p.add_argument("library")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--tags", default="")
+    p = sub.add_parser("query", help="查与给定姿态最相似的库内姿态")
+    p.add_argument("library")
+    p.add_argument("pose")
+    p.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "demo":
+        return 0 if run_demo(args.n) else 1
+    if args.cmd == "add":
+        from pose_state import control_joints, control_from_motor
+        lib = PoseLibrary(args.library, control_joints)
+        tags = [t for t in args.tags.split(",") if t]
+        for path in args.files:
+            poses = np.atleast_2d(np.load(path))[:, control_from_motor]
+            stem = os.path.splitext(os.path.basename(path))[0]
+            names = [stem] if len(poses) == 1 else [f"{stem}_{j}" for j in range(len(poses))]
+            rows = lib.extend(poses, names, tags)
+            print(f"{path} → 第 {rows.start}..{rows.stop - 1} 行")
+        lib.close()
+        return 0
+    from pose_state import control_joints, control_from_motor
+    lib = PoseLibrary(args.library)
+    if lib.joint_names != control_joints:
+        print(f"{args.library} 的关节顺序不是 control_joints，无法换算 {args.pose}")
+        return 1
+    lib.build_index()
+    dist, idx = lib.nearest(np.load(args.pose)[control_from_motor], args.k)
+    for d, i in zip(dist.tolist(), idx.tolist()):
+        print(f"{d:8.4f}  #{i:<8} {lib.names[i]}  {lib.tags[i]}")
+    lib.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
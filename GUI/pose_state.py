@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姿态编辑状态 + 撤销/重做
+
+PoseState 把编辑中的姿态存成一个 float32 数组（顺序即 control_joints），
+关节名 → 下标的索引和上下限向量在构造时从 URDF 读一次，每次编辑后整体 np.clip 一次。
+
+DeltaHistory 只记每一步里变化了的关节：(下标 uint16, 旧值 float32, 新值 float32)，共 10 字节/关节，
+存在按需扩容的环形数组里；默认不限步数，设了 max_steps 时覆盖最旧的步。
+一次拖拽（按下到松开）是一步，通常只动 2~3 个关节，几千步也只有几十 KB。
+
+    python3 pose_state.py    # 随机编辑 + 撤销/重做一致性检查，打印内存占用
+"""
+
+import sys
+import numpy as np
+
+
+# 29 自由度 G1：GUI 编辑顺序（PoseState、按钮打印、姿态库）
+control_joints = [
+    # 下三路
+    "left_hip_pitch_joint", "left_hip_roll_joint", "left_hip_yaw_joint",
+    "left_knee_joint",
+    "left_ankle_pitch_joint", "left_ankle_roll_joint",
+    "right_hip_pitch_joint", "right_hip_roll_joint", "right_hip_yaw_joint",
+    "right_knee_joint",
+    "right_ankle_pitch_joint", "right_ankle_roll_joint",
+    # 小蛮腰
+    "waist_yaw_joint", "waist_roll_joint", "waist_pitch_joint",
+    # 上肢
+    "left_shoulder_pitch_joint", "left_shoulder_roll_joint", "left_shoulder_yaw_joint",
+    "left_elbow_joint",
+    "right_shoulder_pitch_joint", "right_shoulder_roll_joint", "right_shoulder_yaw_joint",
+    "right_elbow_joint",
+    "left_wrist_yaw_joint", "left_wrist_pitch_joint", "left_wrist_roll_joint",
+    "right_wrist_yaw_joint", "right_wrist_pitch_joint", "right_wrist_roll_joint",
+]
+
+# LowCmd.motor_cmd[i] / LowState.motor_state[i] 的关节（与 robot_control.G1JointIndex 一致）。
+# 机器人按电机下标执行，target_pose.npy、网络姿态流、轨迹 .npz 的列都是这个顺序；上肢部分与 control_joints 不同
+motor_joints = [
+    "left_hip_pitch_joint", "left_hip_roll_joint", "left_hip_yaw_joint",
+    "left_knee_joint",
+    "left_ankle_pitch_joint", "left_ankle_roll_joint",
+    "right_hip_pitch_joint", "right_hip_roll_joint", "right_hip_yaw_joint",
+    "right_knee_joint",
+    "right_ankle_pitch_joint", "right_ankle_roll_joint",
+    "waist_yaw_joint", "waist_roll_joint", "waist_pitch_joint",
+    "left_shoulder_pitch_joint", "left_shoulder_roll_joint", "left_shoulder_yaw_joint",
+    "left_elbow_joint",
+    "left_wrist_roll_joint", "left_wrist_pitch_joint", "left_wrist_yaw_joint",
+    "right_shoulder_pitch_joint", "right_shoulder_roll_joint", "right_shoulder_yaw_joint",
+    "right_elbow_joint",
+    "right_wrist_roll_joint", "right_wrist_pitch_joint", "right_wrist_yaw_joint",
+]
+
+# 下标换算：q_motor = q_control[motor_from_control]，q_control = q_motor[control_from_motor]
+motor_from_control = np.array([control_joints.index(name) for name in motor_joints], dtype=np.intp)
+control_from_motor = np.array([motor_joints.index(name) for name in control_joints], dtype=np.intp)
+
+
+def urdf_limits(robot, names):
+    """按 names 顺序取 URDF 的 <limit>：(下限, 上限, 速度上限)；没有限位的关节按 ±π、速度不限"""
+    lower, upper, velocity = [], [], []
+    for name in names:
+        lim = robot.joint_map[name].limit
+        lower.append(lim.lower if lim is not None and lim.lower is not None else -np.pi)
+        upper.append(lim.upper if lim is not None and lim.upper is not None else np.pi)
+        velocity.append(lim.velocity if lim is not None and lim.velocity else np.inf)
+    return np.array(lower), np.array(upper), np.array(velocity)
+
+
+class DeltaHistory:
+    def __init__(self, capacity=256, max_steps=None):
+        self.max_steps = max_steps
+        # 条目环：每个变化的关节一条
+        self._idx = np.empty(capacity, dtype=np.uint16)
+        self._old = np.empty(capacity, dtype=np.float32)
+        self._new = np.empty(capacity, dtype=np.float32)
+        # 步环：每步结束时的条目绝对序号
+        self._step_end = np.empty(max(capacity // 4, 16), dtype=np.int64)
+        self._e0 = 0     # 最旧保留条目的绝对序号
+        self._s0 = 0     # 最旧保留步的绝对序号
+        self._cur = 0    # 已应用到的步（绝对序号，下一步写这里）
+        self._top = 0    # 可以重做到的步
+
+    def __len__(self):
+        """可撤销的步数"""
+        return self._cur - self._s0
+
+    @property
+    def redo_depth(self):
+        return self._top - self._cur
+
+    @property
+    def nbytes(self):
+        return self._idx.nbytes + self._old.nbytes + self._new.nbytes + self._step_end.nbytes
+
+    def _range(self, k):
+        """第 k 步的条目绝对序号区间"""
+        start = self._e0 if k == self._s0 else int(self._step_end[(k - 1) % len(self._step_end)])
+        return start, int(self._step_end[k % len(self._step_end)])
+
+    def _grow(self, arrs, lo, hi, size):
+        """把绝对序号 [lo, hi) 的内容按新容量重新摆放"""
+        r = np.arange(lo, hi)
+        out = []
+        for a in arrs:
+            b = np.empty(size, dtype=a.dtype)
+            b[r % size] = a[r % len(a)]
+            out.append(b)
+        return out
+
+    def push(self, idx, old, new):
+        """记录一步；之后的重做分支被丢弃。idx 为空时不记"""
+        n = len(idx)
+        if n == 0:
+            return
+        self._top = self._cur
+        if self.max_steps is not None and len(self) >= self.max_steps:
+            self._e0 = self._range(self._s0)[1]
+            self._s0 += 1
+        start = self._range(self._cur - 1)[1] if self._cur > self._s0 else self._e0
+        if start + n - self._e0 > len(self._idx):
+            size = max(2 * len(self._idx), start + n - self._e0)
+            self._idx, self._old, self._new = self._grow((self._idx, self._old, self._new), self._e0, start, size)
+        if len(self) + 1 > len(self._step_end):
+            self._step_end, = self._grow((self._step_end,), self._s0, self._cur, 2 * len(self._step_end))
+        slots = np.arange(start, start + n) % len(self._idx)
+        self._idx[slots] = idx
+        self._old[slots] = old
+        self._new[slots] = new
+        self._step_end[self._cur % len(self._step_end)] = start + n
+        self._cur += 1
+        self._top = self._cur
+
+    def undo(self, q):
+        """把上一步写回 q（旧值），返回变化的下标；没有可撤销的步返回 None"""
+        if self._cur == self._s0:
+            return None
+        self._cur -= 1
+        slots = np.arange(*self._range(self._cur)) % len(self._idx)
+        idx = self._idx[slots].astype(np.intp)
+        q[idx] = self._old[slots]
+        return idx
+
+    def redo(self, q):
+        if self._cur == self._top:
+            return None
+        slots = np.arange(*self._range(self._cur)) % len(self._idx)
+        idx = self._idx[slots].astype(np.intp)
+        q[idx] = self._new[slots]
+        self._cur += 1
+        return idx
+
+    def clear(self):
+        self._e0 = self._s0 = self._cur = self._top = 0
+
+
+class PoseState:
+    def __init__(self, names, lower, upper, history=None):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.lower = np.asarray(lower, dtype=np.float32)
+        self.upper = np.asarray(upper, dtype=np.float32)
+        self.q = np.clip(np.zeros(len(self.names), dtype=np.float32), self.lower, self.upper)
+        self.history = history if history is not None else DeltaHistory()
+        self._snapshot = None
+
+    @classmethod
+    def from_urdf(cls, robot, names, **kwargs):
+        """上下限取自 URDF 的 <limit>；没有限位的关节按 ±π"""
+        lower, upper, _ = urdf_limits(robot, names)
+        return cls(names, lower, upper, **kwargs)
+
+    # ---------------- 编辑 ----------------
+    def clamp(self):
+        np.clip(self.q, self.lower, self.upper, out=self.q)
+
+    def nudge(self, deltas):
+        """deltas：{关节名: 增量}；加完整体限幅一次。不在拖拽事务里时单独记为一步"""
+        own = self._snapshot is None
+        if own:
+            self.begin()
+        idx = [self.index[name] for name in deltas]
+        self.q[idx] += np.fromiter(deltas.values(), dtype=np.float32, count=len(idx))
+        self.clamp()
+        if own:
+            self.commit()
+
+    def set(self, q):
+        """整体替换（如载入姿态），记为一步"""
+        self.begin()
+        self.q[:] = q
+        self.clamp()
+        self.commit()
+
+    def get(self, name, default=0.0):
+        i = self.index.get(name)
+        return default if i is None else float(self.q[i])
+
+    def as_dict(self):
+        return dict(zip(self.names, self.q.tolist()))
+
+    # ---------------- 事务与历史 ----------------
+    @property
+    def in_transaction(self):
+        return self._snapshot is not None
+
+    def begin(self):
+        """开始一步（如按下鼠标开始拖拽）；之后的编辑在 commit 时合并成一条差分"""
+        if self._snapshot is None:
+            self._snapshot = self.q.copy()
+
+    def commit(self):
+        """结束一步，只记录真正变化了的关节；返回是否有变化"""
+        if self._snapshot is None:
+            return False
+        idx = np.flatnonzero(self.q != self._snapshot)
+        self.history.push(idx, self._snapshot[idx], self.q[idx])
+        self._snapshot = None
+        return len(idx) > 0
+
+    def undo(self):
+        self.commit()
+        return self.history.undo(self.q) is not None
+
+    def redo(self):
+        self.commit()
+        return self.history.redo(self.q) is not None
+
+
+# ---------------- 自检 ----------------
+def self_check(steps=5000, n_joints=29, seed=0, max_steps=None):
+    rng = np.random.default_rng(seed)
+    names = [f"j{i}" for i in range(n_joints)]
+    pose = PoseState(names, -np.ones(n_joints) * 2, np.ones(n_joints) * 2,
+                     history=DeltaHistory(max_steps=max_steps))
+    states = [pose.q.copy()]        # 对照：每步之后的完整姿态
+    redo_states = []
+    ok = True
+    for k in range(steps):
+        op = rng.random()
+        if op < 0.15 and len(pose.history):
+            pose.undo()
+            redo_states.append(states.pop())
+            ok &= np.array_equal(pose.q, states[-1])
+        elif op < 0.2 and pose.history.redo_depth:
+            pose.redo()
+            states.append(redo_states.pop())
+            ok &= np.array_equal(pose.q, states[-1])
+        else:
+            # 模拟一次拖拽：按下、同一组关节的若干个移动事件、松开
+            pose.begin()
+            pair = rng.choice(n_joints, 2, replace=False)
+            for _ in range(int(rng.integers(1, 20))):
+                pose.nudge({names[i]: float(rng.normal(scale=0.05)) for i in pair})
+            if pose.commit():
+                states.append(pose.q.copy())
+                redo_states.clear()
+        if max_steps is not None:
+            del states[:-max_steps - 1]
+    # 全部撤销到最旧保留的状态，再全部重做回来
+    final = pose.q.copy()
+    while pose.undo():
+        states.pop()
+    ok &= len(states) == 1 and np.array_equal(pose.q, states[0])
+    while pose.redo():
+        pass
+    ok &= np.array_equal(pose.q, final)
+    h = pose.history
+    print(f"{steps} 次操作（max_steps={max_steps}）：可撤销 {len(h)} 步，历史占用 {h.nbytes / 1024:.1f} KB，"
+          f"一致 {'是' if ok else '否'}")
+    print(f"对照：同样步数的 dict 快照约 {len(h) * sys.getsizeof(dict(zip(names, pose.q.tolist()))) / 1024:.0f} KB（不含值对象）")
+    return bool(ok)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check() and self_check(max_steps=100, seed=1) else 1)
@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姿态网络流（UDP / TCP），替代 np.save → scp → 文件监视 这条慢链路
+
+姿态帧（小端，定长 140 字节）：
+    magic   4s   b"G1PS"
+    ver     B    PROTO_VERSION
+    kind    B    FRAME_POSE
+    n       H    关节数，固定 29
+    seq     Q    发送端递增序号，从 1 开始
+    t_send  d    发送端时间戳（机器人端不解释，原样回传给发送端算往返时延）
+    q       29f  目标关节角（弧度），电机顺序（pose_state.motor_joints）
+
+应答帧（小端，定长 32 字节）：
+    magic   4s   b"G1PA"
+    ver     B
+    status  B    ACK_APPLIED / ACK_STALE / ACK_DROPPED / ACK_BAD
+    resv    H
+    seq     Q
+    t_send  d    原样回传
+    latency d    机器人端 收到 → 控制线程取走 的时延（秒），仅 ACK_APPLIED 有效
+
+seq 不大于该发送端已接受过的 seq 视为过期/乱序；同一次 select 读到的多帧只应用最新一帧。
+本模块不依赖 Unitree SDK，GUI 端、机器人端都可以 import。
+
+本机回环测时延与吞吐：
+    python3 pose_stream.py --loopback [--proto udp|tcp] [--rate 500] [--count 5000]
+本机回环测 GUI 实时同步（PoseMirror：限速 + 变化阈值）：
+    python3 pose_stream.py --mirror [--rate 50]
+连真机（robot_control.py 以 --stream-port 启动）：
+    python3 pose_stream.py --connect 192.168.123.164 [--port 9870] [--proto udp|tcp]
+"""
+
+import sys, time, socket, select, struct, argparse, threading, collections
+import numpy as np
+
+from pose_watcher import PoseDoubleBuffer
+
+NUM_JOINTS    = 29
+DEFAULT_PORT  = 9870
+PROTO_VERSION = 1
+
+FRAME_MAGIC = b"G1PS"
+ACK_MAGIC   = b"G1PA"
+FRAME = struct.Struct(f"<4sBBHQd{NUM_JOINTS}f")
+ACK   = struct.Struct("<4sBBHQdd")
+
+FRAME_POSE = 1
+
+ACK_APPLIED = 0   # 控制线程已取走
+ACK_STALE   = 1   # seq 过期 / 乱序，或被同批更新的帧取代
+ACK_DROPPED = 2   # 已交给控制端，但还没被取走就被新姿态覆盖
+ACK_BAD     = 3   # 格式错误或含 NaN/Inf
+
+ACK_NAMES = {ACK_APPLIED: "applied", ACK_STALE: "stale", ACK_DROPPED: "dropped", ACK_BAD: "bad"}
+
+Ack = collections.namedtuple("Ack", "status seq rtt latency")
+
+
+def pack_pose(seq, pose, t_send=None, kind=FRAME_POSE):
+    if t_send is None:
+        t_send = time.perf_counter()
+    return FRAME.pack(FRAME_MAGIC, PROTO_VERSION, kind, NUM_JOINTS, seq, t_send,
+                      *np.asarray(pose, dtype=np.float32).tolist())
+
+
+# ---------------- 机器人端 ----------------
+class PoseStreamServer(threading.Thread):
+    """
+    在同一端口上同时收 UDP 和 TCP 姿态帧。
+
+    on_pose(pose, token) 负责把姿态交给控制端（一般是 PoseDoubleBuffer.publish），
+    返回被覆盖的旧 token；buffer.applied 用来判断何时被控制线程取走并回 ACK。
+    """
+
+    def __init__(self, on_pose, buffer, host="0.0.0.0", port=DEFAULT_PORT,
+                 udp=True, tcp=True, ack_poll=0.002):
+        super().__init__(name="pose_stream", daemon=True)
+        self.on_pose = on_pose
+        self.buffer = buffer
+        self.host, self.port = host, port
+        self.use_udp, self.use_tcp = udp, tcp
+        self.ack_poll = ack_poll   # 有待确认帧时的 select 超时，约一个控制周期
+        self._stop_evt = threading.Event()
+        self._udp = None
+        self._listen = None
+        self._conns = {}                           # tcp socket -> 接收缓存
+        self._last_seq = collections.OrderedDict() # 发送端 -> 已接受的最大 seq
+        self._pending = None                       # 已交给控制端、等待取走的 token
+        self.stats = collections.Counter()
+
+    def stop(self):
+        self._stop_evt.set()
+
+    # ---------- socket ----------
+    def _open(self):
+        if self.use_udp:
+            self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._udp.bind((self.host, self.port))
+            self._udp.setblocking(False)
+        if self.use_tcp:
+            self._listen = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._listen.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._listen.bind((self.host, self.port))
+            self._listen.listen(4)
+            self._listen.setblocking(False)
+        print(f"[stream] 监听 {self.host}:{self.port} "
+              f"({'UDP ' if self.use_udp else ''}{'TCP' if self.use_tcp else ''})")
+
+    def _close(self):
+        for s in [self._udp, self._listen, *self._conns]:
+            if s is not None:
+                s.close()
+        self._conns.clear()
+
+    def _drop_conn(self, conn):
+        self._conns.pop(conn, None)
+        self._last_seq.pop(conn, None)
+        conn.close()
+
+    # ---------- 主循环 ----------
+    def run(self):
+        self._open()
+        try:
+            while not self._stop_evt.is_set():
+                rlist = [s for s in (self._udp, self._listen) if s is not None]
+                rlist.extend(self._conns)
+                timeout = self.ack_poll if self._pending is not None else 0.2
+                readable, _, _ = select.select(rlist, [], [], timeout)
+                self._flush_applied()
+
+                frames = []
+                for s in readable:
+                    if s is self._udp:
+                        self._read_udp(frames)
+                    elif s is self._listen:
+                        self._accept()
+                    else:
+                        self._read_tcp(s, frames)
+                if frames:
+                    self._handle(frames)
+        finally:
+            self._close()
+
+    def _accept(self):
+        try:
+            conn, addr = self._listen.accept()
+        except BlockingIOError:
+            return
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.setblocking(False)
+        self._conns[conn] = bytearray()
+        print(f"[stream] TCP 连接 {addr[0]}:{addr[1]}")
+
+    def _read_udp(self, frames):
+        t_recv = time.perf_counter()
+        while True:
+            try:
+                data, addr = self._udp.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:  # Windows 下对端不可达会报 ConnectionResetError
+                continue
+            frames.append((addr, data, t_recv))
+
+    def _read_tcp(self, conn, frames):
+        t_recv = time.perf_counter()
+        try:
+            data = conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop_conn(conn)
+            return
+        rx = self._conns[conn]
+        rx += data
+        n = len(rx) // FRAME.size * FRAME.size
+        for off in range(0, n, FRAME.size):
+            frames.append((conn, bytes(rx[off:off + FRAME.size]), t_recv))
+        del rx[:n]
+
+    # ---------- 帧处理 ----------
+    def _handle(self, frames):
+        batch = {}  # 发送端 -> (seq, t_send, pose, t_recv)，同批只留最新
+        for key, data, t_recv in frames:
+            if len(data) != FRAME.size:
+                self.stats["bad"] += 1
+                continue
+            magic, ver, kind, n, seq, t_send, *q = FRAME.unpack(data)
+            if magic != FRAME_MAGIC or ver != PROTO_VERSION or kind != FRAME_POSE or n != NUM_JOINTS:
+                self.stats["bad"] += 1
+                self._send_ack(key, ACK_BAD, seq, t_send)
+                continue
+            pose = np.asarray(q, dtype=np.float32)
+            if not np.all(np.isfinite(pose)):
+                self.stats["bad"] += 1
+                self._send_ack(key, ACK_BAD, seq, t_send)
+                continue
+            if seq <= self._last_seq.get(key, 0):
+                self.stats["stale"] += 1
+                self._send_ack(key, ACK_STALE, seq, t_send)
+                continue
+            self._remember_seq(key, seq)
+            prev = batch.get(key)
+            if prev is not None:
+                self.stats["stale"] += 1
+                self._send_ack(key, ACK_STALE, prev[0], prev[1])
+            batch[key] = (seq, t_send, pose, t_recv)
+
+        for key, (seq, t_send, pose, t_recv) in batch.items():
+            token = (key, seq, t_send, t_recv)
+            superseded = self.on_pose(pose, token)
+            self.stats["accepted"] += 1
+            if superseded is not None and superseded is self._pending:
+                self.stats["dropped"] += 1
+                self._send_ack(superseded[0], ACK_DROPPED, superseded[1], superseded[2])
+            self._pending = token
+
+    def _remember_seq(self, key, seq):
+        self._last_seq[key] = seq
+        self._last_seq.move_to_end(key)
+        while len(self._last_seq) > 64:
+            self._last_seq.popitem(last=False)
+
+    def _flush_applied(self):
+        token = self._pending
+        if token is None:
+            return
+        applied = self.buffer.applied
+        if applied is not None and applied[0] is token:
+            self._pending = None
+            self.stats["applied"] += 1
+            self._send_ack(token[0], ACK_APPLIED, token[1], token[2], applied[1] - token[3])
+        elif self.buffer.latest_token is not token:
+            # 被其它来源（例如文件监视）的姿态覆盖
+            self._pending = None
+            self.stats["dropped"] += 1
+            self._send_ack(token[0], ACK_DROPPED, token[1], token[2])
+
+    def _send_ack(self, key, status, seq, t_send, latency=0.0):
+        data = ACK.pack(ACK_MAGIC, PROTO_VERSION, status, 0, seq, t_send, latency)
+        try:
+            if isinstance(key, socket.socket):
+                if key in self._conns:
+                    key.send(data)
+            else:
+                self._udp.sendto(data, key)
+        except OSError:
+            pass
+
+
+# ---------------- 发送端 ----------------
+class PoseStreamClient:
+    """姿态流发送端，send() 非阻塞，recv_acks() 取回已到达的应答"""
+
+    def __init__(self, host, port=DEFAULT_PORT, proto="udp", connect_timeout=3.0):
+        self.proto = proto
+        if proto == "udp":
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect((host, port))
+        elif proto == "tcp":
+            self.sock = socket.create_connection((host, port), timeout=connect_timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            raise ValueError(f"unknown proto {proto!r}")
+        self.sock.setblocking(False)
+        self.seq = 0
+        self._rx = bytearray()
+
+    def send(self, pose):
+        """发送一帧，返回 seq；发送缓冲满时丢弃并返回 None"""
+        self.seq += 1
+        try:
+            self.sock.send(pack_pose(self.seq, pose))
+        except (BlockingIOError, InterruptedError):
+            return None
+        return self.seq
+
+    def recv_acks(self):
+        now = time.perf_counter()
+        acks = []
+        while True:
+            try:
+                data = self.sock.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionError:
+                break
+            if not data:
+                break
+            if self.proto == "udp":
+                if len(data) == ACK.size:
+                    self._rx += data
+            else:
+                self._rx += data
+        n = len(self._rx) // ACK.size * ACK.size
+        for off in range(0, n, ACK.size):
+            magic, _, status, _, seq, t_send, latency = ACK.unpack_from(self._rx, off)
+            if magic == ACK_MAGIC:
+                acks.append(Ack(status, seq, now - t_send, latency))
+        del self._rx[:n]
+        return acks
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+
+class PoseMirror(threading.Thread):
+    """
+    拖拽时持续把姿态镜像到机器人（GUI 的“实时同步”）。
+
+    offer() 只把最新姿态拷进共享缓冲并唤醒发送线程，GUI 线程里不做网络 IO；
+    发送线程按 max_rate 限速，只有与上次发出的姿态相差超过 threshold（任一关节，弧度）才发；
+    姿态停止变化 settle 秒后，低于阈值的剩余差异也补发一次，机器人最终停在与模型相同的姿态。
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, proto="udp", max_rate=50.0, threshold=0.005,
+                 settle=0.2, ack_timeout=1.0):
+        super().__init__(name="pose_mirror", daemon=True)
+        self.host, self.port, self.proto = host, port, proto
+        self.max_rate = max_rate
+        self.threshold = threshold
+        self.settle = settle
+        self.ack_timeout = ack_timeout   # 超过这么久没回 ACK 记为丢失
+        self.error = None                # 连接失败等致命错误，线程随之退出
+        self.stats = collections.Counter()
+        self.rtt = collections.deque(maxlen=256)
+        self._latest = np.zeros(NUM_JOINTS, dtype=np.float32)
+        self._version = 0
+        self._lock = threading.Lock()
+        self._stop_evt = threading.Event()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._inflight = collections.OrderedDict()   # seq -> 发送时刻
+
+    # ---------- GUI 线程 ----------
+    def offer(self, pose):
+        with self._lock:
+            self._latest[:] = pose
+            self._version += 1
+        self._wake()
+
+    def stop(self):
+        self._stop_evt.set()
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass   # 唤醒字节已经堆满，发送线程反正会醒
+
+    def rtt_p50(self):
+        rtt = list(self.rtt)
+        return float(np.median(rtt)) if rtt else float("nan")
+
+    # ---------- 发送线程 ----------
+    def run(self):
+        try:
+            client = PoseStreamClient(self.host, self.port, self.proto)
+        except OSError as e:
+            self.error = e
+            return
+        pose = np.zeros(NUM_JOINTS, dtype=np.float32)
+        sent = None
+        seen, t_change, t_last = 0, 0.0, -np.inf
+        try:
+            while not self._stop_evt.is_set():
+                now = time.perf_counter()
+                with self._lock:
+                    if self._version != seen:
+                        pose[:] = self._latest
+                        seen, t_change = self._version, now
+                timeout = 0.5
+                if seen and (sent is None or not np.array_equal(pose, sent)):
+                    due = t_last + 1.0 / self.max_rate
+                    big = sent is None or float(np.abs(pose - sent).max()) >= self.threshold
+                    if not big:
+                        due = max(due, t_change + self.settle)
+                    if now >= due:
+                        if self._send(client, pose, now):
+                            sent, t_last = pose.copy(), now
+                        timeout = 1.0 / self.max_rate
+                    else:
+                        timeout = due - now
+                ready, _, _ = select.select([client, self._wake_r], [], [], timeout)
+                if self._wake_r in ready:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                self._collect(client)
+        finally:
+            client.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def _send(self, client, pose, now):
+        try:
+            seq = client.send(pose)
+        except OSError:   # UDP 对端不可达等，下一帧再试
+            seq = None
+        if seq is None:
+            self.stats["send_failed"] += 1
+            return False
+        self.stats["sent"] += 1
+        self._inflight[seq] = now
+        return True
+
+    def _collect(self, client):
+        try:
+            acks = client.recv_acks()
+        except OSError:
+            acks = []
+        for ack in acks:
+            self._inflight.pop(ack.seq, None)
+            self.stats[ACK_NAMES.get(ack.status, "bad")] += 1
+            if ack.status == ACK_APPLIED:
+                self.rtt.append(ack.rtt)
+        limit = time.perf_counter() - self.ack_timeout
+        while self._inflight and next(iter(self._inflight.values())) < limit:
+            self._inflight.popitem(last=False)
+            self.stats["lost"] += 1
+
+    @property
+    def dropped(self):
+        """没有被机器人执行的帧：发送失败 + 被新帧取代/过期 + 超时无应答"""
+        st = self.stats
+        return st["send_failed"] + st["stale"] + st["dropped"] + st["lost"]
+
+
+# ---------------- 测试客户端 ----------------
+def _fmt_ms(values):
+    if not values:
+        return "n/a"
+    v = np.asarray(values) * 1e3
+    return f"p50 {np.percentile(v, 50):.3f} ms | p99 {np.percentile(v, 99):.3f} ms | max {v.max():.3f} ms"
+
+
+def run_client(host, port, proto, rate, count, settle=0.5):
+    client = PoseStreamClient(host, port, proto)
+    period = 1.0 / rate
+    acks = []
+    rng = np.random.default_rng(0)
+    base = rng.uniform(-0.3, 0.3, NUM_JOINTS).astype(np.float32)
+    sent = 0
+
+    t0 = time.perf_counter()
+    next_t = t0
+    for k in range(count):
+        pose = base + 0.05 * np.sin(k * period * 2 * np.pi)
+        if client.send(pose) is not None:
+            sent += 1
+        next_t += period
+        while True:  # 等到下一帧发送时刻，期间应答一到就读，避免往返时延被轮询放大
+            delay = next_t - time.perf_counter()
+            if delay <= 0:
+                break
+            if select.select([client], [], [], delay)[0]:
+                acks.extend(client.recv_acks())
+    t_send_end = time.perf_counter()
+
+    deadline = t_send_end + settle
+    while time.perf_counter() < deadline:
+        select.select([client], [], [], 0.05)
+        acks.extend(client.recv_acks())
+    client.close()
+
+    by_status = collections.Counter(a.status for a in acks)
+    applied = [a for a in acks if a.status == ACK_APPLIED]
+    print(f"proto={proto} target={host}:{port} rate={rate} Hz")
+    print(f"  sent      {sent}/{count} frames in {t_send_end - t0:.3f} s "
+          f"({sent / (t_send_end - t0):.0f} frames/s)")
+    print("  acks      " + ", ".join(f"{ACK_NAMES[s]}={by_status.get(s, 0)}" for s in ACK_NAMES)
+          + f", missing={sent - len(acks)}")
+    print(f"  rtt       {_fmt_ms([a.rtt for a in applied])}")
+    print(f"  recv→apply {_fmt_ms([a.latency for a in applied])}")
+    return acks
+
+
+def run_loopback(port, proto, rate, count, control_dt=0.002):
+    """本机起一个服务端 + 500 Hz 模拟控制线程，再用客户端打流"""
+    buffer = PoseDoubleBuffer(NUM_JOINTS)
+    server = PoseStreamServer(lambda pose, token: buffer.publish(pose, token=token),
+                              buffer, host="127.0.0.1", port=port)
+    server.start()
+
+    stop = threading.Event()
+
+    def control_loop():
+        q = np.zeros(NUM_JOINTS, dtype=np.float32)
+        next_t = time.perf_counter()
+        while not stop.is_set():
+            buffer.take_into(q)
+            next_t += control_dt
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    ctrl = threading.Thread(target=control_loop, name="fake_control", daemon=True)
+    ctrl.start()
+    time.sleep(0.2)
+    try:
+        run_client("127.0.0.1", port, proto, rate, count)
+    finally:
+        stop.set()
+        server.stop()
+        server.join()
+    print(f"  server    {dict(server.stats)}")
+
+
+def run_mirror_loopback(port, rate, seconds=3.0, drag_hz=1000.0, control_dt=0.002):
+    """本机服务端 + 模拟控制线程；以 drag_hz 的鼠标事件频率随机拖动，看镜像实际发了多少帧"""
+    buffer = PoseDoubleBuffer(NUM_JOINTS)
+    server = PoseStreamServer(lambda pose, token: buffer.publish(pose, token=token),
+                              buffer, host="127.0.0.1", port=port)
+    server.start()
+    stop = threading.Event()
+    robot_q = np.zeros(NUM_JOINTS, dtype=np.float32)
+
+    def control_loop():
+        while not stop.is_set():
+            buffer.take_into(robot_q)
+            time.sleep(control_dt)
+
+    ctrl = threading.Thread(target=control_loop, name="fake_control", daemon=True)
+    ctrl.start()
+    time.sleep(0.2)
+    mirror = PoseMirror("127.0.0.1", port, max_rate=rate)
+    mirror.start()
+    rng = np.random.default_rng(0)
+    q = np.zeros(NUM_JOINTS, dtype=np.float32)
+    offered = 0
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        q[rng.integers(NUM_JOINTS)] += rng.normal(scale=0.002)
+        mirror.offer(q)
+        offered += 1
+        time.sleep(1.0 / drag_hz)
+    time.sleep(mirror.settle + 0.3)   # 等补发和 ACK
+    mirror.stop()
+    mirror.join()
+    stop.set()
+    server.stop()
+    server.join()
+    ok = np.array_equal(robot_q, q)
+    print(f"镜像 max_rate={rate} Hz，阈值 {mirror.threshold} rad：{seconds:.0f} s 内拖动 {offered} 次，"
+          f"发送 {mirror.stats['sent']} 帧（{mirror.stats['sent'] / seconds:.0f}/s）")
+    print(f"  acks {dict((k, mirror.stats[k]) for k in ACK_NAMES.values())}，丢帧 {mirror.dropped}，"
+          f"rtt p50 {mirror.rtt_p50() * 1e3:.3f} ms")
+    print(f"  机器人端最终姿态与模型一致：{'是' if ok else '否'}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="G1 姿态流测试客户端")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--loopback", action="store_true", help="本机起服务端并测量")
+    mode.add_argument("--connect", metavar="HOST", help="连机器人端 robot_control.py --stream-port")
+    mode.add_argument("--mirror", action="store_true", help="本机回环测 GUI 实时同步（限速 + 阈值）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--proto", choices=("udp", "tcp"), default="udp")
+    parser.add_argument("--rate", type=float, default=None, help="发送频率 Hz（默认 500；--mirror 为限速上限，默认 50）")
+    parser.add_argument("--count", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    if args.mirror:
+        return 0 if run_mirror_loopback(args.port, args.rate or 50.0) else 1
+    args.rate = args.rate or 500.0
+    if args.loopback:
+        run_loopback(args.port, args.proto, args.rate, args.count)
+    else:
+        run_client(args.connect, args.port, args.proto, args.rate, args.count)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
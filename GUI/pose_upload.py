@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姿态文件上传（GUI → 机器人），替代每次导出都重新握手的 scp
+
+两种传输，都在一条常驻连接上反复上传：
+    tcp://host[:port]   长连接到机器人端的 PoseUploadServer（robot_control.py --upload-port，
+                        或单独运行 python3 pose_upload.py --serve --host 0.0.0.0），断线时自动重连一次
+    user@host           ssh，用 ControlMaster 复用同一个会话（Windows 自带的 OpenSSH 不支持
+                        多路复用，退化为每次新建会话）
+两种方式都先写同目录下的临时文件再 rename，PoseFileWatcher 只会看到完整的新文件。
+
+上传请求（小端）：
+    magic   4s   b"G1UF"
+    ver     B    PROTO_VERSION
+    resv    B
+    n_name  H    文件名字节数（UTF-8，只允许不含路径的文件名）
+    seq     Q    发送端递增序号
+    size    I    文件字节数
+    name    n_name 字节
+    data    size 字节
+
+应答（小端，定长 24 字节）：
+    magic   4s   b"G1UA"
+    ver     B
+    status  B    UP_OK / UP_BAD / UP_IOERR
+    resv    H
+    seq     Q
+    write_s d    机器人端 写临时文件 + fsync + rename 的耗时（秒）
+
+本机替身（不连机器人也能测 GUI 导出）：
+    python3 pose_upload.py --serve --dir /tmp/g1_recv [--port 9871]
+    接收端没有认证：默认只监听 127.0.0.1、只接受 target_pose.npy（--names 可加），
+    要让其它机器上的 GUI 上传需显式 --host 0.0.0.0
+测单次上传时延（同一连接 vs 每次新连接）：
+    python3 pose_upload.py --loopback [--count 200]
+"""
+
+import os, sys, time, queue, shlex, socket, struct, argparse, tempfile, threading, subprocess, collections
+
+DEFAULT_PORT  = 9871
+PROTO_VERSION = 1
+MAX_FILE_SIZE = 16 << 20
+
+REQ_MAGIC = b"G1UF"
+ACK_MAGIC = b"G1UA"
+REQ = struct.Struct("<4sBBHQI")
+ACK = struct.Struct("<4sBBHQd")
+
+UP_OK    = 0
+UP_BAD   = 1   # 头部/文件名不合法
+UP_IOERR = 2   # 机器人端写文件失败
+
+UP_NAMES = {UP_OK: "ok", UP_BAD: "bad", UP_IOERR: "ioerr"}
+
+UploadResult = collections.namedtuple("UploadResult", "seq latency write_s reused")
+
+
+def _valid_name(name):
+    return bool(name) and name == os.path.basename(name) and not name.startswith(".")
+
+
+def write_atomic(path, data):
+    """写同目录临时文件 → fsync → rename，返回耗时（秒）"""
+    t0 = time.perf_counter()
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return time.perf_counter() - t0
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(n - len(buf), 1 << 20))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        buf += chunk
+    return bytes(buf)
+
+
+# ---------------- 机器人端 ----------------
+class PoseUploadServer(threading.Thread):
+    """
+    接收上传并原子写入 directory。names 不为 None 时只接受其中的文件名。
+    每个连接一个线程（通常只有一个 GUI 连着），连接在多次上传之间保持。
+    """
+
+    def __init__(self, directory, host="0.0.0.0", port=DEFAULT_PORT, names=None, on_written=None):
+        super().__init__(name="pose_upload", daemon=True)
+        self.directory = os.path.abspath(directory)
+        self.host, self.port = host, port
+        self.names = None if names is None else set(names)
+        self.on_written = on_written
+        self._stop_evt = threading.Event()
+        self._listen = None
+        self.stats = collections.Counter()
+
+    def stop(self):
+        self._stop_evt.set()
+
+    def run(self):
+        self._listen = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listen.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listen.bind((self.host, self.port))
+        self._listen.listen(4)
+        self._listen.settimeout(0.2)
+        print(f"[upload] 监听 {self.host}:{self.port} → {self.directory}")
+        try:
+            while not self._stop_evt.is_set():
+                try:
+                    conn, addr = self._listen.accept()
+                except socket.timeout:
+                    continue
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                threading.Thread(target=self._serve_conn, args=(conn, addr),
+                                 name="pose_upload_conn", daemon=True).start()
+        finally:
+            self._listen.close()
+
+    def _serve_conn(self, conn, addr):
+        print(f"[upload] 连接 {addr[0]}:{addr[1]}")
+        self.stats["connections"] += 1
+        conn.settimeout(0.5)
+        try:
+            while not self._stop_evt.is_set():
+                try:
+                    head = conn.recv(REQ.size, socket.MSG_PEEK)
+                except socket.timeout:
+                    continue
+                if not head:
+                    break
+                conn.settimeout(5.0)   # 一个请求开始后整条读完
+                self._handle(conn)
+                conn.settimeout(0.5)
+        except (OSError, ConnectionError) as e:
+            print(f"[upload] 连接 {addr[0]}:{addr[1]} 断开：{e}")
+        finally:
+            conn.close()
+
+    def _handle(self, conn):
+        magic, ver, _, n_name, seq, size = REQ.unpack(_recv_exact(conn, REQ.size))
+        if magic != REQ_MAGIC or ver != PROTO_VERSION or size > MAX_FILE_SIZE:
+            self.stats["bad"] += 1
+            conn.sendall(ACK.pack(ACK_MAGIC, PROTO_VERSION, UP_BAD, 0, seq, 0.0))
+            raise ConnectionError("请求头不合法")   # 帧边界已不可信，断开让对端重连
+        name = _recv_exact(conn, n_name).decode("utf-8", "replace")
+        data = _recv_exact(conn, size)
+        if not _valid_name(name) or (self.names is not None and name not in self.names):
+            self.stats["bad"] += 1
+            conn.sendall(ACK.pack(ACK_MAGIC, PROTO_VERSION, UP_BAD, 0, seq, 0.0))
+            return
+        try:
+            write_s = write_atomic(os.path.join(self.directory, name), data)
+        except OSError as e:
+            print(f"[upload] 写入 {name} 失败：{e}")
+            self.stats["ioerr"] += 1
+            conn.sendall(ACK.pack(ACK_MAGIC, PROTO_VERSION, UP_IOERR, 0, seq, 0.0))
+            return
+        self.stats["written"] += 1
+        conn.sendall(ACK.pack(ACK_MAGIC, PROTO_VERSION, UP_OK, 0, seq, write_s))
+        if self.on_written is not None:
+            self.on_written(name)
+
+
+# ---------------- GUI 端 ----------------
+class SocketUploader:
+    """常驻 TCP 连接；第一次上传时才连接，连接失效时重连并重发一次"""
+
+    def __init__(self, host, port=DEFAULT_PORT, timeout=3.0):
+        self.host, self.port = host, port
+        self.timeout = timeout
+        self.sock = None
+        self.seq = 0
+
+    def __str__(self):
+        return f"tcp://{self.host}:{self.port}"
+
+    def _connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def upload(self, name, data, progress=None):
+        t0 = time.perf_counter()
+        reused = self.sock is not None
+        for attempt in (0, 1):
+            if self.sock is None:
+                if progress is not None:
+                    progress(f"连接 {self}")
+                self._connect()
+            try:
+                return self._send(name, data, progress, t0, reused)
+            except (OSError, ConnectionError):
+                self.close()
+                reused = False
+                if attempt:
+                    raise
+
+    def _send(self, name, data, progress, t0, reused):
+        self.seq += 1
+        raw = name.encode("utf-8")
+        if progress is not None:
+            progress(f"发送 {len(data)} 字节")
+        self.sock.sendall(REQ.pack(REQ_MAGIC, PROTO_VERSION, 0, len(raw), self.seq, len(data)) + raw + data)
+        if progress is not None:
+            progress("等待机器人确认")
+        magic, _, status, _, seq, write_s = ACK.unpack(_recv_exact(self.sock, ACK.size))
+        if magic != ACK_MAGIC or seq != self.seq:
+            raise ConnectionError("应答不匹配")
+        if status != UP_OK:
+            raise RuntimeError(f"机器人端拒绝：{UP_NAMES.get(status, status)}")
+        return UploadResult(seq, time.perf_counter() - t0, write_s, reused)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class SshUploader:
+    """
+    经 ssh 把数据从 stdin 写到远端临时文件再 mv。
+    ControlMaster=auto + ControlPersist：第一次上传建立主连接，之后的上传复用它，省掉握手。
+    """
+
+    def __init__(self, host, remote_dir, persist="10m"):
+        self.host = host
+        self.remote_dir = remote_dir
+        self.options = []
+        if os.name != "nt":
+            control = os.path.join(tempfile.gettempdir(), "g1-ssh-%C")
+            self.options = ["-o", "ControlMaster=auto", "-o", f"ControlPath={control}",
+                            "-o", f"ControlPersist={persist}"]
+        self.seq = 0
+
+    def __str__(self):
+        return self.host
+
+    def _master_alive(self):
+        if not self.options:
+            return False
+        return subprocess.run(["ssh", *self.options, "-O", "check", self.host],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+    def upload(self, name, data, progress=None):
+        if not _valid_name(name):
+            raise ValueError(f"文件名不合法：{name!r}")
+        t0 = time.perf_counter()
+        self.seq += 1
+        reused = self._master_alive()
+        if progress is not None:
+            progress(f"{'复用' if reused else '建立'} ssh 会话 {self.host}")
+        tmp = shlex.quote(f".{name}.upload.tmp")
+        # remote_dir 不加引号，让远端 shell 展开 ~
+        cmd = f"cd {self.remote_dir} && cat > {tmp} && mv -f {tmp} {shlex.quote(name)}"
+        proc = subprocess.run(["ssh", *self.options, self.host, cmd], input=data,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.decode("utf-8", "replace").strip() or f"ssh 退出码 {proc.returncode}")
+        return UploadResult(self.seq, time.perf_counter() - t0, float("nan"), reused)
+
+    def close(self):
+        pass   # 主连接由 ControlPersist 到时自行退出
+
+
+def make_uploader(target, remote_dir):
+    """tcp://host[:port] → SocketUploader，其它非空字符串按 ssh 目标处理；空串返回 None"""
+    target = target.strip()
+    if not target:
+        return None
+    if target.startswith("tcp://"):
+        host, _, port = target[len("tcp://"):].partition(":")
+        return SocketUploader(host, int(port) if port else DEFAULT_PORT)
+    return SshUploader(target, remote_dir)
+
+
+class UploadWorker(threading.Thread):
+    """
+    后台上传线程。submit 不阻塞；排队时只保留最新的一次导出。
+    on_progress(text) / on_done(result, error) 在本线程里调用，GUI 需自行转回主线程。
+    """
+
+    def __init__(self, remote_dir, on_progress=None, on_done=None):
+        super().__init__(name="pose_upload_worker", daemon=True)
+        self.remote_dir = remote_dir
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self._jobs = queue.Queue(maxsize=1)
+        self._target = None
+        self._uploader = None
+
+    def submit(self, target, name, data):
+        try:
+            self._jobs.get_nowait()   # 丢掉还没开始的旧导出
+        except queue.Empty:
+            pass
+        self._jobs.put((target, name, data))
+
+    def stop(self):
+        self.submit(None, None, None)
+
+    def run(self):
+        while True:
+            target, name, data = self._jobs.get()
+            if target is None:
+                break
+            if target != self._target:
+                if self._uploader is not None:
+                    self._uploader.close()
+                self._target, self._uploader = target, make_uploader(target, self.remote_dir)
+            try:
+                result = self._uploader.upload(name, data, self.on_progress)
+            except Exception as e:
+                result, error = None, e
+            else:
+                error = None
+            if self.on_done is not None:
+                self.on_done(result, error)
+        if self._uploader is not None:
+            self._uploader.close()
+
+
+# ---------------- 测试 ----------------
+def run_loopback(port, count):
+    """本机起一个接收端，对比：同一连接连续上传 vs 每次新建连接"""
+    import io
+    import numpy as np
+
+    buf = io.BytesIO()
+    np.save(buf, np.zeros(29, dtype=np.float32))
+    data = buf.getvalue()
+    with tempfile.TemporaryDirectory() as d:
+        server = PoseUploadServer(d, host="127.0.0.1", port=port, names={"target_pose.npy"})
+        server.start()
+        time.sleep(0.2)
+        try:
+            up = SocketUploader("127.0.0.1", port)
+            persistent = [up.upload("target_pose.npy", data).latency for _ in range(count)]
+            up.close()
+            fresh = []
+            for _ in range(count):
+                up = SocketUploader("127.0.0.1", port)
+                fresh.append(up.upload("target_pose.npy", data).latency)
+                up.close()
+            ok = np.array_equal(np.load(os.path.join(d, "target_pose.npy")), np.zeros(29, dtype=np.float32))
+            leftovers = [n for n in os.listdir(d) if n != "target_pose.npy"]
+        finally:
+            server.stop()
+            server.join()
+    for label, v in (("同一连接", persistent), ("每次新连接", fresh)):
+        v = np.asarray(v) * 1e3
+        print(f"{label:<8} {count} 次：p50 {np.median(v):.3f} ms | max {v.max():.3f} ms")
+    print(f"接收端 {dict(server.stats)}；文件内容一致 {'是' if ok else '否'}，残留临时文件 {leftovers}")
+    return ok and not leftovers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="G1 姿态文件上传")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--serve", action="store_true", help="作为接收端运行（机器人端或本机替身）")
+    mode.add_argument("--loopback", action="store_true", help="本机起接收端并测上传时延")
+    mode.add_argument("--send", nargs=2, metavar=("TARGET", "FILE"), help="上传一个文件：tcp://host[:port] 或 user@host")
+    parser.add_argument("--dir", default=".", help="接收端写入目录 / ssh 远端目录")
+    parser.add_argument("--host", default="127.0.0.1", help="接收端监听地址，接受其它机器上传用 0.0.0.0")
+    parser.add_argument("--names", nargs="+", default=["target_pose.npy"], help="接收端允许写入的文件名")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--count", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.loopback:
+        return 0 if run_loopback(args.port, args.count) else 1
+    if args.send:
+        target, path = args.send
+        with open(path, "rb") as f:
+            data = f.read()
+        result = make_uploader(target, args.dir).upload(os.path.basename(path), data, print)
+        print(f"已上传：{result.latency * 1e3:.1f} ms（机器人端写入 {result.write_s * 1e3:.2f} ms）")
+        return 0
+    os.makedirs(args.dir, exist_ok=True)
+    server = PoseUploadServer(args.dir, args.host, args.port, names=args.names)
+    server.start()
+    try:
+        while server.is_alive():
+            server.join(0.5)
+    except KeyboardInterrupt:
+        server.stop()
+        server.join()
+    print(f"[upload] {dict(server.stats)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线姿态 / 轨迹校验：在机器人执行之前把关
+
+输入可以混着给：
+    *.npy        单个姿态 (29,) 或一批 (N, 29)，列顺序为 motor_joints（即 target_pose.npy、下发机器人的顺序）
+    姿态库目录    pose_library.py 的目录，按 control_joints 存储，meta.json 的关节顺序必须一致；读入后换成电机顺序再检查
+    *.npz        多关键帧轨迹（poses, durations[, profile][, joint_names]），列顺序为 motor_joints，见 trajectory.py
+检查项：
+    schema    形状 / dtype / 关节顺序 / 轨迹字段
+    nan       NaN、Inf
+    limit     超出 g1_29dof.urdf 的关节限位
+    velocity  插值过程中的峰值关节速度超过 URDF 的 velocity（或 --max-velocity）。
+              单姿态按 robot_control.py 的文件姿态过渡算：从 --from 姿态（默认零位）出发，
+              用 --duration 秒、--profile 曲线；轨迹按控制周期展开后逐拍差分
+    floor     批量正运动学：骨盆固定在零位站立高度时，脚底接触球或手低于地面
+              （地面 = 零位时脚底接触球的最低点，容差 --floor-tol）
+大数组按 CHUNK_ROWS 行切块，只把“文件路径 + 行区间”发给进程池，子进程自己 mmap 读取，
+数据不经 pickle；结果按块流式汇总，进程池里同时在途的块数有上限，内存不随输入增长。
+
+    python3 pose_validator.py target_pose.npy pose_library/ dance.npz [-j 8]
+    python3 pose_validator.py --bench 2000000 [-j 8]     # 合成数据测吞吐
+全部通过退出码 0，有问题 1。
+"""
+
+import os, sys, time, argparse, collections
+import concurrent.futures as cf
+import numpy as np
+
+from pose_state import control_joints, motor_joints, motor_from_control, urdf_limits
+from trajectory import Trajectory, PROFILES, get_profile
+
+URDF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "g1_29dof.urdf")
+CHUNK_ROWS = 65536
+FOOT_LINKS = ("left_ankle_roll_link", "right_ankle_roll_link")
+HAND_LINKS = ("left_rubber_hand", "right_rubber_hand")
+CHECKS = ("schema", "nan", "limit", "velocity", "floor")
+
+Report = collections.namedtuple("Report", "source rows counts examples")   # examples: [(行, 检查项, 说明)]
+
+
+def profile_peak_rate(profile):
+    """插值曲线 s(r) 的最大斜率 max ds/dr：峰值速度 = 位移 × 该值 / 时长"""
+    r = np.linspace(0.0, 1.0, 10001)
+    return float(np.max(np.diff(get_profile(profile)(r)) / np.diff(r)))
+
+
+class PoseChecker:
+    def __init__(self, urdf_path=URDF_PATH, duration=3.0, profile="linear", start=None,
+                 max_velocity=None, floor_tol=0.005, dt=0.002):
+        from yourdfpy import URDF
+        from kinematics import KinematicTree
+
+        robot = URDF.load(urdf_path, load_meshes=False)
+        self.names = list(motor_joints)   # 与机器人执行的顺序一致：限位、速度、正运动学都按电机下标对应关节
+        lower, upper, velocity = urdf_limits(robot, self.names)
+        self.lower = lower.astype(np.float32)   # 与 PoseState 相同：限位按 float32 比较
+        self.upper = upper.astype(np.float32)
+        self.max_velocity = velocity if max_velocity is None else np.minimum(velocity, max_velocity)
+        self.start = np.zeros(len(self.names), dtype=np.float32) if start is None else np.asarray(start, np.float32)
+        self.rate = profile_peak_rate(profile) / duration
+        self.floor_tol = floor_tol
+        self.dt = dt
+        self.kin = KinematicTree(robot)
+
+        # 接触点：脚用碰撞球（球心 + 半径），没有碰撞球的 link 用原点
+        self.points, radius = [], []
+        for link in FOOT_LINKS + HAND_LINKS:
+            if link not in robot.link_map:
+                continue
+            spheres = [c for c in robot.link_map[link].collisions if c.geometry.sphere is not None]
+            for c in spheres:
+                origin = c.origin if c.origin is not None else np.eye(4)
+                self.points.append((link, origin[:3, 3]))
+                radius.append(c.geometry.sphere.radius)
+            if not spheres:
+                self.points.append((link, np.zeros(3)))
+                radius.append(0.0)
+        self.radius = np.array(radius, dtype=np.float32)
+        z0 = self.kin.batch_points(self.names, np.zeros((1, len(self.names))), self.points)[0, :, 2]
+        feet = [k for k, (link, _) in enumerate(self.points) if link in FOOT_LINKS]
+        self.floor_z = float(np.min(z0[feet] - self.radius[feet])) if feet else float(np.min(z0))
+
+    # ---------------- 批量检查 ----------------
+    def check(self, q, velocity=True):
+        """q：(N, 29)。返回 {检查项: (N,) 是否不通过}；含 NaN/Inf 的行只记 nan，不参与其它检查"""
+        q = np.asarray(q, dtype=np.float32)
+        finite = np.isfinite(q).all(axis=1)
+        if not finite.all():
+            q = np.where(finite[:, None], q, np.float32(0.0))
+        bad = {"nan": ~finite}
+        bad["limit"] = finite & ((q < self.lower) | (q > self.upper)).any(axis=1)
+        if velocity:
+            bad["velocity"] = finite & (np.abs(q - self.start) * self.rate > self.max_velocity).any(axis=1)
+        bottom = self.kin.batch_points(self.names, q, self.points)[:, :, 2] - self.radius
+        bad["floor"] = finite & (bottom < self.floor_z - self.floor_tol).any(axis=1)
+        return bad
+
+    def describe(self, q, check, speed=None):
+        """单行不通过原因的简短说明"""
+        if check == "nan":
+            return "含 NaN/Inf"
+        if check == "limit":
+            j = int(np.argmax(np.maximum(q - self.upper, self.lower - q)))
+            return f"{self.names[j]}={q[j]:.4f} 超出 [{self.lower[j]:.4f}, {self.upper[j]:.4f}]"
+        if check == "velocity":
+            if speed is None:
+                speed = np.abs(q - self.start) * self.rate
+            j = int(np.argmax(speed / self.max_velocity))
+            return f"{self.names[j]} 峰值 {speed[j]:.2f} rad/s > {self.max_velocity[j]:.2f}"
+        bottom = self.kin.batch_points(self.names, q[None], self.points)[0, :, 2] - self.radius
+        k = int(np.argmin(bottom))
+        return f"{self.points[k][0]} 低于地面 {(self.floor_z - bottom[k]) * 1e3:.1f} mm"
+
+    def _collect(self, bad, q, offset, counts, examples, max_examples, label=None):
+        for check, mask in bad.items():
+            rows = np.flatnonzero(mask)
+            counts[check] += len(rows)
+            for r in rows[:max(0, max_examples - sum(1 for e in examples if e[1] == check))].tolist():
+                examples.append((label(r) if label else offset + r, check, self.describe(q[r], check)))
+
+    def check_rows(self, source, q, offset, max_examples):
+        counts = collections.Counter()
+        examples = []
+        self._collect(self.check(q), np.asarray(q, dtype=np.float32), offset, counts, examples, max_examples)
+        return Report(source, len(q), counts, examples)
+
+    def check_trajectory(self, source, poses, durations, profile, max_examples):
+        """关键帧做 nan/limit/floor；再按控制周期展开，逐拍做 limit/floor 和差分速度"""
+        counts = collections.Counter()
+        examples = []
+        poses = np.asarray(poses, dtype=np.float32)
+        self._collect(self.check(poses, velocity=False), poses, 0, counts, examples, max_examples,
+                      label=lambda r: f"关键帧 {r}")
+        if counts["nan"]:
+            return Report(source, len(poses), counts, examples)
+        traj = Trajectory(poses, durations, profile, self.dt)
+        prev = None
+        tick = 0
+        for chunk in traj.chunks(CHUNK_ROWS):
+            bad = self.check(chunk, velocity=False)
+            del bad["nan"]
+            both = chunk if prev is None else np.vstack([prev, chunk])
+            speed = np.abs(np.diff(both, axis=0)) / self.dt
+            fast = (speed > self.max_velocity).any(axis=1)
+            vel = np.zeros(len(chunk), dtype=bool)
+            vel[len(chunk) - len(fast):] = fast
+            bad["velocity"] = vel
+            label = lambda r, t0=tick: f"第 {t0 + r} 拍（{(t0 + r) * self.dt:.3f} s）"
+            for check in ("limit", "floor"):
+                self._collect({check: bad[check]}, chunk, 0, counts, examples, max_examples, label)
+            rows = np.flatnonzero(vel)
+            counts["velocity"] += len(rows)
+            shift = len(both) - len(chunk) - 1   # chunk 第 r 行对应 speed 第 r + shift 行
+            for r in rows[:max(0, max_examples - sum(1 for e in examples if e[1] == "velocity"))].tolist():
+                examples.append((label(r), "velocity", self.describe(chunk[r], "velocity", speed[r + shift])))
+            prev = chunk[-1:]
+            tick += len(chunk)
+        return Report(source, traj.n_ticks, counts, examples)
+
+
+# ---------------- 任务 ----------------
+_CHECKER = None
+
+
+def _init_worker(kwargs):
+    global _CHECKER
+    _CHECKER = PoseChecker(**kwargs)
+
+
+def _run_task(task):
+    kind, source, path, start, stop, max_examples = task
+    if kind == "trajectory":
+        with np.load(path, allow_pickle=False) as z:
+            profile = str(z["profile"]) if "profile" in z.files else "min_jerk"
+            return _CHECKER.check_trajectory(source, z["poses"], z["durations"], profile, max_examples)
+    if kind == "raw":
+        # 姿态库按 control_joints 存储，换成电机顺序
+        data = np.memmap(path, dtype=np.float32, mode="r").reshape(-1, len(control_joints))
+        return _CHECKER.check_rows(source, data[start:stop][:, motor_from_control], start, max_examples)
+    data = np.load(path, mmap_mode="r").reshape(-1, len(motor_joints))
+    return _CHECKER.check_rows(source, data[start:stop], start, max_examples)
+
+
+def _schema_error(source, message):
+    return Report(source, 0, collections.Counter(schema=1), [("-", "schema", message)])
+
+
+def plan(paths, max_examples):
+    """逐个输入做结构检查，产出 (输入, 任务列表或结构错误, 行名函数) —— 只读头部，不读数据"""
+    for path in paths:
+        source = path
+        if os.path.isdir(path):
+            from pose_library import PoseLibrary, META_FILE, DATA_FILE
+            if not os.path.exists(os.path.join(path, META_FILE)):
+                yield source, _schema_error(source, "不是 npy/npz 文件，也不是姿态库目录"), None
+                continue
+            lib = PoseLibrary(path)
+            names = lib.names
+            n = len(lib)
+            lib.close()
+            if lib.joint_names != list(control_joints):
+                yield source, _schema_error(source, "meta.json 的关节顺序与 control_joints 不同"), None
+                continue
+            raw = os.path.join(lib.path, DATA_FILE)
+            yield source, [("raw", source, raw, a, min(a + CHUNK_ROWS, n), max_examples)
+                   for a in range(0, n, CHUNK_ROWS)], (lambda r, names=names: f"#{r} {names[r]}")
+        elif path.endswith(".npz"):
+            try:
+                with np.load(path, allow_pickle=False) as z:
+                    missing = {"poses", "durations"} - set(z.files)
+                    if missing:
+                        raise ValueError(f"缺少字段 {sorted(missing)}")
+                    poses, durations = z["poses"], z["durations"]
+                    if poses.ndim != 2 or poses.shape[1] != len(motor_joints) or len(poses) < 2:
+                        raise ValueError(f"poses 应为 (K>=2, {len(motor_joints)})，实际 {poses.shape}")
+                    if durations.shape != (len(poses) - 1,) or not np.all(np.isfinite(durations) & (durations > 0)):
+                        raise ValueError("durations 应为 K-1 个正数")
+                    if "profile" in z.files and str(z["profile"]) not in PROFILES:
+                        raise ValueError(f"未知插值曲线 {str(z['profile'])!r}")
+                    if "joint_names" in z.files and [str(s) for s in z["joint_names"]] != list(motor_joints):
+                        raise ValueError("joint_names 与 motor_joints 不同")
+            except (OSError, ValueError) as e:
+                yield source, _schema_error(source, str(e)), None
+                continue
+            yield source, [("trajectory", source, path, 0, 0, max_examples)], None
+        else:
+            try:
+                arr = np.load(path, mmap_mode="r", allow_pickle=False)
+                if arr.dtype.kind != "f":
+                    raise ValueError(f"dtype 应为浮点，实际 {arr.dtype}")
+                if arr.shape[-1:] != (len(motor_joints),) or arr.ndim > 2:
+                    raise ValueError(f"形状应为 ({len(motor_joints)},) 或 (N, {len(motor_joints)})，实际 {arr.shape}")
+            except (OSError, ValueError) as e:
+                yield source, _schema_error(source, str(e)), None
+                continue
+            n = 1 if arr.ndim == 1 else len(arr)
+            yield source, [("npy", source, path, a, min(a + CHUNK_ROWS, n), max_examples)
+                   for a in range(0, n, CHUNK_ROWS)], None
+
+
+def validate(paths, checker_kwargs, jobs=None, max_examples=5, verbose=True):
+    """返回 {输入: [行数, Counter, 示例]}；jobs=1 时在本进程里跑"""
+    jobs = jobs or os.cpu_count() or 1
+    results = {}
+    labels = {}
+
+    def merge(report):
+        entry = results.setdefault(report.source, [0, collections.Counter(), []])
+        entry[0] += report.rows
+        entry[1].update(report.counts)
+        room = max_examples - len(entry[2])
+        entry[2].extend(report.examples[:max(room, 0)])
+
+    tasks = []
+    for source, item, label in plan(paths, max_examples):
+        if isinstance(item, Report):
+            merge(item)
+        else:
+            results.setdefault(source, [0, collections.Counter(), []])
+            labels[source] = label
+            tasks.extend(item)
+
+    if jobs == 1:
+        _init_worker(checker_kwargs)
+        for task in tasks:
+            merge(_run_task(task))
+    else:
+        with cf.ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(checker_kwargs,)) as pool:
+            pending = set()
+            for task in tasks:
+                if len(pending) >= 2 * jobs:   # 在途块数有上限
+                    done, pending = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+                    for f in done:
+                        merge(f.result())
+                pending.add(pool.submit(_run_task, task))
+            for f in cf.as_completed(pending):
+                merge(f.result())
+
+    for source, (rows, counts, examples) in results.items():
+        label = labels.get(source)
+        examples.sort(key=lambda e: (CHECKS.index(e[1]), e[0] if isinstance(e[0], int) else 0))
+        if label is not None:
+            examples[:] = [(label(r), c, d) for r, c, d in examples]
+    if verbose:
+        for source, (rows, counts, examples) in results.items():
+            problems = "，".join(f"{c} {counts[c]}" for c in CHECKS if counts[c])
+            print(f"{'✗' if problems else '✓'} {source}：{rows} 行" + (f"；{problems}" if problems else ""))
+            for row, check, detail in examples:
+                print(f"    [{check}] {row}：{detail}")
+    return results
+
+
+# ---------------- 命令行 ----------------
+def run_bench(n, jobs, seed=0):
+    """限位内均匀随机的合成姿态 + 少量 NaN/越界行，测整条流水线的吞吐"""
+    import tempfile
+    from yourdfpy import URDF
+
+    robot = URDF.load(URDF_PATH, load_meshes=False)
+    lower, upper, _ = urdf_limits(robot, motor_joints)
+    rng = np.random.default_rng(seed)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "bench.npy")
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, len(motor_joints)))
+        for a in range(0, n, 1 << 20):
+            b = min(a + (1 << 20), n)
+            out[a:b] = rng.uniform(lower, upper, size=(b - a, len(motor_joints))) * 0.3
+        out[rng.integers(n, size=10)] = np.nan
+        out[rng.integers(n, size=10), 3] = 3.5   # 膝关节越界
+        out.flush()
+        del out
+        t0 = time.perf_counter()
+        results = validate([path], dict(duration=3.0), jobs=jobs, verbose=False)
+        elapsed = time.perf_counter() - t0
+    rows, counts, _ = results[path]
+    print(f"{rows} 个姿态，{jobs or os.cpu_count()} 个进程：{elapsed:.2f} s，"
+          f"{rows / elapsed * 60 / 1e6:.2f} 百万/分钟；" + "，".join(f"{c} {counts[c]}" for c in CHECKS))
+    return counts["nan"] == 10 and counts["limit"] >= 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="G1 姿态 / 轨迹离线校验")
+    parser.add_argument("inputs", nargs="*", help=".npy 姿态、姿态库目录或 .npz 轨迹")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数，默认 CPU 核数；1 为单进程")
+    parser.add_argument("--urdf", default=URDF_PATH)
+    parser.add_argument("--duration", type=float, default=3.0, help="单姿态过渡时长（秒），同 robot_control.py")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="linear", help="单姿态过渡的插值曲线")
+    parser.add_argument("--from", dest="start", default=None, help="单姿态过渡的起始姿态 .npy，默认零位")
+    parser.add_argument("--max-velocity", type=float, default=None, help="关节速度上限（rad/s），与 URDF 取小")
+    parser.add_argument("--floor-tol", type=float, default=0.005, help="低于地面多少米算穿地")
+    parser.add_argument("--max-examples", type=int, default=5, help="每个输入最多列出的问题行数")
+    parser.add_argument("--bench", type=int, metavar="N", default=None, help="生成 N 个合成姿态测吞吐")
+    args = parser.parse_args(argv)
+
+    if args.bench is not None:
+        return 0 if run_bench(args.bench, args.jobs) else 1
+    if not args.inputs:
+        parser.error("需要至少一个输入")
+    kwargs = dict(urdf_path=args.urdf, duration=args.duration, profile=args.profile,
+                  start=None if args.start is None else np.load(args.start),
+                  max_velocity=args.max_velocity, floor_tol=args.floor_tol)
+    t0 = time.perf_counter()
+    results = validate(args.inputs, kwargs, args.jobs, args.max_examples)
+    rows = sum(r[0] for r in results.values())
+    failed = sum(sum(r[1].values()) for r in results.values())
+    print(f"共 {rows} 行，{time.perf_counter() - t0:.2f} s；{'全部通过' if not failed else f'{failed} 处问题'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+target_pose.npy 后台监视与加载
+
+控制线程只检查 PoseDoubleBuffer 里有没有新姿态（网络接收见 pose_stream.py）；
+文件监视（Linux 用 inotify，其它平台轮询）、np.load 和校验都在后台线程完成。
+"""
+
+import os, sys, time, select, struct, threading, pathlib, collections
+import ctypes, ctypes.util
+import numpy as np
+
+
+# ---------------- 双缓冲 ----------------
+PosePublish = collections.namedtuple("PosePublish", "seq slot duration token")
+
+
+class PoseDoubleBuffer:
+    """
+    多写单读的姿态双缓冲。
+
+    写线程（文件监视、网络接收）加锁把新姿态拷进后缓冲，再用一次引用赋值
+    发布 PosePublish；读线程（控制线程）不加锁，每拍只比较 seq。
+    29 个 float32 的拷贝在一次 numpy 调用内完成，期间持有 GIL，
+    所以读写两侧不会看到拷了一半的数组。
+    但读线程取到 PosePublish 之后、拷贝之前，若又连着发布了两次，第二次会覆盖
+    同一个槽位，读到的就成了新姿态配旧的 duration / token。写线程只在发布之后
+    才会写这个槽位，所以读线程拷完再确认 _published 没变，变了就按新的重拷。
+    """
+
+    def __init__(self, size):
+        self._bufs = (np.zeros(size, dtype=np.float32), np.zeros(size, dtype=np.float32))
+        self._back = 0                                   # 下一次 publish 写入的缓冲
+        self._published = PosePublish(0, 0, None, None)  # 最近一次发布
+        self._taken_seq = 0                              # 读线程已取走的 seq
+        self._write_lock = threading.Lock()
+        self.applied = None  # (token, perf_counter 时间)，读线程取走带 token 的姿态时更新
+
+    def publish(self, pose, duration=None, token=None):
+        """
+        发布新姿态。duration 为插值时长（None 用控制端默认值），token 由调用方自定义。
+        返回被覆盖、从未被读线程取走的上一个 token（没有则 None）。
+        """
+        with self._write_lock:
+            idx = self._back
+            self._bufs[idx][:] = pose
+            self._back = idx ^ 1
+            prev = self._published
+            self._published = PosePublish(prev.seq + 1, idx, duration, token)
+        return prev.token if prev.seq != self._taken_seq else None
+
+    @property
+    def latest_token(self):
+        return self._published.token
+
+    def take_into(self, out):
+        """有新姿态时拷进 out 并返回对应的 PosePublish，否则返回 None"""
+        pub = self._published
+        if pub.seq == self._taken_seq:
+            return None
+        while True:
+            out[:] = self._bufs[pub.slot]
+            latest = self._published
+            if latest is pub:   # 拷贝期间没有新的发布，槽位里就是 pub 的姿态
+                break
+            pub = latest
+        self._taken_seq = pub.seq
+        if pub.token is not None:
+            self.applied = (pub.token, time.perf_counter())
+        return pub
+
+
+# ---------------- 加载与校验 ----------------
+def load_pose_file(path, size):
+    """读取并校验姿态文件，返回长度为 size 的 float32 数组；格式不对时抛 ValueError"""
+    arr = np.load(path, allow_pickle=False)
+    if not np.issubdtype(arr.dtype, np.number):
+        raise ValueError(f"非数值类型 {arr.dtype}")
+    arr = np.asarray(arr, dtype=np.float32).ravel()
+    if not np.all(np.isfinite(arr)):
+        raise ValueError("包含 NaN/Inf")
+
+    pose = np.zeros(size, dtype=np.float32)
+    n = min(arr.size, size)
+    pose[:n] = arr[:n]
+    if arr.size != size:
+        print(f"[UI] 姿态长度 {arr.size} != {size}，已截断/补零")
+    return pose
+
+
+# ---------------- inotify（仅 Linux） ----------------
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO    = 0x00000080
+_EVENT_HDR = struct.Struct("iIII")
+
+
+def _open_inotify(directory):
+    """返回 inotify fd；平台不支持时返回 None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        wd = libc.inotify_add_watch(fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO)
+        if wd < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _event_names(buf):
+    off = 0
+    while off + _EVENT_HDR.size <= len(buf):
+        _, _, _, name_len = _EVENT_HDR.unpack_from(buf, off)
+        off += _EVENT_HDR.size
+        name = buf[off:off + name_len].rstrip(b"\0")
+        off += name_len
+        yield name
+
+
+# ---------------- 监视线程 ----------------
+class PoseFileWatcher(threading.Thread):
+    """
+    监视姿态文件，加载成功后 publish 到 buffer。
+
+    inotify 只在写端 close / rename 完成后触发，scp 传到一半不会被读到；
+    轮询模式下要求 (mtime, size) 连续两次一致才加载。
+    """
+
+    def __init__(self, path, buffer, size, poll_interval=0.1, on_loaded=None):
+        super().__init__(name="pose_watcher", daemon=True)
+        self.path = pathlib.Path(path).resolve()
+        self.buffer = buffer
+        self.size = size
+        self.poll_interval = poll_interval
+        self.on_loaded = on_loaded
+        self.load_existing = True  # 启动时文件已存在是否立即加载
+        self._stop_evt = threading.Event()
+        self._seen_sig = None
+
+    def stop(self):
+        self._stop_evt.set()
+
+    def _signature(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, sig):
+        self._seen_sig = sig  # 加载失败也记下，同一份坏文件不反复报错
+        try:
+            pose = load_pose_file(self.path, self.size)
+        except Exception as e:
+            print("[UI] pose load failed:", e)
+            return
+        self.buffer.publish(pose)
+        print(f"成功加载目标姿态，更新时间: {time.strftime('%H:%M:%S')}")
+        if self.on_loaded is not None:
+            self.on_loaded(pose)
+
+    def run(self):
+        # 启动时文件已存在，直接加载一次
+        sig = self._signature()
+        if sig is not None:
+            if self.load_existing:
+                self._load(sig)
+            else:
+                self._seen_sig = sig
+
+        fd = _open_inotify(self.path.parent)
+        if fd is None:
+            print("[UI] inotify 不可用，改为轮询", self.path)
+            self._run_polling()
+        else:
+            try:
+                self._run_inotify(fd)
+            finally:
+                os.close(fd)
+
+    def _run_inotify(self, fd):
+        target = os.fsencode(self.path.name)
+        while not self._stop_evt.is_set():
+            ready, _, _ = select.select([fd], [], [], 0.5)
+            if not ready:
+                continue
+            buf = os.read(fd, 4096)
+            if any(name == target for name in _event_names(buf)):
+                sig = self._signature()
+                if sig is not None and sig != self._seen_sig:
+                    self._load(sig)
+
+    def _run_polling(self):
+        candidate = None
+        while not self._stop_evt.wait(self.poll_interval):
+            sig = self._signature()
+            if sig is None or sig == self._seen_sig:
+                candidate = None
+                continue
+            if sig == candidate:  # 两次观测一致，认为写入已完成
+                self._load(sig)
+                candidate = None
+            else:
+                candidate = sig
@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import time, sys, pathlib 
+import time, sys, pathlib, argparse
 import numpy as np
 # ---------- Unitree SDK‑2 ----------
-from unitree_sdk2py.core.channel import ChannelFactoryInitialize, ChannelPublisher, ChannelSubscriber
 from unitree_sdk2py.idl.default import unitree_hg_msg_dds__LowCmd_, unitree_hg_msg_dds__LowState_
 from unitree_sdk2py.idl.unitree_hg.msg.dds_ import LowCmd_, LowState_
-from unitree_sdk2py.utils.crc import CRC
-from unitree_sdk2py.utils.thread import RecurrentThread
-from unitree_sdk2py.comm.motion_switcher.motion_switcher_client import MotionSwitcherClient
 # -----------------------------------
+from backends import DdsBackend, SimBackend
+from lowcmd_crc import LowCmdEncoder
+from pose_watcher import PoseDoubleBuffer, PoseFileWatcher
+from pose_stream import PoseStreamServer, DEFAULT_PORT
+from pose_upload import PoseUploadServer, DEFAULT_PORT as UPLOAD_PORT
+from state_stream import StateStreamServer, DEFAULT_PORT as STATE_PORT, DEFAULT_RATE as STATE_RATE
+from trajectory import Trajectory, TrajectoryPlayer, PROFILES, get_profile
+from state_buffer import StateRingBuffer, CommandRingBuffer
+from loop_metrics import LoopMetrics
+from telemetry import TelemetryRecorder, STATE_COLUMNS, CMD_COLUMNS, CODECS, ROTATE_BYTES
 
 #正弦插值算法
 def sinusoidal_interpolation(q0, q1, ratio):
@@ -61,61 +67,108 @@ class Mode:
 
 class Custom:
     def __init__(self):
-        self.time_ = 0.0
+        self.time_ = 0.0          # 当前过渡段已流逝的时间（按时钟计算，不按拍数累加）
         self.control_dt_ = 0.002  # 改回2ms，与示例保持一致
+        self.clock_ = time.perf_counter  # 单调时钟；仿真后端换成仿真时间
+        self.sched_ = {}          # 传给控制线程调度器的参数，见 scheduler.DeadlineLoop
+        self._seg_t0 = None       # 当前过渡段的起点（clock_ 时间）
+        self._player_t0 = None    # 轨迹逐行播放的起点
         self.duration_ = 3.0   
+        self.pose_duration_ = 3.0         # 文件姿态的插值时长
+        self.stream_min_duration_ = 0.02  # 网络流姿态的最短插值时长
+        self.stream_max_speed_ = 1.0      # 网络流姿态的关节限速（rad/s）
+        self.profile_ = get_profile("linear")  # 单姿态过渡的插值曲线
         self.counter_ = 0
         self.mode_machine_ = 0
         self.low_cmd = unitree_hg_msg_dds__LowCmd_()  
         self.low_state = None 
         self.update_mode_machine_ = False
-        self.crc = CRC()
 
         # ---------- UI 相关 ----------
         self.npy_path  = pathlib.Path("target_pose.npy")
-        self.npy_mtime = 0.0
+        self.pose_buffer  = PoseDoubleBuffer(G1_NUM_MOTOR)
+        self.pose_watcher = PoseFileWatcher(self.npy_path, self.pose_buffer, G1_NUM_MOTOR)
+        self.stream_server = None
+        self.upload_server = None
+        self.state_server = None    # 实测关节角抽取后发给 GUI，见 EnableStateStream
+        self.player = None          # 正在播放的轨迹（只在控制线程里读写）
+        self._pending_player = None # 其它线程交给控制线程的新轨迹
         self.ui_pose   = np.zeros(G1_NUM_MOTOR, dtype=np.float32)
         self.initial_pose = np.zeros(G1_NUM_MOTOR, dtype=np.float32) 
         self.current_pose = np.zeros(G1_NUM_MOTOR, dtype=np.float32)
+
+        # ---------- LowState 历史 ----------
+        self.state_history_s_ = 5.0  # 保留最近几秒
+        self.state = StateRingBuffer(G1_NUM_MOTOR, int(self.state_history_s_ / self.control_dt_))
+        self.metrics = None  # 控制循环计时统计，见 EnableMetrics
+        self.cmd_history = None  # 每拍发出的 LowCmd，开录制时才分配，见 EnableRecorder
+        self.recorder = None
+
+        # ---------- 控制循环预分配缓冲 ----------
+        self._q_cmd   = np.zeros(G1_NUM_MOTOR, dtype=np.float32)  # 每拍目标角度
+        self._q_delta = np.zeros(G1_NUM_MOTOR, dtype=np.float32)  # ui_pose - initial_pose
+        self._motor_cmds = [self.low_cmd.motor_cmd[i] for i in range(G1_NUM_MOTOR)]
+        self._init_low_cmd()
+        self.cmd_encoder = LowCmdEncoder(self.low_cmd, G1_NUM_MOTOR)  # 常驻打包缓冲 + 增量 CRC
+
+    # ---------------- 静态命令字段只写一次 ----------------
+    def _init_low_cmd(self):
+        for i, cmd in enumerate(self._motor_cmds):
+            cmd.mode = 1  # Enable
+            cmd.tau = 0.0
+            cmd.dq = 0.0
+            cmd.kp = Kp[i]
+            cmd.kd = Kd[i]
+        self.low_cmd.mode_pr = Mode.PR
+        self.low_cmd.mode_machine = self.mode_machine_
+
     # ---------------- DDS 初始化 ----------------
-    def Init(self):
-        # 添加 MotionSwitcherClient 初始化
-        self.msc = MotionSwitcherClient()
-        self.msc.SetTimeout(5.0)
-        self.msc.Init()
-
-        # 检查并释放当前模式
-        status, result = self.msc.CheckMode()
-        while result['name']:
-            self.msc.ReleaseMode()
-            status, result = self.msc.CheckMode()
-            time.sleep(1)
+    def Init(self, backend=None):
+        # 默认连真机 DDS；传 SimBackend() 则在本地仿真上跑同一套控制循环
+        self.backend = DdsBackend() if backend is None else backend
+        self.clock_ = getattr(self.backend, "clock", time.perf_counter)
+        self.backend.Init(self)
+
+    def StartServices(self):
+        self.pose_watcher.start()
+        if self.stream_server is not None:
+            self.stream_server.start()
+        if self.upload_server is not None:
+            self.upload_server.start()
+        if self.state_server is not None:
+            self.state_server.start()
+        if self.recorder is not None:
+            self.recorder.start()
 
-        # 创建发布者和订阅者
-        self.pub = ChannelPublisher("rt/lowcmd", LowCmd_)
-        self.pub.Init()
-        self.sub = ChannelSubscriber("rt/lowstate", LowState_)
-        self.sub.Init(self.LowStateHandler, 10)
+    def StopServices(self):
+        # 目前只有录制需要收尾：把块缓冲里剩下的行写完
+        if self.recorder is not None:
+            self.recorder.close()
+            print(self.recorder.summary())
+
+    def ApplyModeMachine(self):
+        self.low_cmd.mode_machine = self.mode_machine_
+        self.cmd_encoder.rebase()  # 静态字段变了，重新打包
 
     def Start(self):
-        self.lowCmdWriteThreadPtr = RecurrentThread(
-            interval=self.control_dt_, target=self.LowCmdWrite, name="control"
-        )
+        self.lowCmdWriteThreadPtr = self.backend.CreateLoop(self.control_dt_, self.LowCmdWrite, **self.sched_)
         while self.update_mode_machine_ == False:
             time.sleep(1)
 
         if self.update_mode_machine_ == True:
+            self.ApplyModeMachine()
+            self.StartServices()
             self.lowCmdWriteThreadPtr.Start()
 
     def LowStateHandler(self, msg: LowState_):
         self.low_state = msg
-        for idx in range(G1_NUM_MOTOR):
-            self.current_pose[idx] = msg.motor_state[idx].q
+        # q/dq/tau 一次写进环形缓冲；current_pose 整体拷贝，读者不会看到半新半旧
+        self.current_pose[:] = self.state.push(msg)
 
         if self.update_mode_machine_ == False:
             # 记录所有电机的初始角度
-            for idx in range(G1_NUM_MOTOR):
-                self.initial_pose[idx] = msg.motor_state[idx].q
+            self.initial_pose[:] = self.current_pose
+            self._q_cmd[:] = self.initial_pose
             print("初始电机角度记录完成")
             self.mode_machine_ = self.low_state.mode_machine
             self.update_mode_machine_ = True
@@ -131,92 +184,256 @@ class Custom:
         #             print()
         #     print("\n" + "-"*60)
 
-    # -------------- 热加载 UI 参数 --------------
-    def _update_ui_pose(self):
-        if not self.npy_path.exists(): 
+    # -------------- 网络姿态流 --------------
+    def EnableStream(self, port=DEFAULT_PORT, host="0.0.0.0"):
+        self.stream_server = PoseStreamServer(self.apply_stream_pose, self.pose_buffer, host, port)
+
+    def EnableUpload(self, port=UPLOAD_PORT, host="0.0.0.0"):
+        # GUI 导出经常驻连接上传，原子写到 target_pose.npy 旁边，由 pose_watcher 加载
+        self.upload_server = PoseUploadServer(self.npy_path.resolve().parent, host, port,
+                                              names={self.npy_path.name})
+
+    def EnableStateStream(self, port=STATE_PORT, rate=STATE_RATE, host="0.0.0.0"):
+        # 抽取和打包都在 state_stream 线程：按 rate 读 LowState 环形缓冲最新一行和各电机指令，控制线程不参与
+        self.state_server = StateStreamServer(self.state, self._motor_cmds, host, port, rate)
+
+    def apply_stream_pose(self, pose, token):
+        # 在 pose_stream 线程里调用：按关节限速算插值时长，大跳变自动放慢
+        step = float(np.max(np.abs(pose - self._q_cmd)))
+        duration = max(self.stream_min_duration_, step / self.stream_max_speed_)
+        return self.pose_buffer.publish(pose, duration, token)
+
+    # -------------- 轨迹播放 --------------
+    def SetProfile(self, name):
+        self.profile_ = get_profile(name)
+
+    def PlayTrajectory(self, trajectory):
+        # 轨迹表在调用线程里生成好，控制线程下一拍接手
+        self._pending_player = TrajectoryPlayer(trajectory)
+
+    def _restart_clock(self, now):
+        # 新过渡段从本拍开始，本拍算作已走过一个周期（与按拍累加时的第一拍一致）
+        self._seg_t0 = now - self.control_dt_
+        self._player_t0 = None
+
+    def _take_player(self, now):
+        player = self._pending_player
+        if player is None:
             return
-        
-        mt = self.npy_path.stat().st_mtime
-        if mt == self.npy_mtime: 
+        self._pending_player = None
+        if self.player is not None:
+            self.player.stop()
+        self.player = player
+        # 先按单姿态方式过渡到轨迹第一帧，再开始逐拍查表
+        self.ui_pose[:] = player.last_row
+        self._restart_clock(now)
+        self.duration_ = self.pose_duration_
+        self.initial_pose[:] = self.current_pose[:]
+        print(f"开始播放轨迹：{player.trajectory.total_time:.2f} s，"
+              f"{'分块流式' if player.streaming else '整表预计算'}")
+
+    # -------------- 热加载 UI 参数 --------------
+    def _update_ui_pose(self, now):
+        # 文件监视、网络接收都在各自线程里，这里只取双缓冲
+        self._take_player(now)
+        pub = self.pose_buffer.take_into(self.ui_pose)
+        if pub is None:
             return
-            
-        try:
-            arr = np.load(self.npy_path).astype(np.float32)
-            if arr.size >= G1_NUM_MOTOR:
-                self.ui_pose[:] = arr[:G1_NUM_MOTOR]
-            else:
-                self.ui_pose[:arr.size] = arr
-                self.ui_pose[arr.size:] = 0.0
-            
-            self.npy_mtime = mt
-            
-            # [关键修改] 检测到新的目标姿态时，重置时间并更新起始位置
-            self.time_ = 0.0
+
+        # [关键修改] 检测到新的目标姿态时，重置时间并更新起始位置
+        if self.player is not None:  # 新姿态打断正在播放的轨迹
+            self.player.stop()
+            self.player = None
+        self._restart_clock(now)
+        if pub.duration is None:
+            # 文件姿态：从当前实测位置出发
+            self.duration_ = self.pose_duration_
             self.initial_pose[:] = self.current_pose[:]  # 将当前位置设为新的起始位置
-            
-            print(f"成功加载目标姿态，时间已重置，更新时间: {time.strftime('%H:%M:%S')}")
-            
-        except Exception as e:
-            print("[UI] pose load failed:", e)
+        else:
+            # 网络流姿态：从上一拍指令出发，保证指令连续
+            self.duration_ = pub.duration
+            self.initial_pose[:] = self._q_cmd
+
+    # -------------- 计时统计 ------------------
+    def EnableMetrics(self, path=None, report_interval=10.0):
+        self.metrics = LoopMetrics(self.control_dt_, path)
+        if report_interval > 0:
+            self.metrics.start_reporter(report_interval)
+        print(f"控制循环统计写入 {self.metrics.path}（python3 loop_metrics.py 查看）")
+
+    # -------------- 遥测录制 ------------------
+    def EnableRecorder(self, directory, compress="none", rotate_bytes=ROTATE_BYTES, keep=None):
+        # LowState 直接从 self.state 增量取；LowCmd 每拍多写一行 cmd_history，编码写盘都在 telemetry 线程
+        self.cmd_history = CommandRingBuffer(G1_NUM_MOTOR, self.state.capacity)
+        meta = {"control_dt": self.control_dt_, "num_motor": G1_NUM_MOTOR, "kp": Kp, "kd": Kd,
+                "mode_pr": Mode.PR, "argv": sys.argv}
+        self.recorder = TelemetryRecorder({"state": (self.state, STATE_COLUMNS),
+                                           "cmd": (self.cmd_history, CMD_COLUMNS)},
+                                          directory, compress=compress, rotate_bytes=rotate_bytes,
+                                          keep=keep, meta=meta)
 
     # -------------- 主发送循环 ------------------
     def LowCmdWrite(self):
-        self._update_ui_pose()  # 加载最新 UI 目标位置
-        self.time_ += self.control_dt_  # 累计运行时间
-        
-        # 初始化所有电机命令（重要！）
-        for i in range(G1_NUM_MOTOR):
-            self.low_cmd.motor_cmd[i].mode = 1  # Enable
-            self.low_cmd.motor_cmd[i].tau = 0.0
-            self.low_cmd.motor_cmd[i].dq = 0.0
-            self.low_cmd.motor_cmd[i].kp = Kp[i]
-            self.low_cmd.motor_cmd[i].kd = Kd[i]
+        t0 = time.perf_counter()
+        self._LowCmdWrite()
+        if self.cmd_history is not None:
+            self.cmd_history.push(self._q_cmd, t0, self.low_cmd.crc)
+        if self.metrics is not None:
+            self.metrics.record(t0, time.perf_counter(), self.state.last_time)
 
-        if self.time_ < self.duration_:
-            # 阶段1：从初始位置平滑过渡到目标位置
-            ratio = np.clip(self.time_ / self.duration_, 0.0, 1.0)
-        #线性平滑
-            for i in range(G1_NUM_MOTOR):
-                # 对所有电机进行插值控制
-                self.low_cmd.motor_cmd[i].q = (1.0 - ratio) * self.initial_pose[i] + ratio * self.ui_pose[i]
-        # 正弦插值（Sinusoidal interpolation）
-            # for i in range(G1_NUM_MOTOR):
-            #     self.low_cmd.motor_cmd[i].q = sinusoidal_interpolation(
-            #         self.initial_pose[i],
-            #         self.ui_pose[i],
-            #         ratio
-            #      )
+    def _LowCmdWrite(self):
+        now = self.clock_()
+        self._update_ui_pose(now)  # 加载最新 UI 目标位置
+        if self._seg_t0 is None:
+            self._restart_clock(now)
+        # 进度按时钟流逝计算：某拍迟到或被跳过时直接追上，3 s 的过渡不会被拉长
+        self.time_ = now - self._seg_t0
 
+        # kp/kd/mode 等静态字段已在 _init_low_cmd 中写好，这里只更新 q
+        q = self._q_cmd
+        if self.time_ < self.duration_:
+            # 阶段1：从初始位置平滑过渡到目标位置（整向量一次算完，曲线见 SetProfile）
+            ratio = self.profile_(min(max(self.time_ / self.duration_, 0.0), 1.0))
+            np.subtract(self.ui_pose, self.initial_pose, out=self._q_delta)
+            np.multiply(self._q_delta, ratio, out=q)
+            np.add(q, self.initial_pose, out=q)
+        elif self.player is not None:
+            # 轨迹播放：按流逝时间算出应到的行，跳拍时一次前进多行
+            if self._player_t0 is None:
+                self._player_t0 = now - self.control_dt_
+            due = int(round((now - self._player_t0) / self.control_dt_))
+            row = self.player.next_row(due - self.player.position)
+            if row is None:
+                self.ui_pose[:] = self.player.last_row
+                print(f"轨迹播放结束（underrun {self.player.underruns} 次）")
+                self.player = None
+                q[:] = self.ui_pose
+            else:
+                q[:] = row
         else:
             # 阶段2：保持目标位置
-            for i in range(G1_NUM_MOTOR):
-                self.low_cmd.motor_cmd[i].q = self.ui_pose[i]
+            q[:] = self.ui_pose
 
-        # 设置模式
-        self.low_cmd.mode_pr = Mode.PR
-        self.low_cmd.mode_machine = self.mode_machine_
-        
-        # 计算并发送CRC
-        self.low_cmd.crc = self.crc.Crc(self.low_cmd)
+        for cmd, qi in zip(self._motor_cmds, q.tolist()):
+            cmd.q = qi
+
+        # 计算并发送CRC：LowCmdEncoder 只按变化的 q 增量更新（与 SDK 的 CRC().Crc 逐位一致，见 lowcmd_crc.py）
+        self.low_cmd.crc = self.cmd_encoder.update_q(q)
         self.pub.Write(self.low_cmd)
 
+# --------------------------- 仿真快跑 ---------------------------
+def run_sim(custom, seconds):
+    """在 SimBackend 上不睡眠地跑 seconds 仿真秒，打印耗时与跟踪误差"""
+    sim = SimBackend(custom.control_dt_)
+    custom.Init(sim)
+    custom.ApplyModeMachine()
+    custom.StartServices()
+
+    exec_t = []
+    def tick():
+        t0 = time.perf_counter()
+        custom.LowCmdWrite()
+        exec_t.append(time.perf_counter() - t0)
+
+    wall = sim.run(tick, seconds)
+    err = np.abs(sim.q - custom._q_cmd)
+    us = np.array(exec_t) * 1e6
+    print(f"仿真 {seconds:.1f} s 用时 {wall:.2f} s（{seconds / wall:.1f}x 实时），{sim.commands} 帧 LowCmd")
+    print(f"LowCmdWrite p50 {np.percentile(us, 50):.1f} p99 {np.percentile(us, 99):.1f} "
+          f"max {us.max():.1f} us")
+    print(f"末拍跟踪误差 max {err.max():.4f} rad，CRC 错误 {sim.crc_errors}")
+    if custom.metrics is not None:
+        custom.metrics.close()
+    custom.StopServices()
+    return wall
+
+
 # --------------------------- main ---------------------------
 if __name__ == "__main__":
-    print("WARNING: 请确保机器人周围没有障碍物！")
-    print("请确保 target_pose.npy 文件已存在并包含目标姿态数据。")
-    input("准备好后按 Enter 开始 → ")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("iface", nargs="?", help="DDS 网卡名，例如 eth0")
+    parser.add_argument("--stream-port", type=int, default=None,
+                        help=f"开启 UDP/TCP 姿态流监听端口（常用 {DEFAULT_PORT}）")
+    parser.add_argument("--upload-port", type=int, default=None,
+                        help=f"开启 GUI 导出上传监听端口（常用 {UPLOAD_PORT}），代替 scp")
+    parser.add_argument("--state-port", type=int, default=None,
+                        help=f"开启实测关节角状态流（GUI 显示机器人实际姿态，常用 {STATE_PORT}）")
+    parser.add_argument("--state-rate", type=float, default=STATE_RATE,
+                        help="状态流抽取频率 Hz（默认 %(default)s）")
+    parser.add_argument("--record", type=pathlib.Path, default=None, metavar="DIR",
+                        help="录制每帧 LowState 与每拍 LowCmd 到该目录（python3 telemetry.py info 查看）")
+    parser.add_argument("--record-compress", choices=sorted(CODECS), default="zlib",
+                        help="录制文件压缩方式（默认 %(default)s）")
+    parser.add_argument("--record-rotate-mb", type=float, default=ROTATE_BYTES / 1024 ** 2,
+                        help="单个录制文件超过多少 MB 换下一个（默认 %(default)s）")
+    parser.add_argument("--record-keep", type=int, default=None,
+                        help="只保留最近 N 个录制文件，默认全部保留")
+    parser.add_argument("--trajectory", type=pathlib.Path, default=None,
+                        help="播放多关键帧轨迹 .npz（poses, durations[, profile]）")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=None,
+                        help="插值曲线，默认单姿态 linear、轨迹按文件或 min_jerk")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="控制循环统计打印间隔（秒），0 不打印；<0 完全关闭统计")
+    parser.add_argument("--sched", choices=("skip", "catchup"), default="skip",
+                        help="控制线程超时后的处理：skip 对齐到当前周期，catchup 补跑错过的拍")
+    parser.add_argument("--rt-priority", type=int, default=None,
+                        help="控制线程使用 SCHED_FIFO 的优先级（1-99，需要权限）")
+    parser.add_argument("--cpus", type=lambda s: {int(c) for c in s.split(",")}, default=None,
+                        help="控制线程绑定的 CPU，例如 3 或 2,3")
+    parser.add_argument("--sim", action="store_true",
+                        help="不连机器人，在本地仿真的 G1 上实时运行")
+    parser.add_argument("--sim-seconds", type=float, default=None,
+                        help="仿真不睡眠地跑指定仿真秒数，打印汇总后退出（隐含 --sim）")
+    args = parser.parse_args()
 
-    if len(sys.argv) > 1:
-        ChannelFactoryInitialize(0, sys.argv[1])
-    else:
-        ChannelFactoryInitialize(0)
+    if args.sim_seconds is not None:
+        args.sim = True
+    if not args.sim:
+        print("WARNING: 请确保机器人周围没有障碍物！")
+        print("请确保 target_pose.npy 文件已存在并包含目标姿态数据。")
+        input("准备好后按 Enter 开始 → ")
+
+        from unitree_sdk2py.core.channel import ChannelFactoryInitialize  # 仿真不需要 DDS 通道
+        if args.iface:
+            ChannelFactoryInitialize(0, args.iface)
+        else:
+            ChannelFactoryInitialize(0)
 
     custom = Custom()
-    custom.Init()
-    custom.Start()
+    custom.sched_ = dict(policy=args.sched, rt_priority=args.rt_priority, cpus=args.cpus)
+    if args.metrics_interval >= 0:
+        custom.EnableMetrics(report_interval=args.metrics_interval)
+    if args.profile is not None:
+        custom.SetProfile(args.profile)
+    if args.stream_port is not None:
+        custom.EnableStream(args.stream_port)
+    if args.upload_port is not None:
+        custom.EnableUpload(args.upload_port)
+    if args.state_port is not None:
+        custom.EnableStateStream(args.state_port, args.state_rate)
+    if args.record is not None:
+        custom.EnableRecorder(args.record, args.record_compress,
+                              int(args.record_rotate_mb * 1024 ** 2), args.record_keep)
+    if args.trajectory is not None:
+        traj = Trajectory.load(args.trajectory, args.profile, custom.control_dt_)
+        custom.pose_watcher.load_existing = False  # 不让旧的 target_pose.npy 打断轨迹
+        custom.PlayTrajectory(traj)
+    if not args.sim:
+        custom.Init()
+        custom.Start()
+    elif args.sim_seconds is None:
+        custom.Init(SimBackend(custom.control_dt_))
+        custom.Start()
+    else:
+        run_sim(custom, args.sim_seconds)
+        sys.exit(0)
 
     try:
         while True:
             time.sleep(0.5)
     except KeyboardInterrupt:
-        print("\n用户停止程序。")
\ No newline at end of file
+        print("\n用户停止程序。")
+        custom.StopServices()
+        loop = getattr(custom, "lowCmdWriteThreadPtr", None)
+        if hasattr(loop, "summary"):
+            print(loop.summary())
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+控制线程的绝对截止时刻调度
+
+第 k 拍的截止时刻固定为 t0 + k * interval（单调时钟 time.perf_counter），睡到截止时刻再执行，
+误差不会逐拍累积。某一拍超时后：
+    skip     直接对齐到当前所在的周期，错过的拍不补（默认）
+    catchup  连续补跑错过的拍，最多 max_catchup 拍，再多的按 skip 处理
+
+可选 SCHED_FIFO 实时优先级和 CPU 绑核（没有权限时打印提示后照常运行）。
+控制目标本身按墙钟流逝计算插值进度（见 Custom._LowCmdWrite），这里只负责按时调用。
+"""
+
+import os, time, threading
+
+
+class DeadlineLoop(threading.Thread):
+    """接口与 unitree_sdk2py 的 RecurrentThread 一致：构造后调用 Start()"""
+
+    def __init__(self, interval, target, name="control", policy="skip", max_catchup=5,
+                 rt_priority=None, cpus=None):
+        super().__init__(name=name, daemon=True)
+        if policy not in ("skip", "catchup"):
+            raise ValueError(f"未知超时策略 {policy!r}，可选 skip / catchup")
+        self.interval = interval
+        self.target = target
+        self.policy = policy
+        self.max_catchup = max_catchup
+        self.rt_priority = rt_priority
+        self.cpus = cpus
+        self._stop_evt = threading.Event()
+
+        # 统计（只在本线程写）
+        self.t_start = None
+        self.t_last = None     # 最近一次调用 target 的时刻
+        self.calls = 0         # 实际调用 target 次数
+        self.late = 0          # 开始时已超过下一个截止时刻的拍数
+        self.skipped = 0       # 按 skip 放弃的拍数
+        self.caught_up = 0     # 按 catchup 补跑的拍数
+        self.max_late = 0.0    # 最大迟到（秒）
+
+    def Start(self):
+        self.start()
+
+    def stop(self):
+        self._stop_evt.set()
+
+    # ---------------- 线程属性 ----------------
+    def _apply_thread_options(self):
+        if self.cpus:
+            try:
+                os.sched_setaffinity(0, self.cpus)  # Linux 上 0 表示当前线程
+                print(f"[{self.name}] 绑定 CPU {sorted(self.cpus)}")
+            except (AttributeError, OSError) as e:
+                print(f"[{self.name}] 绑核失败，忽略：{e}")
+        if self.rt_priority is not None:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.rt_priority))
+                print(f"[{self.name}] SCHED_FIFO 优先级 {self.rt_priority}")
+            except (AttributeError, OSError) as e:
+                print(f"[{self.name}] 无法切换 SCHED_FIFO（需要 root 或 CAP_SYS_NICE），按普通线程运行：{e}")
+
+    # ---------------- 主循环 ----------------
+    def run(self):
+        self._apply_thread_options()
+        interval = self.interval
+        clock = time.perf_counter
+        t0 = self.t_start = clock()
+        k = 0  # 下一拍的序号，截止时刻 t0 + k * interval
+        while not self._stop_evt.is_set():
+            deadline = t0 + k * interval
+            now = clock()
+            if now < deadline:
+                time.sleep(deadline - now)
+                now = clock()
+            late = now - deadline
+            if late >= interval:
+                behind = int(late / interval)          # 已经整拍错过的数量
+                self.late += 1
+                if late > self.max_late:
+                    self.max_late = late
+                n = min(behind, self.max_catchup) if self.policy == "catchup" else 0
+                for _ in range(n):                     # 背靠背补跑错过的拍
+                    self.target()
+                    self.calls += 1
+                self.caught_up += n
+                self.skipped += behind - n
+                k += behind
+            self.target()
+            self.calls += 1
+            self.t_last = now
+            k += 1
+
+    # ---------------- 汇总 ----------------
+    @property
+    def drift_corrected(self):
+        """按“每拍加一个 interval”计时会少算的时间（秒），即本调度器纠正掉的漂移"""
+        if self.t_last is None:
+            return 0.0
+        return (self.t_last - self.t_start) - (self.calls - 1) * self.interval
+
+    def summary(self):
+        return (f"[{self.name}] {self.calls} 拍，超时 {self.late} 次（最大迟到 {self.max_late * 1e3:.1f} ms），"
+                f"跳过 {self.skipped} 拍，补跑 {self.caught_up} 拍，纠正漂移 {self.drift_corrected * 1e3:.1f} ms")
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似自碰撞检测
+
+每个 link 的可视网格一次性拟合成一组球（link 坐标系）：顶点投到主轴坐标系，沿最长的两个主轴
+按网格切块，每块一个球，球心取块内顶点包围盒中心，半径取到块内顶点的最远距离
+（块内顶点都在球里，偏保守）。块边长约为最薄方向尺寸的一半，细长的手臂、腿得到一串小球，
+扁平的躯干得到一层球。
+
+参与检测的 link 对去掉三类（与 MoveIt Setup Assistant 的做法相同）：
+    相邻    运动学树上父子 link（经固定关节相连的 link 视为同一刚体）
+    默认    零位时就相交
+    总是    关节限位内随机采样，几乎每次都相交（关节处球的重叠）
+检测：
+    粗筛    每个 link 一个包住它全部球的大球，只在允许的 link 对之间比较
+    精检    粗筛相交的 link 对，把它们的球对一次性向量化求距离
+世界变换直接用 KinematicTree.world（GUI 拖拽时已经算好），不再做一次 FK。
+
+    python3 self_collision.py [g1_29dof.urdf]    # 球拟合统计 + 与全部球对暴力比较 + 单次检测耗时
+"""
+
+import sys, time
+import numpy as np
+
+from pose_state import urdf_limits
+
+CELL_RATIO = 0.5       # 切块边长 / 最薄方向尺寸
+MIN_CELL = 0.01        # 切块边长下限（米）
+MAX_CELLS = 8          # 每个主轴最多切几块
+ALWAYS_RATIO = 0.95    # 随机采样中相交比例超过此值的 link 对视为“总是相交”，不检测
+N_SAMPLES = 1000
+
+
+def fit_spheres(vertices):
+    """link 网格顶点 → (球心 (K, 3), 半径 (K,))，link 坐标系"""
+    v = np.asarray(vertices, dtype=np.float64)
+    mean = v.mean(axis=0)
+    _, _, axes = np.linalg.svd(v - mean, full_matrices=False)   # 行为主轴，按尺寸从大到小
+    local = (v - mean) @ axes.T
+    lo, hi = local.min(axis=0), local.max(axis=0)
+    extent = hi - lo
+    cell = max(extent[2] * CELL_RATIO, extent[0] / MAX_CELLS, extent[1] / MAX_CELLS, MIN_CELL)
+    n = np.maximum(np.ceil(extent[:2] / cell).astype(int), 1)
+    ij = np.minimum(((local[:, :2] - lo[:2]) / cell).astype(int), n - 1)
+    cell_id = ij[:, 0] * n[1] + ij[:, 1]
+    order = np.argsort(cell_id, kind="stable")
+    cell_id, v = cell_id[order], v[order]
+    starts = np.flatnonzero(np.r_[True, np.diff(cell_id) != 0])
+    centers = (np.minimum.reduceat(v, starts) + np.maximum.reduceat(v, starts)) / 2
+    owner = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(v)]))
+    radii = np.maximum.reduceat(np.linalg.norm(v - centers[owner], axis=1), starts)
+    return centers, radii
+
+
+class SelfCollision:
+    def __init__(self, robot, meshes, padding=0.0, samples=N_SAMPLES, seed=0):
+        """
+        robot：yourdfpy.URDF；meshes：{link: (vertices, faces, ...)}，通常是 MeshCache.load 的结果。
+        padding：每个球半径额外加多少米（正值更保守）。
+        """
+        from kinematics import KinematicTree
+
+        kin = KinematicTree(robot)
+        self.link_names = [name for name in meshes if len(meshes[name][0])]
+        centers, radii, owner = [], [], []
+        for k, name in enumerate(self.link_names):
+            c, r = fit_spheres(meshes[name][0])
+            centers.append(c)
+            radii.append(r + padding)
+            owner.append(np.full(len(r), k))
+        self.centers = np.concatenate(centers)       # (S, 3) link 坐标系
+        self.radii = np.concatenate(radii)           # (S,)
+        self.owner = np.concatenate(owner)           # (S,) 所属 link（self.link_names 下标）
+        self._centers_h = np.c_[self.centers, np.ones(len(self.radii))]   # 齐次坐标 (S, 4)
+        self._sphere_range = np.arange(len(self.radii))
+        self.link_idx = np.array([kin.link_index[name] for name in self.link_names], dtype=np.intp)
+
+        # 粗筛用的 link 包围球：球心取各球心包围盒中心
+        n_links = len(self.link_names)
+        self.bound_c = np.zeros((n_links, 3))
+        self.bound_r = np.zeros(n_links)
+        for k in range(n_links):
+            c, r = self.centers[self.owner == k], self.radii[self.owner == k]
+            self.bound_c[k] = (c.min(axis=0) + c.max(axis=0)) / 2
+            self.bound_r[k] = np.max(np.linalg.norm(c - self.bound_c[k], axis=1) + r)
+        self._bound_h = np.c_[self.bound_c, np.ones(n_links)]
+        self._diag = np.arange(n_links)
+
+        # 候选 link 对：去掉同一刚体和父子刚体
+        body = {}
+        for i, name in enumerate(kin.link_names):
+            p = kin.parent[i]
+            body[i] = body[p] if p >= 0 and kin.jtype[i] == 0 else i
+        body_parent = {body[i]: body[kin.parent[i]] for i in range(len(kin.link_names)) if kin.parent[i] >= 0}
+        pairs = []
+        for a in range(n_links):
+            for b in range(a + 1, n_links):
+                ba, bb = body[self.link_idx[a]], body[self.link_idx[b]]
+                if ba != bb and body_parent.get(ba) != bb and body_parent.get(bb) != ba:
+                    pairs.append((a, b))
+        self._set_pairs(np.array(pairs, dtype=np.intp).reshape(-1, 2))
+        self.n_adjacent = n_links * (n_links - 1) // 2 - len(pairs)
+
+        # 去掉零位就相交、随机采样几乎总相交的 link 对
+        names = list(kin.joint_of)
+        lower, upper, _ = urdf_limits(robot, names)
+        rng = np.random.default_rng(seed)
+        q = np.vstack([np.zeros((1, len(names))), rng.uniform(lower, upper, size=(samples, len(names)))])
+        hits = self.hit_pairs_batch(kin, names, q)
+        keep = ~(hits[0] | (hits[1:].mean(axis=0) >= ALWAYS_RATIO if samples else False))
+        self.n_default = int(hits[0].sum())
+        self.n_always = int((~keep).sum()) - self.n_default
+        self._set_pairs(self.pairs[keep])
+
+    def _set_pairs(self, pairs):
+        """按允许的 link 对展开球对，按 link 对分段连续存放"""
+        self.pairs = pairs
+        sa, sb, seg = [], [], [0]
+        members = [np.flatnonzero(self.owner == k) for k in range(len(self.link_names))]
+        for a, b in pairs.tolist():
+            ia, ib = np.meshgrid(members[a], members[b], indexing="ij")
+            sa.append(ia.ravel())
+            sb.append(ib.ravel())
+            seg.append(seg[-1] + ia.size)
+        self.sphere_a = np.concatenate(sa) if sa else np.zeros(0, dtype=np.intp)
+        self.sphere_b = np.concatenate(sb) if sb else np.zeros(0, dtype=np.intp)
+        self.seg = np.array(seg, dtype=np.intp)
+        self.pair_of = np.repeat(np.arange(len(pairs)), np.diff(self.seg))   # 球对 → link 对
+        self.reach2 = (self.radii[self.sphere_a] + self.radii[self.sphere_b]) ** 2
+        n_links = len(self.link_names)
+        self._pair_id = np.full((n_links, n_links), -1, dtype=np.intp)
+        self._pair_id[pairs[:, 0], pairs[:, 1]] = np.arange(len(pairs))
+        self._bound_reach2 = np.full((n_links, n_links), -1.0)
+        self._bound_reach2[pairs[:, 0], pairs[:, 1]] = (self.bound_r[pairs[:, 0]] + self.bound_r[pairs[:, 1]]) ** 2
+
+    def hit_pairs_batch(self, kin, joint_names, values, chunk=64):
+        """一批姿态下各候选 link 对是否相交，返回 (N, 对数) bool；离线采样用，不做粗筛，按 float32 计算"""
+        points = [(self.link_names[k], c) for k, c in zip(self.owner, self.centers)]
+        values = np.asarray(values, dtype=np.float32)
+        reach2 = self.reach2.astype(np.float32)
+        out = np.zeros((len(values), len(self.pairs)), dtype=bool)
+        for a in range(0, len(values), chunk):
+            w = kin.batch_points(joint_names, values[a:a + chunk], points)
+            dist2 = 0.0
+            for c in np.ascontiguousarray(w.transpose(2, 0, 1)):   # 按分量算，比 (n, s, 3) 上的 einsum 快得多
+                d = c[:, self.sphere_a] - c[:, self.sphere_b]
+                dist2 = dist2 + d * d
+            hit = dist2 < reach2
+            out[a:a + chunk] = np.logical_or.reduceat(hit, self.seg[:-1], axis=1)
+        return out
+
+    # ---------------- 检测 ----------------
+    def check(self, world):
+        """world：KinematicTree.world（全部 link 的 4x4）。返回相交的 link 名对列表"""
+        t = world[self.link_idx, :3].reshape(-1, 4)   # (3L, 4)：各 link 的 [R | p] 按行叠起来
+        # 粗筛：包围球心两两距离用一次矩阵乘得到，不允许的 link 对阈值为 -1
+        b = (self._bound_h @ t.T).reshape(len(self._bound_h), -1, 3)[self._diag, self._diag]
+        sq = (b * b).sum(axis=1)
+        a, c = np.nonzero(sq[:, None] + sq[None, :] - 2.0 * (b @ b.T) < self._bound_reach2)
+        if len(a) == 0:
+            return []
+        # 粗筛留下的 link 对各自的球对是 [seg[p], seg[p+1]) 一段，拼成一个下标数组
+        p = self._pair_id[a, c]
+        start, length = self.seg[p], self.seg[p + 1] - self.seg[p]
+        idx = np.repeat(start - np.cumsum(length) + length, length) + np.arange(length.sum())
+        # 精检：全部球心同样一次矩阵乘变换到世界系，再取各自所属 link 那一列
+        w = (self._centers_h @ t.T).reshape(len(self.radii), -1, 3)[self._sphere_range, self.owner]
+        d = w[self.sphere_a[idx]] - w[self.sphere_b[idx]]
+        hit = idx[(d * d).sum(axis=1) < self.reach2[idx]]
+        if len(hit) == 0:
+            return []
+        names = self.link_names
+        return [(names[self.pairs[p, 0]], names[self.pairs[p, 1]]) for p in np.unique(self.pair_of[hit]).tolist()]
+
+    def check_brute(self, world):
+        """对照：不做粗筛，全部球对逐一比较"""
+        t = world[self.link_idx]
+        w = np.einsum("sij,sj->si", t[self.owner, :3, :3], self.centers) + t[self.owner, :3, 3]
+        d = w[self.sphere_a] - w[self.sphere_b]
+        hit = np.einsum("sk,sk->s", d, d) < self.reach2
+        names = self.link_names
+        return [(names[self.pairs[p, 0]], names[self.pairs[p, 1]]) for p in np.unique(self.pair_of[hit]).tolist()]
+
+
+# ---------------- 对比 ----------------
+def self_check(urdf_path="g1_29dof.urdf", n=2000, seed=1):
+    import os
+    from yourdfpy import URDF
+    from kinematics import KinematicTree
+    from mesh_loader import MeshCache
+
+    robot = URDF.load(urdf_path, load_meshes=False)
+    base_dir = os.path.dirname(os.path.abspath(urdf_path))
+    meshes = MeshCache().load(robot, base_dir)
+    if not meshes:
+        print(f"{base_dir} 下没有可用网格，无法拟合")
+        return False
+    t0 = time.perf_counter()
+    model = SelfCollision(robot, meshes)
+    t_build = time.perf_counter() - t0
+    n_vertices = sum(len(m[0]) for m in meshes.values())
+    print(f"{len(model.link_names)} 个 link（{n_vertices} 个顶点）→ {len(model.radii)} 个球，"
+          f"半径中位数 {np.median(model.radii) * 1e3:.1f} mm；构建 {t_build * 1e3:.0f} ms")
+    print(f"link 对：检测 {len(model.pairs)}，去掉相邻 {model.n_adjacent}、零位相交 {model.n_default}、"
+          f"总是相交 {model.n_always}；球对 {len(model.sphere_a)}")
+
+    kin = KinematicTree(robot)
+    names = list(kin.joint_of)
+    lower, upper, _ = urdf_limits(robot, names)
+    rng = np.random.default_rng(seed)
+    mismatches, colliding, samples = 0, 0, []
+    for k in range(n):
+        kin.update(dict(zip(names, rng.uniform(lower, upper))))
+        t1 = time.perf_counter()
+        got = model.check(kin.world)
+        samples.append(time.perf_counter() - t1)
+        colliding += bool(got)
+        mismatches += got != model.check_brute(kin.world)
+    print(f"{n} 个随机姿态（自碰撞 {colliding}）：与全部球对暴力比较不一致 {mismatches}；"
+          f"单次检测 p50 {np.median(samples) * 1e6:.0f} us，p99 {np.percentile(samples, 99) * 1e6:.0f} us")
+    kin.update({name: 0.0 for name in names})
+    return mismatches == 0 and not model.check(kin.world)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check(*sys.argv[1:2]) else 1)
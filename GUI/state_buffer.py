@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+LowState 历史环形缓冲
+
+DDS 回调线程（唯一写者）每收到一帧 LowState 就写一行 q/dq/tau + IMU + 时间戳，
+内存在构造时一次分配好。读者（控制线程、日志、速度估计等）通过 seqlock 读到一致的数据：
+写者写之前把 seq 加成奇数、写完再加成偶数，读者发现读前读后 seq 不同或为奇数就重读。
+
+CommandRingBuffer 是控制线程每拍发出的 LowCmd 的同类缓冲。两者都有单调递增的 written，
+录制线程用 read_since 按序号增量取走新行（见 telemetry.py）。
+"""
+
+import time, operator
+import numpy as np
+
+Q, DQ, TAU = 0, 1, 2
+# imu 列的布局：LowState.imu_state 四个字段首尾相接
+IMU_FIELDS = (("quaternion", 4), ("gyroscope", 3), ("accelerometer", 3), ("rpy", 3))
+IMU_WIDTH = sum(n for _, n in IMU_FIELDS)
+
+
+class StateRingBuffer:
+    def __init__(self, num_motor, capacity):
+        self.num_motor = num_motor
+        self.capacity = capacity
+        self._data = np.zeros((capacity, 3, num_motor), dtype=np.float32)  # [行, q/dq/tau, 电机]
+        self.t = np.zeros(capacity, dtype=np.float64)     # 接收时刻（perf_counter）
+        self.tick = np.zeros(capacity, dtype=np.uint32)   # LowState.tick
+        self.mode_machine = np.zeros(capacity, dtype=np.uint8)
+        self.imu = np.zeros((capacity, IMU_WIDTH), dtype=np.float32)  # 布局见 IMU_FIELDS
+        self.q, self.dq, self.tau = self._data[:, Q], self._data[:, DQ], self._data[:, TAU]
+
+        self._get_q   = operator.attrgetter("q")
+        self._get_dq  = operator.attrgetter("dq")
+        self._get_tau = operator.attrgetter("tau_est")
+        self._head = 0   # 下一次写入的行
+        self._count = 0
+        self._seq = 0
+        self.written = 0  # 累计写入行数（单调递增，read_since 的序号）
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def last_time(self):
+        """最新一行的接收时刻；缓冲为空返回 None（单个 float 读取，不需要 seqlock）"""
+        return self.t[self._head - 1] if self._count else None
+
+    # ---------------- 写（DDS 回调线程） ----------------
+    def push(self, msg, t=None):
+        """写入一帧 LowState，返回本行 q 的视图（写者线程内可直接拷走）"""
+        # map + attrgetter 在 C 层逐字段取完 29 个电机，再一次整体写入本行
+        ms = msg.motor_state[:self.num_motor]
+        fields = [list(map(self._get_q, ms)), list(map(self._get_dq, ms)), list(map(self._get_tau, ms))]
+        imu = msg.imu_state
+        i = self._head
+        self._seq += 1                       # 奇数：写入中
+        self._data[i] = fields
+        self.imu[i] = imu.quaternion + imu.gyroscope + imu.accelerometer + imu.rpy  # IDL 里都是 list
+        self.t[i] = time.perf_counter() if t is None else t
+        self.tick[i] = msg.tick
+        self.mode_machine[i] = msg.mode_machine
+        self._head = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        self.written += 1
+        self._seq += 1                       # 偶数：写入完成
+        return self._data[i, Q]
+
+    # ---------------- 读（任意线程） ----------------
+    def _read(self, fn, retries=100):
+        for _ in range(retries):
+            s = self._seq
+            if s & 1 == 0:
+                result = fn()
+                if self._seq == s:
+                    return result
+            time.sleep(0)  # 让出 GIL，写者尽快写完
+        raise RuntimeError("state buffer: seqlock 重试次数过多")
+
+    def latest_into(self, q=None, dq=None, tau=None):
+        """把最新一行拷进调用方预分配的数组，返回该行时间戳；缓冲为空返回 None"""
+        def fn():
+            if self._count == 0:
+                return None
+            i = self._head - 1
+            if q is not None:
+                q[:] = self.q[i]
+            if dq is not None:
+                dq[:] = self.dq[i]
+            if tau is not None:
+                tau[:] = self.tau[i]
+            return self.t[i]
+        return self._read(fn)
+
+    def read_window(self, n, t=None, q=None, dq=None, tau=None):
+        """
+        把最近 n 行按时间先后拷进调用方预分配的数组（shape 分别为 (n,) / (n, num_motor)），
+        返回实际拷贝的行数（缓冲未满时可能少于 n），不分配新的数据数组。
+        """
+        pairs = [(dst, src) for dst, src in ((t, self.t), (q, self.q), (dq, self.dq), (tau, self.tau))
+                 if dst is not None]
+
+        def fn():
+            k = min(n, self._count)
+            start = self._head - k
+            for dst, src in pairs:
+                if start >= 0:
+                    dst[:k] = src[start:self._head]
+                else:  # 跨越数组末尾，分两段拷
+                    dst[:-start] = src[start:]
+                    dst[-start:k] = src[:self._head]
+            return k
+        return self._read(fn)
+
+    def snapshot(self, n=None):
+        """返回最近 n 行（默认全部）的拷贝，供日志等非实时场景使用"""
+        n = self._count if n is None else min(n, self._count)
+        out = {
+            "t":   np.empty(n, dtype=np.float64),
+            "q":   np.empty((n, self.num_motor), dtype=np.float32),
+            "dq":  np.empty((n, self.num_motor), dtype=np.float32),
+            "tau": np.empty((n, self.num_motor), dtype=np.float32),
+        }
+        k = self.read_window(n, **out)
+        return {name: arr[:k] for name, arr in out.items()}
+
+
+class CommandRingBuffer:
+    """
+    控制线程每拍发出的 LowCmd：q + 发送时刻 + crc。kp/kd/mode 等静态字段不逐拍记录。
+    唯一写者是控制线程；读者只通过 read_since 取 written 以下的完整行，不需要 seqlock。
+    """
+
+    def __init__(self, num_motor, capacity):
+        self.num_motor = num_motor
+        self.capacity = capacity
+        self.q = np.zeros((capacity, num_motor), dtype=np.float32)
+        self.t = np.zeros(capacity, dtype=np.float64)    # LowCmdWrite 开始时刻（perf_counter）
+        self.crc = np.zeros(capacity, dtype=np.uint32)
+        # 标量走 memoryview 原地写，比 ndarray 标量下标快（同 loop_metrics）
+        self._t_mv, self._crc_mv = memoryview(self.t), memoryview(self.crc)
+        self._head = 0
+        self.written = 0
+
+    def push(self, q, t, crc):
+        """控制线程热路径：一次整行拷贝 + 两个标量，不分配"""
+        i = self._head
+        self.q[i] = q
+        self._t_mv[i] = t
+        self._crc_mv[i] = crc
+        self._head = i + 1 if i + 1 < self.capacity else 0
+        self.written += 1
+
+
+# ---------------- 增量读取（录制线程） ----------------
+def read_since(ring, start, out, retries=100):
+    """
+    把 ring 中序号 >= start 的行按写入顺序拷进 out（{属性名: 预分配数组}，行数取各数组长度的最小值），
+    返回 (实际起始序号, 行数)。读得太慢、被写者套圈的行直接跳过，此时实际起始序号 > start。
+    写者写完一整行才把 written 加一，written 以下的行都是完整的；下一次写入会覆盖的最旧一行不读，
+    拷完再看 written，拷贝期间被覆盖就从新的位置重来。
+    """
+    cap = ring.capacity
+    room = min(len(dst) for dst in out.values())
+    for _ in range(retries):
+        end = ring.written
+        first = max(start, end - cap + 1)
+        k = min(end - first, room)
+        i0 = first % cap
+        i1 = i0 + k
+        for name, dst in out.items():
+            src = getattr(ring, name)
+            if i1 <= cap:
+                dst[:k] = src[i0:i1]
+            else:  # 跨越数组末尾，分两段拷
+                n = cap - i0
+                dst[:n] = src[i0:]
+                dst[n:k] = src[:i1 - cap]
+        if ring.written - cap < first:
+            return first, k
+        start = first
+    raise RuntimeError("ring buffer: 增量读取一直被写者套圈")
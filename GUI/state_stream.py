@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+机器人状态流（UDP）：把实测关节角按 30~60 Hz 抽取后发给 GUI，GUI 画成半透明的“影子”机器人
+
+LowState 500 Hz 由 DDS 回调写进 StateRingBuffer；StateStreamServer 是独立线程，按 rate 定时
+用 seqlock 读最新一行 q，再读 LowCmd 各电机的 q（指令），打包发给所有订阅者。
+控制线程不为它多做任何事。指令按电机逐个读取，可能混有相邻两拍的值，显示足够。
+
+状态帧（小端，定长 260 字节）：
+    magic   4s   b"G1ST"
+    ver     B    PROTO_VERSION
+    kind    B    FRAME_STATE
+    n       H    电机数，固定 29
+    seq     Q    递增序号，从 1 开始
+    t_state d    这行 LowState 的接收时刻（机器人端 perf_counter）
+    age     f    接收 → 发出的间隔（秒）
+    q       29f  实测关节角，电机顺序（见 pose_state.motor_joints）
+    q_cmd   29f  同一时刻的指令关节角
+
+订阅帧（小端，8 字节）：magic b"G1SS"，ver，kind（SUB_ON / SUB_OFF），resv H。
+GUI 每 RESUBSCRIBE 秒重发一次 SUB_ON；SUB_TIMEOUT 秒没收到的订阅者不再发送。
+
+GUI 端 StateReceiver 在接收线程里一次读空 socket，只保留 seq 最大的一帧；GUI 每个显示帧最多 take() 一次，
+网络来得再快也只画最新姿态，被覆盖没画的帧记为 coalesced。
+
+    python3 state_stream.py --loopback [--rate 50] [--gui-fps 60] [--seconds 3]   # 本机回环：时延、合并、正确性
+    python3 state_stream.py --connect 192.168.123.164 [--port 9872]               # 连 robot_control.py --state-port
+"""
+
+import sys, time, socket, select, struct, argparse, operator, threading, collections
+import numpy as np
+
+NUM_MOTORS    = 29
+DEFAULT_PORT  = 9872
+DEFAULT_RATE  = 50.0
+PROTO_VERSION = 1
+SUB_TIMEOUT   = 3.0
+RESUBSCRIBE   = 1.0
+
+FRAME_MAGIC = b"G1ST"
+SUB_MAGIC   = b"G1SS"
+FRAME = struct.Struct(f"<4sBBHQdf{NUM_MOTORS}f{NUM_MOTORS}f")
+SUB   = struct.Struct("<4sBBH")
+
+FRAME_STATE = 1
+SUB_ON, SUB_OFF = 1, 2
+
+StateFrame = collections.namedtuple("StateFrame", "seq t_state age q q_cmd t_recv")
+
+
+def pack_state(seq, t_state, age, q, q_cmd):
+    return FRAME.pack(FRAME_MAGIC, PROTO_VERSION, FRAME_STATE, NUM_MOTORS, seq, t_state, age,
+                      *np.asarray(q, dtype=np.float32).tolist(), *np.asarray(q_cmd, dtype=np.float32).tolist())
+
+
+def unpack_state(data, t_recv):
+    """合法帧返回 StateFrame，否则 None"""
+    if len(data) != FRAME.size:
+        return None
+    magic, ver, kind, n, seq, t_state, age, *values = FRAME.unpack(data)
+    if magic != FRAME_MAGIC or ver != PROTO_VERSION or kind != FRAME_STATE or n != NUM_MOTORS:
+        return None
+    values = np.asarray(values, dtype=np.float32)
+    return StateFrame(seq, t_state, age, values[:NUM_MOTORS], values[NUM_MOTORS:], t_recv)
+
+
+# ---------------- 机器人端 ----------------
+class StateStreamServer(threading.Thread):
+    """
+    state：StateRingBuffer（DDS 回调线程写）；motor_cmds：LowCmd.motor_cmd 各元素（控制线程写 .q）。
+    按 rate 抽取：每个周期发最新一行，没有新 LowState 时不发。
+    """
+
+    def __init__(self, state, motor_cmds, host="0.0.0.0", port=DEFAULT_PORT, rate=DEFAULT_RATE,
+                 sub_timeout=SUB_TIMEOUT):
+        super().__init__(name="state_stream", daemon=True)
+        self.state = state
+        self.motor_cmds = list(motor_cmds)
+        self.host, self.port = host, port
+        self.rate = rate
+        self.sub_timeout = sub_timeout
+        self.stats = collections.Counter()
+        self.pack_us = 0.0                      # 读缓冲 + 打包耗时（指数平均）
+        self._stop_evt = threading.Event()
+        self._subs = {}                         # 订阅者地址 → 过期时刻
+        self._q = np.zeros(NUM_MOTORS, dtype=np.float32)
+        self._get_q = operator.attrgetter("q")
+        self._last_t = None
+        self._seq = 0
+        self._sock = None
+
+    def stop(self):
+        self._stop_evt.set()
+
+    def run(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((self.host, self.port))
+        self._sock.setblocking(False)
+        print(f"[state] 监听 {self.host}:{self.port}（UDP），{self.rate:.0f} Hz")
+        period = 1.0 / self.rate
+        next_t = time.perf_counter()
+        try:
+            while not self._stop_evt.is_set():
+                timeout = min(max(next_t - time.perf_counter(), 0.0), 0.2)
+                if select.select([self._sock], [], [], timeout)[0]:
+                    self._read_subs()
+                now = time.perf_counter()
+                if now >= next_t:
+                    next_t += period
+                    if next_t < now:   # 落后一个周期以上（机器负载高）就对齐，不补发
+                        next_t = now + period
+                    self._publish(now)
+        finally:
+            self._sock.close()
+
+    def _read_subs(self):
+        now = time.perf_counter()
+        while True:
+            try:
+                data, addr = self._sock.recvfrom(64)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:   # Windows 下对端不可达会报 ConnectionResetError
+                continue
+            if len(data) != SUB.size:
+                self.stats["bad"] += 1
+                continue
+            magic, ver, kind, _ = SUB.unpack(data)
+            if magic != SUB_MAGIC or ver != PROTO_VERSION:
+                self.stats["bad"] += 1
+            elif kind == SUB_ON:
+                if addr not in self._subs:
+                    print(f"[state] 订阅 {addr[0]}:{addr[1]}")
+                self._subs[addr] = now + self.sub_timeout
+            elif kind == SUB_OFF:
+                self._subs.pop(addr, None)
+
+    def _publish(self, now):
+        for addr in [a for a, expire in self._subs.items() if expire < now]:
+            del self._subs[addr]
+        if not self._subs:
+            return
+        t = self.state.latest_into(self._q)
+        if t is None or t == self._last_t:
+            self.stats["no_state"] += 1
+            return
+        self._last_t = t
+        self._seq += 1
+        data = pack_state(self._seq, t, now - t, self._q, list(map(self._get_q, self.motor_cmds)))
+        us = (time.perf_counter() - now) * 1e6
+        self.pack_us = us if not self.pack_us else 0.9 * self.pack_us + 0.1 * us
+        self.stats["frames"] += 1
+        for addr in self._subs:
+            try:
+                self._sock.sendto(data, addr)
+                self.stats["sent"] += 1
+            except OSError:
+                self.stats["send_failed"] += 1
+
+
+# ---------------- GUI 端 ----------------
+class StateReceiver(threading.Thread):
+    """
+    订阅并接收状态流。take() 返回上次取走之后的最新一帧（没有新帧返回 None）。
+    on_frame()：新帧到达、且之前的帧都已取走时在接收线程里调用一次；
+    在被取走前继续到达的帧只覆盖缓冲、不再通知，GUI 侧的信号不会堆积。
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, on_frame=None, resubscribe=RESUBSCRIBE):
+        super().__init__(name="state_receiver", daemon=True)
+        self.host, self.port = host, port
+        self.on_frame = on_frame
+        self.resubscribe = resubscribe
+        self.error = None                  # 连接失败等致命错误，线程随之退出
+        self.stats = collections.Counter() # received / coalesced / lost / stale / bad / taken
+        self.last_recv = None              # 最近一帧的到达时刻（perf_counter）
+        self._latest = None
+        self._last_seq = 0
+        self._lock = threading.Lock()
+        self._stop_evt = threading.Event()
+        self._wake_r, self._wake_w = socket.socketpair()
+
+    def take(self):
+        with self._lock:
+            frame, self._latest = self._latest, None
+        if frame is not None:
+            self.stats["taken"] += 1
+        return frame
+
+    def stop(self):
+        self._stop_evt.set()
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def run(self):
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect((self.host, self.port))
+            sock.setblocking(False)
+        except OSError as e:
+            self.error = e
+            self._wake_r.close()
+            self._wake_w.close()
+            return
+        t_sub = -np.inf
+        try:
+            while not self._stop_evt.is_set():
+                now = time.perf_counter()
+                if now - t_sub >= self.resubscribe:
+                    self._send_sub(sock, SUB_ON)
+                    t_sub = now
+                ready, _, _ = select.select([sock, self._wake_r], [], [], self.resubscribe)
+                if sock in ready:
+                    self._drain(sock)
+            self._send_sub(sock, SUB_OFF)
+        finally:
+            sock.close()
+            self._wake_r.close()
+            self._wake_w.close()
+
+    def _send_sub(self, sock, kind):
+        try:
+            sock.send(SUB.pack(SUB_MAGIC, PROTO_VERSION, kind, 0))
+        except OSError:   # 机器人端还没起来（ICMP 不可达），下次重发
+            pass
+
+    def _drain(self, sock):
+        """一次读空 socket，只保留 seq 最大的帧"""
+        t_recv = time.perf_counter()
+        newest = None
+        while True:
+            try:
+                data = sock.recv(2048)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                continue
+            frame = unpack_state(data, t_recv)
+            if frame is None:
+                self.stats["bad"] += 1
+                continue
+            self.stats["received"] += 1
+            if self.last_recv is not None and t_recv - self.last_recv > SUB_TIMEOUT:
+                self._last_seq = 0           # 断流后重新开始（机器人端重启时 seq 从 1 算起）
+            if frame.seq <= self._last_seq:
+                self.stats["stale"] += 1
+                continue
+            self.stats["lost"] += frame.seq - self._last_seq - 1 if self._last_seq else 0
+            self._last_seq = frame.seq
+            if newest is not None:
+                self.stats["coalesced"] += 1
+            newest = frame
+        if newest is None:
+            return
+        self.last_recv = t_recv
+        with self._lock:
+            notify = self._latest is None
+            if not notify:
+                self.stats["coalesced"] += 1
+            self._latest = newest
+        if notify and self.on_frame is not None:
+            self.on_frame()
+
+
+# ---------------- 测试 ----------------
+def _fake_q(t):
+    """回环测试里机器人的实测角：每个关节不同频率的正弦"""
+    k = np.arange(NUM_MOTORS)
+    return (0.5 * np.sin(2 * np.pi * (0.2 + 0.05 * k) * t + k)).astype(np.float32)
+
+
+def _consume(receiver, seconds, fps, stats):
+    """模拟 GUI：每个显示帧最多取一次最新帧，记录端到端时延（同一台机器，时钟可比）"""
+    lat, max_err = [], 0.0
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        time.sleep(1.0 / fps)
+        frame = receiver.take()
+        if frame is None:
+            continue
+        lat.append(time.perf_counter() - frame.t_state)
+        max_err = max(max_err, float(np.abs(frame.q - _fake_q(frame.t_state)).max()))
+    stats["latency"], stats["max_err"] = lat, max_err
+
+
+def run_loopback(port, rate, gui_fps, seconds, state_hz=500.0):
+    from types import SimpleNamespace
+    from state_buffer import StateRingBuffer
+
+    state = StateRingBuffer(NUM_MOTORS, 2500)
+    cmds = [SimpleNamespace(q=0.0) for _ in range(NUM_MOTORS)]
+    msg = SimpleNamespace(tick=0, mode_machine=0,
+                          motor_state=[SimpleNamespace(q=0.0, dq=0.0, tau_est=0.0) for _ in range(NUM_MOTORS)],
+                          imu_state=SimpleNamespace(quaternion=[1.0, 0.0, 0.0, 0.0], gyroscope=[0.0] * 3,
+                                                    accelerometer=[0.0, 0.0, 9.81], rpy=[0.0] * 3))
+    stop = threading.Event()
+
+    def dds_and_control():
+        """500 Hz：写 LowState（DDS 回调）并更新指令（控制线程），与真机两个写者相同"""
+        next_t = time.perf_counter()
+        while not stop.is_set():
+            t = time.perf_counter()
+            for ms, v in zip(msg.motor_state, _fake_q(t).tolist()):
+                ms.q = v
+            msg.tick += 2
+            state.push(msg, t)
+            for cmd, v in zip(cmds, _fake_q(t + 0.01).tolist()):
+                cmd.q = v
+            next_t += 1.0 / state_hz
+            time.sleep(max(0.0, next_t - time.perf_counter()))
+
+    writer = threading.Thread(target=dds_and_control, name="fake_dds", daemon=True)
+    writer.start()
+    server = StateStreamServer(state, cmds, "127.0.0.1", port, rate)
+    server.start()
+    time.sleep(0.2)
+    receiver = StateReceiver("127.0.0.1", port)
+    receiver.start()
+    result = {}
+    _consume(receiver, seconds, gui_fps, result)
+    receiver.stop()
+    receiver.join()
+    server.stop()
+    server.join()
+    stop.set()
+
+    st, lat = receiver.stats, np.array(result["latency"]) * 1e3
+    print(f"状态 {state_hz:.0f} Hz → 抽取 {rate:.0f} Hz，GUI 取帧 {gui_fps:.0f} fps，{seconds:.0f} s")
+    print(f"  发出 {server.stats['frames']} 帧（{server.stats['frames'] / seconds:.1f}/s），读缓冲 + 打包 {server.pack_us:.0f} us/帧")
+    print(f"  收到 {st['received']}，画出 {st['taken']}，合并 {st['coalesced']}，丢失 {st['lost']}，乱序 {st['stale']}")
+    if len(lat):
+        print(f"  LowState → GUI 取走 p50 {np.percentile(lat, 50):.2f} ms，p99 {np.percentile(lat, 99):.2f} ms")
+    print(f"  取走的帧与对应时刻的实测角最大偏差 {result['max_err']:.1e} rad")
+    # 每个有效帧要么被取走、要么被更新的帧覆盖，最多剩最后一帧还在缓冲里
+    pending = st["received"] - st["stale"] - st["taken"] - st["coalesced"]
+    ok = st["taken"] > 0 and result["max_err"] < 1e-6 and pending in (0, 1)
+    return ok
+
+
+def run_connect(host, port, seconds):
+    from pose_state import motor_joints
+
+    receiver = StateReceiver(host, port)
+    receiver.start()
+    t_end = time.perf_counter() + seconds
+    ages, errs = [], []
+    while time.perf_counter() < t_end and receiver.error is None:
+        time.sleep(0.05)
+        frame = receiver.take()
+        if frame is not None:
+            ages.append(frame.age)
+            errs.append(np.abs(frame.q_cmd - frame.q))
+    receiver.stop()
+    receiver.join()
+    if receiver.error is not None:
+        print(f"连接失败：{receiver.error}")
+        return False
+    st = receiver.stats
+    print(f"{host}:{port} {seconds:.0f} s：收到 {st['received']} 帧（{st['received'] / seconds:.1f}/s），丢失 {st['lost']}")
+    if not errs:
+        print("没有收到状态帧（robot_control.py 是否带 --state-port 启动？）")
+        return False
+    peak = np.max(errs, axis=0)
+    worst = np.argsort(peak)[::-1][:5]
+    print(f"  机器人端 接收→发出 p50 {np.median(ages) * 1e3:.2f} ms")
+    print("  跟踪误差最大的关节：" + "，".join(f"{motor_joints[i]} {peak[i]:.3f} rad" for i in worst))
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="G1 机器人状态流测试")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--loopback", action="store_true", help="本机模拟 LowState + 服务端 + GUI 取帧")
+    mode.add_argument("--connect", metavar="HOST", help="订阅机器人端 robot_control.py --state-port")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="抽取频率 Hz（回环测试的服务端）")
+    parser.add_argument("--gui-fps", type=float, default=60.0, help="模拟 GUI 取帧频率")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args(argv)
+    if args.loopback:
+        ok = run_loopback(args.port, args.rate, args.gui_fps, args.seconds)
+    else:
+        ok = run_connect(args.connect, args.port, args.seconds)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
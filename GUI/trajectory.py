@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+多关键帧轨迹：插值曲线 + 预计算查表 + 分块流式播放
+
+关键帧文件（.npz）：
+    poses      (K, 29) float32  关键帧关节角（弧度），K >= 2；列为电机顺序（pose_state.motor_joints）
+    durations  (K-1,)  float    第 i 段从 poses[i] 到 poses[i+1] 的时长（秒）
+    profile    str（可选）      插值曲线，见 PROFILES
+
+加载时整条轨迹按控制周期离散成 (ticks, 29) 的连续数组，控制线程每拍只取一行；
+轨迹太长时改为后台线程分块生成、控制线程按块消费，不整体展开。
+"""
+
+import queue, threading
+import numpy as np
+
+# ---------------- 插值曲线 ----------------
+# 输入 ratio ∈ [0, 1]（标量或数组），输出插值进度 s ∈ [0, 1]
+
+def _linear(r):
+    return r
+
+def _sinusoidal(r):
+    return 0.5 - 0.5 * np.cos(np.pi * r)
+
+def _min_jerk(r):
+    return r * r * r * (10.0 + r * (-15.0 + 6.0 * r))
+
+def _smoothstep(r):
+    # 两端速度为 0 的三次曲线，即只有两个关键帧时的夹持三次样条
+    return r * r * (3.0 - 2.0 * r)
+
+PROFILES = {
+    "linear":       _linear,
+    "sinusoidal":   _sinusoidal,
+    "min_jerk":     _min_jerk,
+    "cubic_spline": _smoothstep,  # 单段时的退化形式；多关键帧走 _CubicSpline
+}
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"未知插值曲线 {name!r}，可选 {sorted(PROFILES)}") from None
+
+
+# ---------------- 三次样条 ----------------
+class _CubicSpline:
+    """端点速度为 0 的夹持三次样条，对 29 个关节一起求解（追赶法，O(K)）"""
+
+    def __init__(self, knots, values):
+        t = np.asarray(knots, dtype=np.float64)
+        y = np.asarray(values, dtype=np.float64)
+        h = np.diff(t)
+        k = len(t)
+        slope = np.diff(y, axis=0) / h[:, None]
+
+        # 三对角方程 a_i M_{i-1} + b_i M_i + c_i M_{i+1} = d_i
+        a = np.zeros(k); b = np.zeros(k); c = np.zeros(k)
+        d = np.zeros_like(y)
+        b[0], c[0] = 2.0 * h[0], h[0]
+        d[0] = 6.0 * slope[0]
+        a[1:-1], b[1:-1], c[1:-1] = h[:-1], 2.0 * (h[:-1] + h[1:]), h[1:]
+        d[1:-1] = 6.0 * (slope[1:] - slope[:-1])
+        a[-1], b[-1] = h[-1], 2.0 * h[-1]
+        d[-1] = -6.0 * slope[-1]
+
+        for i in range(1, k):
+            w = a[i] / b[i - 1]
+            b[i] -= w * c[i - 1]
+            d[i] -= w * d[i - 1]
+        m = np.empty_like(y)
+        m[-1] = d[-1] / b[-1]
+        for i in range(k - 2, -1, -1):
+            m[i] = (d[i] - c[i] * m[i + 1]) / b[i]
+
+        self.t, self.h, self.y, self.m = t, h, y, m
+
+    def __call__(self, seg, tau):
+        """seg: 每个采样点所在段，tau: 段内已过时间"""
+        h = self.h[seg][:, None]
+        b = tau[:, None]
+        a = h - b
+        m0, m1 = self.m[seg], self.m[seg + 1]
+        y0, y1 = self.y[seg], self.y[seg + 1]
+        return ((m0 * a ** 3 + m1 * b ** 3) / (6.0 * h)
+                + (y0 / h - m0 * h / 6.0) * a
+                + (y1 / h - m1 * h / 6.0) * b)
+
+
+# ---------------- 轨迹 ----------------
+class Trajectory:
+    def __init__(self, poses, durations, profile="min_jerk", dt=0.002):
+        poses = np.asarray(poses, dtype=np.float32)
+        durations = np.asarray(durations, dtype=np.float64).ravel()
+        if poses.ndim != 2 or poses.shape[0] < 2:
+            raise ValueError(f"关键帧应为 (K>=2, N) 数组，实际 {poses.shape}")
+        if durations.shape != (poses.shape[0] - 1,):
+            raise ValueError(f"durations 长度应为 {poses.shape[0] - 1}，实际 {durations.size}")
+        if np.any(durations <= 0):
+            raise ValueError("每段时长必须为正")
+        if not np.all(np.isfinite(poses)):
+            raise ValueError("关键帧包含 NaN/Inf")
+
+        self.poses = poses
+        self.durations = durations
+        self.profile = profile
+        self.dt = dt
+        self._ease = get_profile(profile)
+        self._starts = np.concatenate(([0.0], np.cumsum(durations)))
+        self.total_time = float(self._starts[-1])
+        self.n_ticks = int(np.ceil(self.total_time / dt)) + 1  # 含终点
+        self._spline = _CubicSpline(self._starts, poses) if profile == "cubic_spline" else None
+
+    @classmethod
+    def load(cls, path, profile=None, dt=0.002):
+        with np.load(path, allow_pickle=False) as z:
+            if profile is None:
+                profile = str(z["profile"]) if "profile" in z.files else "min_jerk"
+            return cls(z["poses"], z["durations"], profile, dt)
+
+    @property
+    def nbytes(self):
+        return self.n_ticks * self.poses.shape[1] * 4
+
+    def rows(self, start, stop):
+        """生成第 [start, stop) 拍的目标角度，返回 (stop-start, N) float32"""
+        t = np.minimum(np.arange(start, stop, dtype=np.float64) * self.dt, self.total_time)
+        seg = np.searchsorted(self._starts, t, side="right") - 1
+        seg = np.clip(seg, 0, len(self.durations) - 1)
+        tau = t - self._starts[seg]
+        if self._spline is not None:
+            out = self._spline(seg, tau)
+        else:
+            s = self._ease(tau / self.durations[seg])[:, None]
+            p0 = self.poses[seg]
+            out = p0 + s * (self.poses[seg + 1] - p0)
+        return np.ascontiguousarray(out, dtype=np.float32)
+
+    def table(self):
+        return self.rows(0, self.n_ticks)
+
+    def chunks(self, chunk_ticks):
+        for start in range(0, self.n_ticks, chunk_ticks):
+            yield self.rows(start, min(start + chunk_ticks, self.n_ticks))
+
+
+# ---------------- 播放器 ----------------
+class TrajectoryPlayer:
+    """
+    控制线程每拍调用 next_row(steps)，steps 为按时钟应前进的行数（跳拍后大于 1）。
+
+    轨迹表不超过 max_table_bytes 时加载即整体展开；否则由后台线程按 chunk_ticks
+    分块生成，放进有界队列，控制线程用 get_nowait 消费，不会阻塞。
+    队列来不及供数（underrun）时保持上一行并计数。
+    """
+
+    def __init__(self, trajectory, max_table_bytes=16 << 20, chunk_ticks=2500, prefetch=4):
+        self.trajectory = trajectory
+        self.underruns = 0
+        self._idx = 0
+        self._chunk_start = 0  # 当前块第一行在整条轨迹里的行号
+        self._done = False
+        self._queue = None
+        self._stop_evt = threading.Event()
+        if trajectory.nbytes <= max_table_bytes:
+            self._chunk = trajectory.table()
+        else:
+            self._queue = queue.Queue(maxsize=prefetch)
+            gen = trajectory.chunks(chunk_ticks)
+            self._chunk = next(gen)  # 第一块同步生成，开播时不会 underrun
+            self._producer = threading.Thread(target=self._produce, args=(gen,),
+                                              name="trajectory", daemon=True)
+            self._producer.start()
+        self.last_row = self._chunk[0]
+
+    @property
+    def streaming(self):
+        return self._queue is not None
+
+    def _put(self, item):
+        """队列满时每 0.1 s 检查一次 stop：播放被打断后没人再取，生产线程也能退出"""
+        while not self._stop_evt.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, gen):
+        for chunk in gen:
+            if not self._put(chunk):
+                return
+        self._put(None)  # 结束标记
+
+    def stop(self):
+        self._stop_evt.set()
+
+    @property
+    def position(self):
+        """已经播放的行数"""
+        return self._chunk_start + self._idx
+
+    def next_row(self, steps=1):
+        """前进 steps 行并返回该行（(N,) 视图）；steps <= 0 返回上一行；播放结束返回 None"""
+        if steps <= 0:
+            return self.last_row
+        target = self._idx + steps - 1  # 相对当前块的行号
+        while target >= len(self._chunk):
+            chunk = None
+            if not self._done and self._queue is not None:
+                try:
+                    chunk = self._queue.get_nowait()
+                except queue.Empty:
+                    self.underruns += 1
+                    return self.last_row
+            if chunk is None:  # 没有后续块：轨迹结束
+                self._done = True
+                if self._idx >= len(self._chunk):
+                    return None
+                target = len(self._chunk) - 1  # 跳拍越过终点时先落到最后一行
+                break
+            target -= len(self._chunk)
+            self._chunk_start += len(self._chunk)
+            self._chunk, self._idx = chunk, 0
+        row = self._chunk[target]
+        self._idx = target + 1
+        self.last_row = row
+        return row
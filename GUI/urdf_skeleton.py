@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动用的轻量 URDF 结构 + 占位骨架
+
+yourdfpy 连带 trimesh / networkx / scipy 导入要 1 秒以上，GUI 启动时只为了运动学树和限位不值得等。
+load_structure 用标准库 xml.etree 只读 link / joint（原点、转轴、限位、mimic），
+提供 KinematicTree、urdf_limits 和 GUI 建关节映射用到的那部分 yourdfpy.URDF 接口，几毫秒读完。
+skeleton_meshes 按运动学树给每个有 visual 的 link 生成占位网格：从 link 原点到各子关节原点一根方棒，
+原点处一个小方块，格式与 MeshCache.load 相同，真实网格在后台加载完成后逐个替换。
+
+    python3 urdf_skeleton.py    # 与 yourdfpy 的结构 / 正运动学 / 限位对比 + 读取耗时
+"""
+
+import sys, time
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+import numpy as np
+
+BONE_RADIUS = 0.015                    # 方棒半宽（米）
+KNOB_RADIUS = 0.022                    # link 原点方块半宽
+SKELETON_RGBA = (0.55, 0.62, 0.72, 1.0)
+_BOX_FACES = np.array([[0, 1, 3], [0, 3, 2], [4, 5, 7], [4, 7, 6],
+                       [0, 1, 5], [0, 5, 4], [2, 3, 7], [2, 7, 6],
+                       [0, 2, 6], [0, 6, 4], [1, 3, 7], [1, 7, 5]], dtype=np.int32)
+
+
+def _floats(text, default):
+    return np.array([float(x) for x in (text or default).split()])
+
+
+def _origin(elem):
+    """<origin xyz rpy> → 4x4，rpy 为固定轴 x-y-z（R = Rz·Ry·Rx），与 yourdfpy 相同"""
+    if elem is None:
+        return None
+    x, y, z = _floats(elem.get("xyz"), "0 0 0")
+    r, p, w = _floats(elem.get("rpy"), "0 0 0")
+    cr, sr, cp, sp, cw, sw = np.cos(r), np.sin(r), np.cos(p), np.sin(p), np.cos(w), np.sin(w)
+    return np.array([[cw * cp, cw * sp * sr - sw * cr, cw * sp * cr + sw * sr, x],
+                     [sw * cp, sw * sp * sr + cw * cr, sw * sp * cr - cw * sr, y],
+                     [-sp, cp * sr, cp * cr, z],
+                     [0.0, 0.0, 0.0, 1.0]])
+
+
+def _opt_float(elem, key):
+    value = elem.get(key)
+    return None if value is None else float(value)
+
+
+def load_structure(path):
+    """
+    只读运动学结构，返回带 robot.joints / joint_map / link_map / base_link 的对象，
+    可直接交给 KinematicTree、PoseState.from_urdf、urdf_limits、SelfCollision。
+    visual_links 为有 <visual> 的 link 名（文档顺序）。不含几何，网格仍由 MeshCache 从 yourdfpy 加载。
+    """
+    root = ET.parse(path).getroot()
+    links, joints = [], []
+    for elem in root.findall("link"):
+        links.append(SimpleNamespace(name=elem.get("name"), has_visual=elem.find("visual") is not None))
+    for elem in root.findall("joint"):
+        axis = elem.find("axis")
+        limit = elem.find("limit")
+        joints.append(SimpleNamespace(
+            name=elem.get("name"),
+            type=elem.get("type"),
+            parent=elem.find("parent").get("link"),
+            child=elem.find("child").get("link"),
+            origin=_origin(elem.find("origin")),
+            axis=np.array([1.0, 0.0, 0.0]) if axis is None else _floats(axis.get("xyz"), "1 0 0"),
+            limit=None if limit is None else SimpleNamespace(
+                lower=_opt_float(limit, "lower"), upper=_opt_float(limit, "upper"),
+                velocity=_opt_float(limit, "velocity"), effort=_opt_float(limit, "effort")),
+            mimic=elem.find("mimic")))
+    children = {j.child for j in joints}
+    roots = [link.name for link in links if link.name not in children]
+    if not roots:
+        raise ValueError(f"{path}：找不到根 link")
+    return SimpleNamespace(
+        robot=SimpleNamespace(name=root.get("name"), links=links, joints=joints),
+        link_map={link.name: link for link in links},
+        joint_map={j.name: j for j in joints},
+        base_link=roots[0],
+        visual_links=[link.name for link in links if link.has_visual])
+
+
+# ---------------- 占位骨架 ----------------
+def _box(p0, p1, e1, e2):
+    """以 p0→p1 为轴、截面半边 e1/e2 的长方体 8 个顶点，顺序与 _BOX_FACES 对应"""
+    return np.array([p + s1 * e1 + s2 * e2 for p in (p0, p1) for s1 in (-1, 1) for s2 in (-1, 1)])
+
+
+def skeleton_meshes(kin, links, bone=BONE_RADIUS, knob=KNOB_RADIUS, rgba=SKELETON_RGBA):
+    """
+    kin：KinematicTree；links：要生成占位的 link 名。
+    返回 {link: (vertices, faces, face_colors)}，坐标在 link 自身坐标系。
+    """
+    meshes = {}
+    ex, ey, ez = np.eye(3)
+    for name in links:
+        i = kin.link_index[name]
+        boxes = [_box(-knob * ez, knob * ez, knob * ex, knob * ey)]
+        for c in np.flatnonzero(kin.parent == i):
+            tip = kin.origin[c, :3, 3]
+            length = np.linalg.norm(tip)
+            if length < 2 * knob:   # 子关节与本 link 原点重合（髋、腕的串联关节），方块已经盖住
+                continue
+            u = tip / length
+            e1 = np.cross(u, ex if abs(u[0]) < 0.9 else ey)
+            e1 *= bone / np.linalg.norm(e1)
+            e2 = np.cross(u, e1)
+            boxes.append(_box(np.zeros(3), tip, e1, e2))
+        faces = np.concatenate([_BOX_FACES + 8 * k for k in range(len(boxes))])
+        meshes[name] = (np.concatenate(boxes).astype(np.float32), faces,
+                        np.tile(np.asarray(rgba, dtype=np.float32), (len(faces), 1)))
+    return meshes
+
+
+# ---------------- 自检 ----------------
+def self_check(urdf_path="g1_29dof.urdf", n=100, seed=0):
+    from kinematics import KinematicTree
+    from pose_state import urdf_limits
+
+    t0 = time.perf_counter()
+    light = load_structure(urdf_path)
+    t_light = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    from yourdfpy import URDF
+    t_import = time.perf_counter() - t0
+    robot = URDF.load(urdf_path, load_meshes=False)
+    t_full = time.perf_counter() - t0
+
+    ok = light.base_link == robot.base_link and list(light.joint_map) == list(robot.joint_map)
+    ok &= all((a.parent, a.child, a.type) == (b.parent, b.child, b.type)
+              for a, b in zip(light.joint_map.values(), robot.joint_map.values()))
+    ok &= light.visual_links == [name for name, link in robot.link_map.items() if link.visuals]
+    kl, kr = KinematicTree(light), KinematicTree(robot)
+    ok &= kl.link_names == kr.link_names
+    names = list(kr.joint_of)
+    for a, b in zip(urdf_limits(light, names), urdf_limits(robot, names)):
+        ok &= np.array_equal(a, b)
+    lower, upper, _ = urdf_limits(robot, names)
+    rng = np.random.default_rng(seed)
+    max_err = 0.0
+    for _ in range(n):
+        q = rng.uniform(lower, upper)
+        kl.update_values(kl.slots(names), q)
+        kr.update_values(kr.slots(names), q)
+        max_err = max(max_err, np.abs(kl.world - kr.world).max())
+    ok &= max_err < 1e-12
+    meshes = skeleton_meshes(kl, light.visual_links)
+    print(f"轻量读取 {t_light * 1e3:.1f} ms；yourdfpy 导入 {t_import * 1e3:.0f} ms + 读取 {(t_full - t_import) * 1e3:.0f} ms")
+    print(f"{len(light.joint_map)} 个关节，{len(light.link_map)} 个 link；随机姿态正运动学与 yourdfpy 最大偏差 {max_err:.1e}")
+    print(f"占位骨架：{len(meshes)} 个 link，{sum(m[1].shape[0] for m in meshes.values())} 个三角面")
+    print("结构、限位一致" if ok else "与 yourdfpy 不一致！")
+    return bool(ok)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_check(*sys.argv[1:2]) else 1)
@@ -1,41 +1,102 @@
 # -*- coding: utf-8 -*-
-import os, sys, numpy as np, trimesh
+import time
+_T0 = time.perf_counter()   # 启动计时起点，各阶段耗时都从开始导入本模块算起
+import io, os, sys, copy, threading, numpy as np
 import pyqtgraph.opengl as gl
 from pyqtgraph import Transform3D
-from yourdfpy import URDF  # 如果用 urdfpy，请改成：from urdfpy import URDF
+from pyqtgraph.opengl import shaders
+# yourdfpy / trimesh（mesh_loader）连带导入要 1 秒以上，只在后台加载网格的线程里导入
+from urdf_skeleton import load_structure, skeleton_meshes
+from kinematics import KinematicTree
+from ik import IKSolver
+from picking import Picker, ray_from_ndc
+from pose_state import PoseState, control_joints, motor_joints
+from pose_upload import UploadWorker, write_atomic
+from pose_stream import PoseMirror, DEFAULT_PORT as STREAM_PORT
+from state_stream import StateReceiver, DEFAULT_PORT as STATE_PORT
+from pose_library import PoseLibrary, NearestWorker
+from self_collision import SelfCollision
 
 # 解决 Windows 下 Qt 插件路径问题
 os.environ["QT_QPA_PLATFORM_PLUGIN_PATH"] = os.path.join(
     sys.prefix, "Lib", "site-packages", "PyQt5", "Qt", "plugins", "platforms"
 )
 
-from PyQt5 import QtWidgets, QtCore
+from PyQt5 import QtWidgets, QtCore, QtGui
+IMPORT_SECONDS = time.perf_counter() - _T0
 
 URDF_PATH = "g1_29dof.urdf"
-
-# 29 自由度 G1：输出时关节顺序（按钮打印与保存）
-control_joints = [
-    # 下三路
-    "left_hip_pitch_joint", "left_hip_roll_joint", "left_hip_yaw_joint",
-    "left_knee_joint",
-    "left_ankle_pitch_joint", "left_ankle_roll_joint",
-    "right_hip_pitch_joint", "right_hip_roll_joint", "right_hip_yaw_joint",
-    "right_knee_joint",
-    "right_ankle_pitch_joint", "right_ankle_roll_joint",
-    # 小蛮腰
-    "waist_yaw_joint", "waist_roll_joint", "waist_pitch_joint",
-    # 上肢
-    "left_shoulder_pitch_joint", "left_shoulder_roll_joint", "left_shoulder_yaw_joint",
-    "left_elbow_joint",
-    "right_shoulder_pitch_joint", "right_shoulder_roll_joint", "right_shoulder_yaw_joint",
-    "right_elbow_joint",
-    "left_wrist_yaw_joint", "left_wrist_pitch_joint", "left_wrist_roll_joint",
-    "right_wrist_yaw_joint", "right_wrist_pitch_joint", "right_wrist_roll_joint",
-]
+DEFAULT_LOD_BUDGET = 60000   # 拖拽/转相机时全身三角面上限，0 表示始终全精度
+LOD_IDLE_MS = 200            # 停止交互多久后恢复全精度
+DEFAULT_REFRESH_HZ = 60      # 取不到屏幕刷新率时按此合并重绘
+HOVER_RGB = "1.0, 0.75, 0.2"  # 悬停高亮色，与原色按 HOVER_MIX 混合
+HOVER_MIX = 0.45
+COLLISION_RGB = "1.0, 0.1, 0.1"  # 自碰撞 link 的高亮色
+COLLISION_MIX = 0.6
+REMOTE_POSE_DIR = "~/intern/hang/GUI"   # ssh 上传时机器人上 target_pose.npy 所在目录
+DEFAULT_MIRROR_HZ = 50           # 实时同步的发送频率上限
+DEFAULT_MIRROR_THRESHOLD = 0.005 # 任一关节变化超过多少弧度才发
+DEFAULT_LIBRARY_PATH = "pose_library"  # 姿态库目录（见 pose_library.py）
+SIMILAR_K = 8                    # 显示多少个最相似的库内姿态
+IK_WHEEL_STEP = 0.01             # 笛卡尔拖拽时滚轮一格沿视线移动目标多少米
+MESH_LOAD_FALLBACK_MS = 1000     # 首帧迟迟没画出（窗口被遮挡等）时，最晚多久开始后台加载网格
+GHOST_RGBA = (0.3, 0.75, 1.0, 0.35)  # 机器人实际姿态（影子）的颜色
+GHOST_LOD = 1                    # 影子用哪一级简化网格
+GHOST_SIDE_OFFSET = 0.8          # 并排显示时影子在模型哪一侧多远（米，沿 y）
+STATE_ERROR_WARN = 0.05          # 关节误差超过多少弧度标红
+STATE_TIMEOUT = 2.0              # 多久没收到状态帧算中断（秒）
+
+# 悬停高亮着色器：只换着色器，不重新上传网格/颜色数据。
+# pyqtgraph 0.14 起 GLMeshItem 走 VBO + a_position/a_color，之前的版本走固定管线的 gl_Vertex/gl_Color。
+if hasattr(gl.GLMeshItem, "upload_vertex_buffers"):
+    _HOVER_VS = """
+        uniform mat4 u_mvp;
+        attribute vec4 a_position;
+        attribute vec4 a_color;
+        varying vec4 v_color;
+        void main() {
+            v_color = a_color;
+            gl_Position = u_mvp * a_position;
+        }
+    """
+else:
+    _HOVER_VS = """
+        varying vec4 v_color;
+        void main() {
+            v_color = gl_Color;
+            gl_Position = ftransform();
+        }
+    """
+def _tint_shader(name, rgb, mix):
+    return shaders.ShaderProgram(name, [
+        shaders.VertexShader(_HOVER_VS),
+        shaders.FragmentShader(f"""
+            #ifdef GL_ES
+            precision mediump float;
+            #endif
+            varying vec4 v_color;
+            void main() {{
+                gl_FragColor = vec4(mix(v_color.rgb, vec3({rgb}), {mix}), v_color.a);
+            }}
+        """),
+    ])
+
+
+HOVER_SHADER = _tint_shader("g1_hover", HOVER_RGB, HOVER_MIX)
+COLLISION_SHADER = _tint_shader("g1_collision", COLLISION_RGB, COLLISION_MIX)
+
+
+def _mesh_item(link_name, mesh):
+    """(vertices, faces, face_colors) → 带 link_name 的不透明 GLMeshItem"""
+    vertices, faces, face_colors = mesh
+    item = gl.GLMeshItem(vertexes=vertices, faces=faces, faceColors=face_colors, smooth=False)
+    item.link_name = link_name
+    item.setGLOptions('opaque')
+    return item
 
 
 class MyGLViewWidget(gl.GLViewWidget):
-    def __init__(self, robot, joint_values,
+    def __init__(self, robot, pose,
                  shoulder_joint_names,
                  elbow_joint_names,
                  wrist_joint_names,
@@ -52,7 +113,10 @@ class MyGLViewWidget(gl.GLViewWidget):
                  left_wrist_links, right_wrist_links):
         super().__init__()
         self.robot = robot
-        self.joint_values = joint_values
+        self.pose = pose                 # PoseState：control_joints 顺序的 float32 数组 + URDF 限位 + 撤销历史
+        self.kin = KinematicTree(robot)  # 增量正运动学，拖拽时只重算变化关节以下的子树
+        self._kin_slots = self.kin.slots(pose.names)
+        self.kin.update_values(self._kin_slots, pose.q)
 
         # --- 关节名映射 ---
         # 臀
@@ -108,6 +172,35 @@ class MyGLViewWidget(gl.GLViewWidget):
         self.right_ankle_links     = right_ankle_links
         self.waist_links           = waist_links
 
+        # --- 笛卡尔拖拽：拖手/脚时移动抓住的那一点，由 IK 解整条链（肩/肘/腕、髋/膝/踝） ---
+        def hand(side):
+            link = f"{side}_rubber_hand"
+            return link if link in self.kin.link_index else f"{side}_wrist_yaw_link"
+        self.ik_chains = {
+            "draggingLeftWrist": (hand("left"), [
+                self.left_shoulder_pitch_joint, self.left_shoulder_roll_joint, self.left_shoulder_yaw_joint,
+                self.left_elbow_joint,
+                self.left_wrist_roll_joint, self.left_wrist_pitch_joint, self.left_wrist_yaw_joint]),
+            "draggingRightWrist": (hand("right"), [
+                self.right_shoulder_pitch_joint, self.right_shoulder_roll_joint, self.right_shoulder_yaw_joint,
+                self.right_elbow_joint,
+                self.right_wrist_roll_joint, self.right_wrist_pitch_joint, self.right_wrist_yaw_joint]),
+            "draggingLeftAnkle": ("left_ankle_roll_link", [
+                self.left_hip_pitch_joint, self.left_hip_roll_joint, self.left_hip_yaw_joint,
+                self.left_knee_joint,
+                self.left_ankle_pitch_joint, self.left_ankle_roll_joint]),
+            "draggingRightAnkle": ("right_ankle_roll_link", [
+                self.right_hip_pitch_joint, self.right_hip_roll_joint, self.right_hip_yaw_joint,
+                self.right_knee_joint,
+                self.right_ankle_pitch_joint, self.right_ankle_roll_joint]),
+        }
+        self.ik = IKSolver(self.kin, pose.names, pose.lower, pose.upper)
+        self.cartesian = False                # 由 RobotViewer 的复选框切换
+        self._ik_drag = None                  # 拖拽中：{link, chain, offset, target, dirty, err}
+        self.ik_us = 0.0                      # 单次求解耗时（指数平均）
+        self.ik_iters = 0
+        self.ik_err = 0.0
+
         # --- 拖拽状态 ---
         self.draggingRightShoulder = False
         self.draggingLeftShoulder  = False
@@ -125,103 +218,310 @@ class MyGLViewWidget(gl.GLViewWidget):
 
         self.dragPos = None
 
-    def mousePressEvent(self, ev):
-        if ev.button() == QtCore.Qt.LeftButton:
-            pos = ev.position() if hasattr(ev, 'position') else ev.localPos()
-            x, y = int(pos.x()), int(pos.y())
-            items = self.itemsAt((x, y, 1, 1))
-
-            # 手腕检测
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.left_wrist_links:
-                    self.draggingLeftWrist = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.right_wrist_links:
-                    self.draggingRightWrist = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
+        # --- 拾取：link → 拖拽状态名 查找表 ---
+        # 各组 link 集合有包含关系（肩组含整条手臂），按原来逐组检测的顺序登记，先登记的优先，
+        # 所以点到手腕仍然是拖手腕；命中哪个 link 由射线最近交点决定，不再受检测顺序影响。
+        self.link_group = {}
+        for flag, links in (
+                ("draggingLeftWrist", left_wrist_links), ("draggingRightWrist", right_wrist_links),
+                ("draggingLeftElbow", left_elbow_links), ("draggingRightElbow", right_elbow_links),
+                ("draggingRightShoulder", right_shoulder_links), ("draggingLeftShoulder", left_shoulder_links),
+                ("draggingLeftAnkle", left_ankle_links), ("draggingRightAnkle", right_ankle_links),
+                ("draggingLeftKnee", left_knee_links), ("draggingRightKnee", right_knee_links),
+                ("draggingLeftHip", left_hip_links), ("draggingRightHip", right_hip_links),
+                ("draggingWaist", waist_links)):
+            for link in links:
+                self.link_group.setdefault(link, flag)
+        self.group_links = {}
+        for link, flag in self.link_group.items():
+            self.group_links.setdefault(flag, []).append(link)
+        self.picker = None
+        self._pick_idx = None
+        self._pick_hit = None                 # 最近一次拾取的 (link, 命中点世界坐标)
+        self.hover_group = None
+        self._hover_pos = None
+        self.pick_us = 0.0                    # 单次拾取耗时（指数平均）
+        self.setMouseTracking(True)           # 不按键移动也收到事件，用于悬停高亮
+
+        # --- LOD：交互期间换低精度网格，空闲后恢复 ---
+        self._full_items = dict(link_items)   # 原网格；self.link_items 始终是当前显示的那一组
+        self._low_items = {}
+        self._low_active = False
+        self.lod_meshes = {}                  # link → [原网格, LOD 1, ...]
+        self.lod_budget = 0
+        self.lod_level = 0                    # 交互时使用的级别，0 表示不切换
+        self._idle_timer = QtCore.QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(LOD_IDLE_MS)
+        self._idle_timer.timeout.connect(self._end_interaction)
+        self.frame_ms = 0.0                   # paintGL 耗时（指数平均）
+        self.on_first_frame = None            # 第一次 paintGL 之后的回调（启动计时、开始加载网格）
+
+        # --- 按帧合并：输入事件只改 pose，每个显示帧最多做一次 FK + 推变换 ---
+        self._frame_timer = QtCore.QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._frame_timer.timeout.connect(self._flush_joints)
+        self._frame_interval = None           # 秒，首次使用时按屏幕刷新率确定
+        self._last_flush = 0.0
+        # 计数（GUI 线程读写），RobotViewer 定时取差值算速率
+        self.n_events = 0                     # 处理的鼠标移动/滚轮事件数
+        self.event_us = 0.0                   # 单个事件处理耗时（指数平均）
+        self.n_flushes = 0                    # 实际应用到模型的次数
+        self.on_pose_changed = None           # 模型姿态变化后的回调（实时同步、相似姿态），参数为 pose.q
+        # --- 自碰撞：每次应用姿态后检测，相交的 link 标红 ---
+        self.collision = None                 # SelfCollision，后台构建完成后由 set_collision 设置
+        self.colliding = []                   # 当前相交的 (link, link) 对
+        self._collision_links = set()
+        self.collision_us = 0.0               # 单次检测耗时（指数平均）
+        # --- 机器人实际姿态：半透明“影子”，每个显示帧最多从 ghost_source 取一次最新实测角 ---
+        self.ghost_source = None              # 回调：返回 motor_joints 顺序的实测角，没有新帧返回 None
+        self.ghost_kin = None
+        self._ghost_slots = None
+        self._ghost_items = {}
+        self._ghost_offset = np.eye(4)
+        self.n_paints = 0                     # paintGL 次数
+
+    # ---------- LOD ----------
+    def set_lod(self, lod_meshes, budget):
+        """lod_meshes：MeshCache.load(..., lods=True) 的结果；budget：交互时全身三角面上限"""
+        self.lod_meshes = lod_meshes
+        self.lod_budget = budget
+        from mesh_loader import pick_lod_level
+        level = pick_lod_level(lod_meshes, budget) if budget > 0 else 0
+        if level == self.lod_level and (self._low_items or not level):
+            return
+        if self._low_active:
+            self._show(self._full_items)
+        for item in self._low_items.values():
+            self.removeItem(item)
+        self._low_items = {}
+        self.lod_level = level
+        if level:
+            for link_name, levels in lod_meshes.items():
+                item = _mesh_item(link_name, levels[level])
+                item.setShader(self._link_shader(link_name))
+                item.setVisible(False)
+                self.addItem(item)
+                self._low_items[link_name] = item
+
+    def replace_link_mesh(self, link_name, mesh):
+        """换掉 link 的全精度网格（启动时占位骨架 → 真实网格），变换和高亮沿用当前状态"""
+        item = _mesh_item(link_name, mesh)
+        item.setTransform(Transform3D(*self.kin.transform(link_name).flatten()))
+        item.setShader(self._link_shader(link_name))
+        item.setVisible(not self._low_active)
+        self.addItem(item)
+        self.remove_link_mesh(link_name)
+        self._full_items[link_name] = item
+        if not self._low_active:
+            self.link_items[link_name] = item
+        self.update()
 
-            # 肘检测
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.left_elbow_links:
-                    self.draggingLeftElbow = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.right_elbow_links:
-                    self.draggingRightElbow = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
+    def remove_link_mesh(self, link_name):
+        old = self._full_items.pop(link_name, None)
+        if old is not None:
+            self.removeItem(old)
+        if not self._low_active:
+            self.link_items.pop(link_name, None)
+        self.update()
 
-            # 肩检测
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.right_shoulder_links:
-                    self.draggingRightShoulder = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.left_shoulder_links:
-                    self.draggingLeftShoulder = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
+    def lod_faces(self, level):
+        return sum(levels[level][1].shape[0] for levels in self.lod_meshes.values())
+
+    def _show(self, items):
+        """切换到另一组网格：先同步变换再显示，隐藏原来那组"""
+        for link_name, item in items.items():
+            item.setTransform(Transform3D(*self.kin.transform(link_name).flatten()))
+            item.setVisible(True)
+            old = self.link_items.get(link_name)
+            if old is not None and old is not item:
+                old.setVisible(False)
+        self.link_items = items
+
+    def _begin_interaction(self):
+        if self.lod_level and not self._low_active:
+            self._show(self._low_items)
+            self._low_active = True
+        self._idle_timer.start()
+
+    def _end_interaction(self):
+        if QtWidgets.QApplication.mouseButtons() != QtCore.Qt.NoButton:
+            self._idle_timer.start()   # 按键还没松开（拖拽中停住），继续保持低精度
+            return
+        if self._low_active:
+            self._show(self._full_items)
+            self._low_active = False
+            self.update()
+
+    def paintGL(self):
+        t0 = time.perf_counter()
+        super().paintGL()
+        dt = (time.perf_counter() - t0) * 1e3
+        self.frame_ms = dt if not self.frame_ms else 0.8 * self.frame_ms + 0.2 * dt
+        self.n_paints += 1
+        if self.n_paints == 1 and self.on_first_frame is not None:
+            self.on_first_frame()
+
+    # ---------- 按帧合并的关节更新 ----------
+    def frame_interval(self):
+        if self._frame_interval is None:
+            screen = self.screen() if hasattr(self, "screen") else None
+            hz = screen.refreshRate() if screen is not None else 0
+            self._frame_interval = 1.0 / (hz if hz >= 1 else DEFAULT_REFRESH_HZ)
+        return self._frame_interval
+
+    def schedule_update(self):
+        """输入事件调用：只登记，距上次应用不足一帧时推迟到下一帧，同一帧内的多次编辑合并成一次"""
+        if self._frame_timer.isActive():
+            return
+        wait = self._last_flush + self.frame_interval() - time.perf_counter()
+        self._frame_timer.start(max(0, int(wait * 1e3 + 0.5)))
+
+    def _flush_joints(self):
+        self._last_flush = time.perf_counter()
+        if self._ik_drag is not None and self._ik_drag["dirty"]:
+            self._solve_ik()
+        self.update_joints()
+        if self.ghost_source is not None:
+            self._update_ghost()
+        if self._hover_pos is not None:
+            x, y = self._hover_pos
+            self._hover_pos = None
+            self.set_hover(self.link_group.get(self.pick_link(x, y)))
+
+    # ---------- 拾取与悬停 ----------
+    def set_picker(self, picker):
+        self.picker = picker
+        self._pick_idx = np.array([self.kin.link_index[name] for name in picker.link_names], dtype=np.intp)
+
+    def pick_link(self, x, y):
+        """窗口坐标 (x, y) 下最近的 link 名；没有 Picker 时退回 GL 选择模式"""
+        if self.picker is None:
+            for item in self.itemsAt((int(x), int(y), 1, 1)):   # 已按深度排序
+                if hasattr(item, 'link_name'):
+                    return item.link_name
+            return None
+        t0 = time.perf_counter()
+        origin, direction = ray_from_ndc(np.linalg.inv(self._mvp()), *self._ndc(x, y))
+        link, t = self.picker.pick(origin, direction, self.kin.world[self._pick_idx])
+        self._pick_hit = None if link is None else (link, origin + t * direction)
+        us = (time.perf_counter() - t0) * 1e6
+        self.pick_us = us if not self.pick_us else 0.8 * self.pick_us + 0.2 * us
+        return link
+
+    def _mvp(self):
+        w, h = self.width(), self.height()
+        mvp = self.projectionMatrix((0, 0, w, h), (0, 0, w, h)) * self.viewMatrix()
+        return np.array(mvp.data()).reshape(4, 4).T   # Qt 按列存储
+
+    def _ndc(self, x, y):
+        return 2.0 * x / self.width() - 1.0, 1.0 - 2.0 * y / self.height()
+
+    def _link_shader(self, link):
+        """自碰撞标红优先于悬停高亮"""
+        if link in self._collision_links:
+            return COLLISION_SHADER
+        if self.hover_group is not None and self.link_group.get(link) == self.hover_group:
+            return HOVER_SHADER
+        return None
+
+    def _restyle(self, links):
+        """按当前悬停/碰撞状态重设这些 link 的着色器，两级 LOD 的网格一起切换"""
+        for link in links:
+            shader = self._link_shader(link)
+            for items in (self._full_items, self._low_items):
+                item = items.get(link)
+                if item is not None:
+                    item.setShader(shader)
+
+    def set_hover(self, group):
+        """高亮某个拖拽组包含的 link（None 取消）"""
+        if group == self.hover_group:
+            return
+        old = self.group_links.get(self.hover_group, ())
+        self.hover_group = group
+        self._restyle(set(old) | set(self.group_links.get(group, ())))
+        self.update()
 
-            # 踝检测
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.left_ankle_links:
-                    self.draggingLeftAnkle = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.right_ankle_links:
-                    self.draggingRightAnkle = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
+    # ---------- 自碰撞 ----------
+    def set_collision(self, model):
+        self.collision = model
+        self._check_collision()
+        self.update()
 
-            # 膝检测
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.left_knee_links:
-                    self.draggingLeftKnee = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.right_knee_links:
-                    self.draggingRightKnee = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
+    def _check_collision(self):
+        t0 = time.perf_counter()
+        self.colliding = self.collision.check(self.kin.world)
+        us = (time.perf_counter() - t0) * 1e6
+        self.collision_us = us if not self.collision_us else 0.8 * self.collision_us + 0.2 * us
+        links = {link for pair in self.colliding for link in pair}
+        if links != self._collision_links:
+            changed = links ^ self._collision_links
+            self._collision_links = links
+            self._restyle(changed)
+
+    # ---------- 机器人实际姿态（影子） ----------
+    def set_ghost(self, meshes, offset=(0.0, 0.0, 0.0)):
+        """meshes：{link: (vertices, faces, ...)}，None 关闭影子；offset：影子相对模型的平移（米）"""
+        for item in self._ghost_items.values():
+            self.removeItem(item)
+        self._ghost_items = {}
+        if meshes is None:
+            self.ghost_kin = None
+            self.update()
+            return
+        if self.ghost_kin is None:
+            self.ghost_kin = copy.deepcopy(self.kin)   # 收到第一帧之前与模型同姿态
+            self._ghost_slots = self.ghost_kin.slots(motor_joints)
+        self._ghost_offset = np.eye(4)
+        self._ghost_offset[:3, 3] = offset
+        for link_name, mesh in meshes.items():
+            item = gl.GLMeshItem(vertexes=mesh[0], faces=mesh[1], color=GHOST_RGBA, smooth=False)
+            item.setGLOptions('translucent')
+            item.setDepthValue(1)                       # 在不透明的模型之后画
+            item.setTransform(self._ghost_transform(link_name))
+            self.addItem(item)
+            self._ghost_items[link_name] = item
+        self.update()
 
-            # 臀检测
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.left_hip_links:
-                    self.draggingLeftHip = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.right_hip_links:
-                    self.draggingRightHip = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
+    def _ghost_transform(self, link_name):
+        return Transform3D(*(self._ghost_offset @ self.ghost_kin.transform(link_name)).flatten())
+
+    def _update_ghost(self):
+        q = self.ghost_source()
+        if q is None or self.ghost_kin is None:
+            return
+        for link_name in self.ghost_kin.update_values(self._ghost_slots, q):
+            item = self._ghost_items.get(link_name)
+            if item is not None:
+                item.setTransform(self._ghost_transform(link_name))
+        self.update()
 
-            # 腰检测
-            for item in items:
-                if hasattr(item, 'link_name') and item.link_name in self.waist_links:
-                    self.draggingWaist = True
-                    self.dragPos = pos
-                    ev.accept()
-                    return
+    def leaveEvent(self, ev):
+        self._hover_pos = None
+        self.set_hover(None)
+        return super().leaveEvent(ev)
+
+    def _record_event(self, t0):
+        us = (time.perf_counter() - t0) * 1e6
+        self.event_us = us if not self.n_events else 0.9 * self.event_us + 0.1 * us
+        self.n_events += 1
+
+    def mousePressEvent(self, ev):
+        if ev.button() == QtCore.Qt.LeftButton:
+            pos = ev.position() if hasattr(ev, 'position') else ev.localPos()
+            link = self.pick_link(pos.x(), pos.y())
+            group = self.link_group.get(link)
+            if group is not None:
+                if self.cartesian and group in self.ik_chains:
+                    self._begin_ik(group, link)
+                else:
+                    setattr(self, group, True)
+                self.pose.begin()   # 整个拖拽（含期间的滚轮）记为一步撤销
+                self.dragPos = pos
+                ev.accept()
+                return
 
             #没命中可拖拽目标 → 交给父类，让其初始化自己的 mousePos
             return super().mousePressEvent(ev)
@@ -233,6 +533,13 @@ class MyGLViewWidget(gl.GLViewWidget):
         return super().mousePressEvent(ev)
 
     def mouseMoveEvent(self, ev):
+        t0 = time.perf_counter()
+        try:
+            return self._handle_mouse_move(ev)
+        finally:
+            self._record_event(t0)
+
+    def _handle_mouse_move(self, ev):
         # 工具函数：读取位置并更新 dragPos
         def _get_diff():
             newPos = ev.position() if hasattr(ev, 'position') else ev.localPos()
@@ -242,173 +549,172 @@ class MyGLViewWidget(gl.GLViewWidget):
             self.dragPos = newPos
             return diff.x(), diff.y()
 
+        if ev.buttons() != QtCore.Qt.NoButton:
+            self._begin_interaction()   # 拖关节或转/平移相机
+
+        if self._ik_drag is not None and (ev.buttons() & QtCore.Qt.LeftButton):
+            pos = ev.position() if hasattr(ev, 'position') else ev.localPos()
+            d = self._ik_drag
+            self._move_ik_target(self._unproject(pos.x(), pos.y(), d["target"] + d["offset"]) - d["offset"])
+            ev.accept(); return
+
         if self.draggingRightShoulder and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.right_shoulder_yaw_joint]   += -dx * 0.01
-            self.joint_values[self.right_shoulder_pitch_joint] +=  dy * 0.01
-            self.joint_values[self.right_shoulder_yaw_joint]   = np.clip(self.joint_values[self.right_shoulder_yaw_joint],  -2.618, 2.618)
-            self.joint_values[self.right_shoulder_pitch_joint] = np.clip(self.joint_values[self.right_shoulder_pitch_joint], -3.0892, 2.6704)
-            self.update_joints()
+            self.pose.nudge({self.right_shoulder_yaw_joint: -dx * 0.01, self.right_shoulder_pitch_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingLeftShoulder and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.left_shoulder_yaw_joint]   += -dx * 0.01
-            self.joint_values[self.left_shoulder_pitch_joint] +=  dy * 0.01
-            self.joint_values[self.left_shoulder_yaw_joint]   = np.clip(self.joint_values[self.left_shoulder_yaw_joint],  -2.618, 2.618)
-            self.joint_values[self.left_shoulder_pitch_joint] = np.clip(self.joint_values[self.left_shoulder_pitch_joint], -3.0892, 2.6704)
-            self.update_joints()
+            self.pose.nudge({self.left_shoulder_yaw_joint: -dx * 0.01, self.left_shoulder_pitch_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingRightElbow and (ev.buttons() & QtCore.Qt.LeftButton):
             _, dy = _get_diff()
-            self.joint_values[self.right_elbow_joint] += dy * 0.01
-            self.joint_values[self.right_elbow_joint]  = np.clip(self.joint_values[self.right_elbow_joint], -1.0472, 2.0944)
-            self.update_joints()
+            self.pose.nudge({self.right_elbow_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingLeftElbow and (ev.buttons() & QtCore.Qt.LeftButton):
             _, dy = _get_diff()
-            self.joint_values[self.left_elbow_joint] += dy * 0.01
-            self.joint_values[self.left_elbow_joint]  = np.clip(self.joint_values[self.left_elbow_joint], -1.0472, 2.0944)
-            self.update_joints()
+            self.pose.nudge({self.left_elbow_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingLeftWrist and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.left_wrist_yaw_joint]   += -dx * 0.01
-            self.joint_values[self.left_wrist_pitch_joint] +=  dy * 0.01
-            self.joint_values[self.left_wrist_yaw_joint]   = np.clip(self.joint_values[self.left_wrist_yaw_joint],  -1.614429558, 1.614429558)
-            self.joint_values[self.left_wrist_pitch_joint] = np.clip(self.joint_values[self.left_wrist_pitch_joint], -1.614429558, 1.614429558)
-            self.update_joints()
+            self.pose.nudge({self.left_wrist_yaw_joint: -dx * 0.01, self.left_wrist_pitch_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingRightWrist and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.right_wrist_yaw_joint]   += -dx * 0.01
-            self.joint_values[self.right_wrist_pitch_joint] +=  dy * 0.01
-            self.joint_values[self.right_wrist_yaw_joint]   = np.clip(self.joint_values[self.right_wrist_yaw_joint],  -1.614429558, 1.614429558)
-            self.joint_values[self.right_wrist_pitch_joint] = np.clip(self.joint_values[self.right_wrist_pitch_joint], -1.614429558, 1.614429558)
-            self.update_joints()
+            self.pose.nudge({self.right_wrist_yaw_joint: -dx * 0.01, self.right_wrist_pitch_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingLeftHip and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.left_hip_yaw_joint]   += -dx * 0.01
-            self.joint_values[self.left_hip_pitch_joint] +=  dy * 0.01
-            self.joint_values[self.left_hip_yaw_joint]   = np.clip(self.joint_values[self.left_hip_yaw_joint],   -2.7576, 2.7576)
-            self.joint_values[self.left_hip_pitch_joint] = np.clip(self.joint_values[self.left_hip_pitch_joint], -2.5307, 2.8798)
-            self.update_joints()
+            self.pose.nudge({self.left_hip_yaw_joint: -dx * 0.01, self.left_hip_pitch_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingRightHip and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.right_hip_yaw_joint]   += -dx * 0.01
-            self.joint_values[self.right_hip_pitch_joint] +=  dy * 0.01
-            self.joint_values[self.right_hip_yaw_joint]   = np.clip(self.joint_values[self.right_hip_yaw_joint],   -2.7576, 2.7576)
-            self.joint_values[self.right_hip_pitch_joint] = np.clip(self.joint_values[self.right_hip_pitch_joint], -2.5307, 2.8798)
-            self.update_joints()
+            self.pose.nudge({self.right_hip_yaw_joint: -dx * 0.01, self.right_hip_pitch_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingLeftKnee and (ev.buttons() & QtCore.Qt.LeftButton):
             _, dy = _get_diff()
-            self.joint_values[self.left_knee_joint] += -dy * 0.01
-            self.joint_values[self.left_knee_joint]  = np.clip(self.joint_values[self.left_knee_joint], -0.087267, 2.8798)
-            self.update_joints()
+            self.pose.nudge({self.left_knee_joint: -dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingRightKnee and (ev.buttons() & QtCore.Qt.LeftButton):
             _, dy = _get_diff()
-            self.joint_values[self.right_knee_joint] += -dy * 0.01
-            self.joint_values[self.right_knee_joint]  = np.clip(self.joint_values[self.right_knee_joint], -0.087267, 2.8798)
-            self.update_joints()
+            self.pose.nudge({self.right_knee_joint: -dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingLeftAnkle and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.left_ankle_pitch_joint] += -dx * 0.01
-            self.joint_values[self.left_ankle_roll_joint]  +=  dy * 0.01
-            self.joint_values[self.left_ankle_pitch_joint] = np.clip(self.joint_values[self.left_ankle_pitch_joint], -0.87267, 0.5236)
-            self.joint_values[self.left_ankle_roll_joint]  = np.clip(self.joint_values[self.left_ankle_roll_joint],  -0.2618, 0.2618)
-            self.update_joints()
+            self.pose.nudge({self.left_ankle_pitch_joint: -dx * 0.01, self.left_ankle_roll_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingRightAnkle and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.right_ankle_pitch_joint] += -dx * 0.01
-            self.joint_values[self.right_ankle_roll_joint]  +=  dy * 0.01
-            self.joint_values[self.right_ankle_pitch_joint] = np.clip(self.joint_values[self.right_ankle_pitch_joint], -0.87267, 0.5236)
-            self.joint_values[self.right_ankle_roll_joint]  = np.clip(self.joint_values[self.right_ankle_roll_joint],  -0.2618, 0.2618)
-            self.update_joints()
+            self.pose.nudge({self.right_ankle_pitch_joint: -dx * 0.01, self.right_ankle_roll_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
         elif self.draggingWaist and (ev.buttons() & QtCore.Qt.LeftButton):
             dx, dy = _get_diff()
-            self.joint_values[self.waist_yaw_joint]   += -dx * 0.01
-            self.joint_values[self.waist_pitch_joint] +=  dy * 0.01
-            self.joint_values[self.waist_yaw_joint]   = np.clip(self.joint_values[self.waist_yaw_joint],   -2.618, 2.618)
-            self.joint_values[self.waist_pitch_joint] = np.clip(self.joint_values[self.waist_pitch_joint], -0.52, 0.52)
-            self.update_joints()
+            self.pose.nudge({self.waist_yaw_joint: -dx * 0.01, self.waist_pitch_joint: dy * 0.01})
+            self.schedule_update()
             ev.accept(); return
 
+        if ev.buttons() == QtCore.Qt.NoButton:
+            # 悬停：只记下位置，拾取和高亮放到下一帧统一做
+            pos = ev.position() if hasattr(ev, 'position') else ev.localPos()
+            self._hover_pos = (pos.x(), pos.y())
+            self.schedule_update()
+
         # 非拖拽 → 父类处理
         return super().mouseMoveEvent(ev)
 
     def wheelEvent(self, ev):
+        t0 = time.perf_counter()
+        try:
+            return self._handle_wheel(ev)
+        finally:
+            self._record_event(t0)
+
+    def _handle_wheel(self, ev):
         d = ev.angleDelta().y()
         if abs(d) < 1:
             return super().wheelEvent(ev)
 
+        self._begin_interaction()
         step = 0.05 if d > 0 else -0.05
 
+        if self._ik_drag is not None:
+            # 笛卡尔拖拽：滚轮沿视线推远/拉近目标
+            cam = self.cameraPosition()
+            target = self._ik_drag["target"]
+            ray = target - np.array([cam.x(), cam.y(), cam.z()])
+            self._move_ik_target(target + np.sign(d) * IK_WHEEL_STEP * ray / np.linalg.norm(ray))
+            ev.accept(); return
+
         if self.draggingRightShoulder:
-            self.joint_values[self.right_shoulder_roll_joint] += step
-            self.joint_values[self.right_shoulder_roll_joint]  = np.clip(self.joint_values[self.right_shoulder_roll_joint], -2.2515, 1.5882)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.right_shoulder_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         if self.draggingLeftShoulder:
-            self.joint_values[self.left_shoulder_roll_joint] += step
-            self.joint_values[self.left_shoulder_roll_joint]  = np.clip(self.joint_values[self.left_shoulder_roll_joint], -1.5882, 2.2515)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.left_shoulder_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         if self.draggingLeftWrist:
-            self.joint_values[self.left_wrist_roll_joint] += step
-            self.joint_values[self.left_wrist_roll_joint]  = np.clip(self.joint_values[self.left_wrist_roll_joint], -1.972222054, 1.972222054)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.left_wrist_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         if self.draggingRightWrist:
-            self.joint_values[self.right_wrist_roll_joint] += step
-            self.joint_values[self.right_wrist_roll_joint]  = np.clip(self.joint_values[self.right_wrist_roll_joint], -1.972222054, 1.972222054)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.right_wrist_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         if self.draggingLeftHip:
-            self.joint_values[self.left_hip_roll_joint] += step
-            self.joint_values[self.left_hip_roll_joint]  = np.clip(self.joint_values[self.left_hip_roll_joint], -0.5236, 2.9671)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.left_hip_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         if self.draggingRightHip:
-            self.joint_values[self.right_hip_roll_joint] += step
-            self.joint_values[self.right_hip_roll_joint]  = np.clip(self.joint_values[self.right_hip_roll_joint], -2.9671, 0.5236)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.right_hip_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         if self.draggingLeftAnkle:
-            self.joint_values[self.left_ankle_roll_joint] += step
-            self.joint_values[self.left_ankle_roll_joint]  = np.clip(self.joint_values[self.left_ankle_roll_joint], -0.2618, 0.2618)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.left_ankle_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         if self.draggingRightAnkle:
-            self.joint_values[self.right_ankle_roll_joint] += step
-            self.joint_values[self.right_ankle_roll_joint]  = np.clip(self.joint_values[self.right_ankle_roll_joint], -0.2618, 0.2618)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.right_ankle_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         if self.draggingWaist:
-            self.joint_values[self.waist_roll_joint] += step
-            self.joint_values[self.waist_roll_joint]  = np.clip(self.joint_values[self.waist_roll_joint], -0.52, 0.52)
-            self.update_joints(); ev.accept(); return
+            self.pose.nudge({self.waist_roll_joint: step})
+            self.schedule_update(); ev.accept(); return
 
         # 非拖拽滚轮：父类处理（缩放）
         return super().wheelEvent(ev)
 
+    def undo(self):
+        if self.pose.undo():
+            self.schedule_update()
+
+    def redo(self):
+        if self.pose.redo():
+            self.schedule_update()
+
     def mouseReleaseEvent(self, ev):
         if ev.button() == QtCore.Qt.LeftButton:
             # 重置拖拽状态
@@ -425,26 +731,110 @@ class MyGLViewWidget(gl.GLViewWidget):
             self.draggingRightAnkle    = False
             self.draggingLeftAnkle     = False
             self.draggingWaist         = False
+            self._ik_drag = None
             #清空自己的拖拽点
             self.dragPos = None
+            self.pose.commit()
+        if self._low_active:
+            self._idle_timer.start()
         return super().mouseReleaseEvent(ev)
 
+    # ---------- 笛卡尔拖拽 ----------
+    def _begin_ik(self, group, link):
+        """
+        IK 的目标始终是链末端 link（手 / 踝）的原点，抓取点与它的世界偏移在拖拽中保持不变：
+        直接拿点击点当目标时，点在踝、腕上的杠杆臂会让解卡在“转踝代替抬腿”这类局部极小里
+        """
+        tip, chain = self.ik_chains[group]
+        target = self.kin.point(tip)
+        hit = self._pick_hit
+        offset = hit[1] - target if hit is not None and hit[0] == link else np.zeros(3)
+        self._ik_drag = {"link": tip, "chain": chain, "offset": offset,
+                         "target": target, "dirty": False, "err": np.inf}
+
+    def _unproject(self, x, y, ref):
+        """窗口坐标 (x, y) 反投影到与 ref 同深度（平行于屏幕的平面）上的世界坐标"""
+        mvp = self._mvp()
+        clip = mvp @ np.append(ref, 1.0)
+        p = np.linalg.inv(mvp) @ np.array([*self._ndc(x, y), clip[2] / clip[3], 1.0])
+        return p[:3] / p[3]
+
+    def _move_ik_target(self, target):
+        self._ik_drag.update(target=target, dirty=True, err=np.inf)
+        self.schedule_update()
+
+    def _solve_ik(self):
+        """每帧最多解一次，时间预算半帧；没收敛但还在变好时下一帧接着解"""
+        d = self._ik_drag
+        t0 = time.perf_counter()
+        q, err, it = self.ik.solve(self.pose.q, d["chain"], d["link"], d["target"],
+                                   budget=0.5 * self.frame_interval())
+        self.pose.q[:] = q
+        self.pose.clamp()
+        us = (time.perf_counter() - t0) * 1e6
+        self.ik_us = us if not self.ik_us else 0.8 * self.ik_us + 0.2 * us
+        self.ik_iters, self.ik_err = it, err
+        d["dirty"] = err >= self.ik.tol and err < d["err"] - self.ik.tol
+        d["err"] = err
+        if d["dirty"]:
+            self.schedule_update()
+
     def update_joints(self):
-        self.robot.update_cfg(self.joint_values)
-        for link_name, item in self.link_items.items():
-            T = self.robot.get_transform(link_name, frame_from=None)
-            transform = Transform3D(*T.flatten())
-            item.setTransform(transform)
+        """立即应用 pose；只给变换有变化的 link 推送新矩阵，关节值没变时不重绘"""
+        changed = self.kin.update_values(self._kin_slots, self.pose.q)
+        if not changed:
+            return
+        self.n_flushes += 1
+        for link_name in changed:
+            item = self.link_items.get(link_name)
+            if item is not None:
+                item.setTransform(Transform3D(*self.kin.transform(link_name).flatten()))
+        if self.collision is not None:
+            self._check_collision()
         self.update()
+        if self.on_pose_changed is not None:
+            self.on_pose_changed(self.pose.q)
+
+
+class UploadSignals(QtCore.QObject):
+    """上传线程 → GUI 线程（跨线程 emit 自动排队到主线程）"""
+    progress = QtCore.pyqtSignal(str)
+    done = QtCore.pyqtSignal(object, object)
+
+
+class LibrarySignals(QtCore.QObject):
+    """姿态库后台打开/建索引/查询 → GUI 线程"""
+    opened = QtCore.pyqtSignal(object, object)          # (PoseLibrary 或 None, 错误)
+    indexed = QtCore.pyqtSignal(float)                  # 建树耗时（秒）
+    similar = QtCore.pyqtSignal(object, object, float)  # (距离, 下标, 查询耗时秒)
+
+
+class CollisionSignals(QtCore.QObject):
+    """自碰撞模型后台构建完成 → GUI 线程"""
+    ready = QtCore.pyqtSignal(object, object, float)   # (SelfCollision 或 None, 错误, 耗时秒)
+
+
+class StateSignals(QtCore.QObject):
+    """状态流接收线程 → GUI 线程：有新帧（上一帧已画出后只发一次）"""
+    frame = QtCore.pyqtSignal()
+
+
+class MeshSignals(QtCore.QObject):
+    """后台网格加载 → GUI 线程"""
+    link = QtCore.pyqtSignal(str, object)      # (link, [原网格, LOD 1, ...])
+    done = QtCore.pyqtSignal(object, object)   # (MeshCache 或 None, 错误)
 
 
 class RobotViewer(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
+        self.startup = {"导入": IMPORT_SECONDS}   # 启动阶段 → 距开始导入的秒数
 
-        self.robot = URDF.load(URDF_PATH, mesh_dir=os.path.dirname(URDF_PATH))
-        joint_values = {name: 0.0 for name in self.robot.joint_names}
-        self.robot.update_cfg(joint_values)
+        # 启动时只读运动学结构（几毫秒），先显示占位骨架；yourdfpy 和网格在后台线程加载，逐个 link 替换
+        self.robot = load_structure(URDF_PATH)
+        pose = PoseState.from_urdf(self.robot, control_joints)   # 限位取自 URDF
+        # 编辑用 control_joints 顺序；发给机器人的（target_pose.npy、实时同步）按电机下标执行，出口处换成 motor_joints 顺序
+        self._motor_to_pose = np.array([pose.index[name] for name in motor_joints], dtype=np.intp)
 
         hip_joint_names   = {}
         knee_joint_names  = {}
@@ -525,54 +915,9 @@ class RobotViewer(QtWidgets.QMainWindow):
         right_ankle_links = collect_links({"right_ankle_pitch_link", "right_ankle_roll_link"})
         waist_links       = collect_links({"waist_yaw_link", "waist_roll_link", "torso_link", "waist_support_link"})
 
-        # --- 创建所有 link 的 GLMeshItem，并缓存 ---
-        link_items = {}
-        for link_name, link_obj in self.robot.link_map.items():
-            vertices, faces, face_colors, v_offset = [], [], [], 0
-            for vis in link_obj.visuals:
-                geom = vis.geometry
-                try:
-                    if geom.mesh:
-                        mesh_path = os.path.join(os.path.dirname(URDF_PATH), geom.mesh.filename)
-                        tri = trimesh.load(mesh_path, force='mesh')
-                        if geom.mesh.scale:
-                            tri.apply_scale(geom.mesh.scale)
-                    elif geom.box:
-                        tri = trimesh.creation.box(extents=geom.box.size)
-                    elif geom.cylinder:
-                        tri = trimesh.creation.cylinder(radius=geom.cylinder.radius, height=geom.cylinder.length)
-                    elif geom.sphere:
-                        tri = trimesh.creation.icosphere(radius=geom.sphere.radius)
-                    else:
-                        continue
-                    if vis.origin is not None:
-                        tri.apply_transform(vis.origin)
-                except Exception:
-                    continue
-
-                v, f = tri.vertices, tri.faces
-                vertices.append(v)
-                faces.append(f + v_offset)
-                rgba = vis.material.color.rgba if (vis.material and vis.material.color) else (0.7, 0.7, 0.7, 1.0)
-                face_colors.append(np.tile(rgba, (f.shape[0], 1)))
-                v_offset += v.shape[0]
-
-            if not vertices:
-                continue
-            vertices   = np.vstack(vertices)
-            faces      = np.vstack(faces)
-            face_colors= np.vstack(face_colors)
-
-            mesh_item = gl.GLMeshItem(vertexes=vertices, faces=faces, faceColors=face_colors, smooth=False)
-            mesh_item.link_name = link_name
-            T = self.robot.get_transform(link_name, frame_from=None)
-            mesh_item.setTransform(Transform3D(*T.flatten()))
-            mesh_item.setGLOptions('opaque')
-            link_items[link_name] = mesh_item
-
-        # 视图与控件
+        # 视图与控件；link 网格先用占位骨架，见下面的后台加载
         self.view = MyGLViewWidget(
-            self.robot, joint_values,
+            self.robot, pose,
             shoulder_joint_names,
             elbow_joint_names,
             wrist_joint_names,
@@ -580,7 +925,7 @@ class RobotViewer(QtWidgets.QMainWindow):
             knee_joint_names,
             ankle_joint_names,
             waist_joint_names,
-            link_items,
+            {},
             left_hip_links, left_knee_links, left_ankle_links,
             right_hip_links, right_knee_links, right_ankle_links,
             waist_links,
@@ -592,51 +937,567 @@ class RobotViewer(QtWidgets.QMainWindow):
         self.btn_output = QtWidgets.QPushButton("输出当前关节弧度")
         self.btn_output.clicked.connect(self.output_joint_values)
 
+        # 上传目标记在 QSettings 里；上传在后台线程，复用同一条连接
+        self.settings = QtCore.QSettings("unitree_g1", "pose_control")
+        self.edit_target = QtWidgets.QLineEdit(self.settings.value("upload/target", "", type=str))
+        self.edit_target.setPlaceholderText("tcp://机器人IP[:端口] 或 user@host（ssh）；留空只保存到本地")
+        self.edit_target.editingFinished.connect(self.save_upload_target)
+        self.upload_signals = UploadSignals(self)
+        self.upload_signals.progress.connect(self.statusBar().showMessage)
+        self.upload_signals.done.connect(self.on_upload_done)
+        self.uploader = UploadWorker(REMOTE_POSE_DIR, self.upload_signals.progress.emit,
+                                     self.upload_signals.done.emit)
+        self.uploader.start()
+        self.lbl_collision = QtWidgets.QLabel("自碰撞检测准备中 …")
+        export_bar = QtWidgets.QHBoxLayout()
+        export_bar.addWidget(self.btn_output)
+        export_bar.addWidget(QtWidgets.QLabel("上传到："))
+        export_bar.addWidget(self.edit_target, 1)
+        export_bar.addWidget(self.lbl_collision)
+
+        # 实时同步：拖拽时经姿态流（robot_control.py --stream-port）持续发送，限速 + 变化阈值
+        self.mirror = None
+        self.chk_mirror = QtWidgets.QCheckBox("实时同步到机器人")
+        self.chk_mirror.toggled.connect(self.on_mirror_toggled)
+        self.spin_mirror_hz = QtWidgets.QSpinBox()
+        self.spin_mirror_hz.setRange(1, 500)
+        self.spin_mirror_hz.setSuffix(" Hz")
+        self.spin_mirror_hz.setValue(self.settings.value("mirror/max_rate", DEFAULT_MIRROR_HZ, type=int))
+        self.spin_mirror_hz.valueChanged.connect(self.on_mirror_params)
+        self.spin_mirror_thr = QtWidgets.QDoubleSpinBox()
+        self.spin_mirror_thr.setRange(0.0, 0.2)
+        self.spin_mirror_thr.setDecimals(3)
+        self.spin_mirror_thr.setSingleStep(0.001)
+        self.spin_mirror_thr.setSuffix(" rad")
+        self.spin_mirror_thr.setValue(self.settings.value("mirror/threshold", DEFAULT_MIRROR_THRESHOLD, type=float))
+        self.spin_mirror_thr.valueChanged.connect(self.on_mirror_params)
+        self.lbl_mirror = QtWidgets.QLabel()
+        mirror_bar = QtWidgets.QHBoxLayout()
+        mirror_bar.addWidget(self.chk_mirror)
+        mirror_bar.addWidget(QtWidgets.QLabel("频率上限："))
+        mirror_bar.addWidget(self.spin_mirror_hz)
+        mirror_bar.addWidget(QtWidgets.QLabel("变化阈值："))
+        mirror_bar.addWidget(self.spin_mirror_thr)
+        # 机器人实际姿态：订阅 robot_control.py --state-port 的状态流，画成半透明影子并列出各关节误差
+        self.chk_state = QtWidgets.QCheckBox("显示机器人实际姿态")
+        self.chk_state.toggled.connect(self.on_state_toggled)
+        self.chk_ghost_side = QtWidgets.QCheckBox("并排")
+        self.chk_ghost_side.setChecked(self.settings.value("state/side_by_side", True, type=bool))
+        self.chk_ghost_side.toggled.connect(self.on_ghost_side_toggled)
+        mirror_bar.addWidget(self.chk_state)
+        mirror_bar.addWidget(self.chk_ghost_side)
+        mirror_bar.addStretch(1)
+        mirror_bar.addWidget(self.lbl_mirror)
+
+        QtWidgets.QShortcut(QtGui.QKeySequence.Undo, self, self.view.undo)
+        QtWidgets.QShortcut(QtGui.QKeySequence.Redo, self, self.view.redo)
+
+        # LOD 预算与帧耗时
+        self.spin_lod = QtWidgets.QSpinBox()
+        self.spin_lod.setRange(0, 2000000)
+        self.spin_lod.setSingleStep(10000)
+        self.spin_lod.setSpecialValueText("关闭（始终全精度）")
+        self.spin_lod.setValue(DEFAULT_LOD_BUDGET)
+        self.spin_lod.valueChanged.connect(self.on_lod_budget)
+        self.lbl_frame = QtWidgets.QLabel()
+        # 笛卡尔拖拽：拖手/脚时移动末端位置，IK 解整条链
+        self.chk_cartesian = QtWidgets.QCheckBox("拖手/脚时按位置逆解")
+        self.chk_cartesian.toggled.connect(self.on_cartesian_toggled)
+        self.chk_cartesian.setChecked(self.settings.value("drag/cartesian", False, type=bool))
+        lod_bar = QtWidgets.QHBoxLayout()
+        lod_bar.addWidget(self.chk_cartesian)
+        lod_bar.addWidget(QtWidgets.QLabel("交互时三角面预算："))
+        lod_bar.addWidget(self.spin_lod)
+        lod_bar.addStretch(1)
+        lod_bar.addWidget(self.lbl_frame)
+
         main_widget = QtWidgets.QWidget()
         layout = QtWidgets.QVBoxLayout(main_widget)
-        layout.addWidget(self.btn_output)
+        layout.addLayout(export_bar)
+        layout.addLayout(mirror_bar)
+        layout.addLayout(lod_bar)
         layout.addWidget(self.view)
         self.setCentralWidget(main_widget)
 
-        for item in link_items.values():
-            self.view.addItem(item)
+        # 姿态库：后台打开、建 KD 树和查询；拖拽时列出最相似的库内姿态，双击载入
+        self.library = None
+        self.nearest_worker = None
+        self.lib_signals = LibrarySignals(self)
+        self.lib_signals.opened.connect(self.on_library_opened)
+        self.lib_signals.indexed.connect(self.on_library_indexed)
+        self.lib_signals.similar.connect(self.show_similar)
+        self.edit_lib_name = QtWidgets.QLineEdit()
+        self.edit_lib_name.setPlaceholderText("名字（留空自动编号）")
+        self.edit_lib_tags = QtWidgets.QLineEdit()
+        self.edit_lib_tags.setPlaceholderText("标签，逗号分隔")
+        btn_lib_add = QtWidgets.QPushButton("存入姿态库")
+        btn_lib_add.clicked.connect(self.add_to_library)
+        self.list_similar = QtWidgets.QListWidget()
+        self.list_similar.itemDoubleClicked.connect(self.load_from_library)
+        self.lbl_library = QtWidgets.QLabel("姿态库未打开")
+        lib_widget = QtWidgets.QWidget()
+        lib_layout = QtWidgets.QVBoxLayout(lib_widget)
+        lib_layout.addWidget(self.lbl_library)
+        lib_layout.addWidget(self.edit_lib_name)
+        lib_layout.addWidget(self.edit_lib_tags)
+        lib_layout.addWidget(btn_lib_add)
+        lib_layout.addWidget(QtWidgets.QLabel(f"最相似的 {SIMILAR_K} 个（双击载入）："))
+        lib_layout.addWidget(self.list_similar, 1)
+        lib_dock = QtWidgets.QDockWidget("姿态库", self)
+        lib_dock.setWidget(lib_widget)
+        self.addDockWidget(QtCore.Qt.RightDockWidgetArea, lib_dock)
+
+        self.state_receiver = None
+        self.robot_state = None               # 最近画出的 StateFrame
+        self.state_signals = StateSignals(self)
+        self.state_signals.frame.connect(self.view.schedule_update)   # 和拖拽一起按显示帧合并
+        self.lbl_state = QtWidgets.QLabel("未连接")
+        self.lbl_state.setWordWrap(True)
+        self.table_state = QtWidgets.QTableWidget(len(motor_joints), 3)
+        self.table_state.setHorizontalHeaderLabels(["实测", "跟踪误差", "与模型差"])
+        self.table_state.setVerticalHeaderLabels([name.replace("_joint", "") for name in motor_joints])
+        self.table_state.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        for row in range(len(motor_joints)):
+            for col in range(3):
+                self.table_state.setItem(row, col, QtWidgets.QTableWidgetItem(""))
+        self._warn_brush = QtGui.QBrush(QtGui.QColor("red"))
+        self._normal_brush = self.table_state.item(0, 0).foreground()
+        state_widget = QtWidgets.QWidget()
+        state_layout = QtWidgets.QVBoxLayout(state_widget)
+        state_layout.addWidget(self.lbl_state)
+        state_layout.addWidget(self.table_state, 1)
+        state_dock = QtWidgets.QDockWidget("机器人状态", self)
+        state_dock.setWidget(state_widget)
+        self.addDockWidget(QtCore.Qt.RightDockWidgetArea, state_dock)
+        self.tabifyDockWidget(lib_dock, state_dock)
+        lib_dock.raise_()
+        self.view.on_pose_changed = self.on_pose_changed
+        self.open_library(self.settings.value("library/path", DEFAULT_LIBRARY_PATH, type=str))
+
+        # 占位骨架：每个有 visual 的 link 一组方棒，拖拽、悬停在网格到齐前就能用（拾取退回 GL 选择模式）
+        for link_name, mesh in skeleton_meshes(self.view.kin, self.robot.visual_links).items():
+            self.view.replace_link_mesh(link_name, mesh)
+        # 真实网格：首帧画出后再开始后台加载（导入 yourdfpy / trimesh 会抢 GIL），到一个换一个
+        self.lod_meshes = {}                  # link → [原网格, LOD 1, ...]，按到达顺序
+        self.meshes_ready = False
+        self._mesh_thread = None
+        self.mesh_signals = MeshSignals(self)
+        self.mesh_signals.link.connect(self.on_link_mesh)
+        self.mesh_signals.done.connect(self.on_meshes_done)
+        self.view.on_first_frame = self.on_first_frame
+        QtCore.QTimer.singleShot(MESH_LOAD_FALLBACK_MS, self.start_mesh_loader)
+
+        # 自碰撞：拟合球和采样筛选 link 对要几百毫秒，网格到齐后放到后台线程，完成后每次拖拽都检测
+        self.collision_signals = CollisionSignals(self)
+        self.collision_signals.ready.connect(self.on_collision_ready)
+        self.collision_error = None           # 没有网格或构建失败时的原因；None 且模型未到 = 仍在构建
+
+        self._rate_t, self._rate_counts = time.perf_counter(), (0,) * 6
+        self.stats_timer = QtCore.QTimer(self)
+        self.stats_timer.timeout.connect(self.update_frame_label)
+        self.stats_timer.start(250)
 
         # 视角参数
         self.view.opts['distance']  = 2.0
         self.view.opts['azimuth']   = 45
         self.view.opts['elevation'] = 20
+        self.mark_startup("骨架")
+
+    # ---------- 启动与网格加载 ----------
+    def mark_startup(self, stage):
+        t = time.perf_counter() - _T0
+        self.startup[stage] = t
+        print(f"启动：{stage} {t * 1e3:.0f} ms")
+
+    def on_first_frame(self):
+        self.mark_startup("首帧")
+        self.start_mesh_loader()
+
+    def start_mesh_loader(self):
+        if self._mesh_thread is None:
+            self._mesh_thread = threading.Thread(target=self.load_meshes, name="mesh_loader", daemon=True)
+            self._mesh_thread.start()
+
+    def load_meshes(self):
+        """后台线程：导入 yourdfpy / mesh_loader，按 link 读缓存或构建网格，经信号逐个交给 GUI 线程"""
+        try:
+            from yourdfpy import URDF  # 如果用 urdfpy，请改成：from urdfpy import URDF
+            from mesh_loader import MeshCache
+            # 网格由 MeshCache 加载并缓存，这里不让 yourdfpy 再解析一遍 STL
+            robot = URDF.load(URDF_PATH, mesh_dir=os.path.dirname(URDF_PATH), load_meshes=False)
+            cache = MeshCache()
+            for link_name, levels in cache.stream(robot, os.path.dirname(URDF_PATH), lods=True):
+                self.mesh_signals.link.emit(link_name, levels)
+        except (ImportError, OSError, ValueError) as e:
+            self.mesh_signals.done.emit(None, e)
+            return
+        self.mesh_signals.done.emit(cache, None)
+
+    def on_link_mesh(self, link_name, levels):
+        if not self.lod_meshes:
+            self.mark_startup("首个网格")
+        self.lod_meshes[link_name] = levels
+        self.view.replace_link_mesh(link_name, levels[0])
+        self.statusBar().showMessage(f"网格加载中 {len(self.lod_meshes)}/{len(self.robot.visual_links)} …")
+
+    def on_meshes_done(self, cache, error):
+        if error is not None:
+            self.statusBar().showMessage(f"网格加载失败，继续显示占位骨架：{error}")
+            self.lbl_collision.setText("自碰撞检测不可用：没有网格")
+            self.collision_error = "没有网格"
+            self.offer_mirror(self.view.pose.q)
+            return
+        self.mark_startup("全部网格")
+        print(f"网格缓存：命中 {cache.hits}，新建 {cache.misses}（{cache.cache_dir}）")
+        # 没有可用几何的 link 不显示，与一次性加载时一致
+        for link_name in self.robot.visual_links:
+            if link_name not in self.lod_meshes:
+                self.view.remove_link_mesh(link_name)
+        lod_meshes = {name: self.lod_meshes[name] for name in self.robot.visual_links if name in self.lod_meshes}
+        self.lod_meshes = lod_meshes
+        meshes = {name: levels[0] for name, levels in lod_meshes.items()}
+        self.view.set_lod(lod_meshes, self.spin_lod.value())
+        self.view.set_picker(Picker(meshes))
+        self.meshes_ready = True
+        if self.state_receiver is not None:
+            self.show_ghost()   # 影子也从占位骨架换成网格
+        threading.Thread(target=self.build_collision, args=(meshes,), name="self_collision", daemon=True).start()
+        stages = " · ".join(f"{stage} {t * 1e3:.0f} ms" for stage, t in self.startup.items())
+        self.statusBar().showMessage(f"启动：{stages}（网格缓存命中 {cache.hits}，新建 {cache.misses}）")
+
+    def on_cartesian_toggled(self, on):
+        self.view.cartesian = on
+        self.settings.setValue("drag/cartesian", on)
+
+    def on_lod_budget(self, budget):
+        if self.view.lod_meshes:   # 网格到齐前只记在控件里，到齐时按当前值设置
+            self.view.set_lod(self.view.lod_meshes, budget)
+
+    def update_frame_label(self):
+        v = self.view
+        now = time.perf_counter()
+        mirror = self.mirror
+        receiver = self.state_receiver
+        counts = (v.n_events, v.n_flushes, v.n_paints, mirror.stats["sent"] if mirror is not None else 0,
+                  receiver.stats["received"] if receiver is not None else 0,
+                  receiver.stats["taken"] if receiver is not None else 0)
+        dt = now - self._rate_t
+        ev_rate, flush_rate, paint_rate, send_rate, recv_rate, draw_rate = (
+            max(c - p, 0) / dt for c, p in zip(counts, self._rate_counts))
+        self._rate_t, self._rate_counts = now, counts
+        shown = v.lod_level if v._low_active else 0
+        lod = f"，交互时 L{v.lod_level}（{v.lod_faces(v.lod_level)} 面）" if v.lod_level else ""
+        self.lbl_frame.setText(
+            f"事件 {ev_rate:.0f}/s（{v.event_us:.0f} us）· 拾取 {v.pick_us:.0f} us · 更新 {flush_rate:.0f}/s · 重绘 {paint_rate:.0f}/s"
+            f"（{v.frame_ms:.1f} ms）· 当前 L{shown}（{v.lod_faces(shown)} 面）{lod}"
+            f" · 撤销 {len(v.pose.history)} 步（{v.pose.history.nbytes / 1024:.0f} KB）"
+            + (f" · 自碰撞 {v.collision_us:.0f} us" if v.collision is not None else "")
+            + (f" · IK {v.ik_iters} 步 {v.ik_us:.0f} us（误差 {v.ik_err * 1e3:.1f} mm）" if v.ik_us else ""))
+        if v.collision is not None:
+            if v.colliding:
+                pairs = "，".join(f"{a} ↔ {b}" for a, b in v.colliding[:3])
+                more = f" 等 {len(v.colliding)} 处" if len(v.colliding) > 3 else ""
+                self.lbl_collision.setText(f"<font color='red'>自碰撞：{pairs}{more}</font>")
+            else:
+                self.lbl_collision.setText("无自碰撞")
+        if mirror is not None:
+            if mirror.error is not None:
+                self.statusBar().showMessage(f"实时同步失败：{mirror.error}")
+                self.chk_mirror.setChecked(False)
+            elif v.collision is None and self.collision_error is None:
+                self.lbl_mirror.setText("等待自碰撞检测就绪，暂不发送")
+            else:
+                unchecked = f" · 未检查自碰撞（{self.collision_error}）" if v.collision is None else ""
+                self.lbl_mirror.setText(f"发送 {send_rate:.0f}/s · 丢帧 {mirror.dropped} · "
+                                        f"往返 {mirror.rtt_p50() * 1e3:.1f} ms{unchecked}")
+        if receiver is not None:
+            self.refresh_state_panel(recv_rate, draw_rate)
 
     def output_joint_values(self):
-        jv = self.view.joint_values
+        pose = self.view.pose
+        self.view.update_joints()   # 先应用还没刷新的编辑，碰撞结果对应当前姿态
+        if self.view.colliding:
+            pairs = "\n".join(f"  {a} ↔ {b}" for a, b in self.view.colliding)
+            self.statusBar().showMessage("当前姿态自碰撞，未导出")
+            QtWidgets.QMessageBox.warning(self, "自碰撞", f"当前姿态存在自碰撞，未保存也未上传：\n{pairs}")
+            return
+        unchecked = ""
+        if self.view.collision is None:
+            if self.collision_error is None:
+                # 网格 / 碰撞模型还在后台构建：默认不导出，由用户确认
+                answer = QtWidgets.QMessageBox.question(
+                    self, "自碰撞", "自碰撞检测还在准备中，当前姿态未经检查。仍然保存并上传？",
+                    QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No, QtWidgets.QMessageBox.No)
+                if answer != QtWidgets.QMessageBox.Yes:
+                    self.statusBar().showMessage("自碰撞检测准备中，未导出")
+                    return
+                unchecked = "；自碰撞检测尚未就绪，未检查"
+            else:
+                unchecked = f"；自碰撞检测不可用（{self.collision_error}），未检查"
         lines = ["当前控制关节弧度："]
-        for name in control_joints:
-            val = jv.get(name, 0.0)
+        for name, val in zip(pose.names, pose.q.tolist()):
             lines.append(f"  {name}: {val:.4f} rad")
         txt = "\n".join(lines)
         print(txt)
 
-        arr = np.array([jv.get(name, 0.0) for name in control_joints], dtype=np.float32)
-        np.save("target_pose.npy", arr)
+        buf = io.BytesIO()
+        np.save(buf, pose.q[self._motor_to_pose])   # 电机顺序的 float32，机器人端按 G1JointIndex 下标执行
+        data = buf.getvalue()
+        write_atomic("target_pose.npy", data)
 
-        # 远程上传（可选）
-        try:
-            import subprocess
-            ssh_host = input("你自己的机器人ssh主机地址：")
-            remote_path = "~/intern/hang/GUI/target_pose.npy"
-            subprocess.run(["scp", "target_pose.npy", f"{ssh_host}:{remote_path}"], check=True)
-            print("✅ target_pose.npy 已上传到机器人")
-        except Exception as e:
-            print("（提示）未上传远程：", e)
+        # 远程上传（可选）：交给后台线程，结果显示在状态栏
+        target = self.save_upload_target()
+        if target:
+            self.statusBar().showMessage(f"上传到 {target} …{unchecked}")
+            self.uploader.submit(target, "target_pose.npy", data)
+        else:
+            self.statusBar().showMessage(f"已保存到本地 target_pose.npy（未设置上传地址）{unchecked}")
 
         QtWidgets.QMessageBox.information(self, "关节弧度", txt)
 
+    def offer_mirror(self, q):
+        """实时同步只发检查过的姿态：自碰撞的不发，机器人停在上一个安全姿态；碰撞模型还在构建时先不发，
+        就绪后补发当前姿态；没有网格或构建失败时照发，同步标签注明未检查"""
+        if self.mirror is None or self.view.colliding:
+            return
+        if self.view.collision is None and self.collision_error is None:
+            return
+        self.mirror.offer(q[self._motor_to_pose])
+
+    def on_pose_changed(self, q):
+        self.offer_mirror(q)
+        if self.nearest_worker is not None:
+            self.nearest_worker.submit(q)   # 查询线程只保留最新姿态
+
+    def on_mirror_toggled(self, on):
+        if not on:
+            if self.mirror is not None:
+                self.mirror.stop()
+                self.mirror = None
+            return
+        host = self.mirror_host()
+        if not host:
+            self.statusBar().showMessage("实时同步需要先填写机器人地址")
+            self.chk_mirror.setChecked(False)
+            return
+        self.mirror = PoseMirror(host, STREAM_PORT, max_rate=self.spin_mirror_hz.value(),
+                                 threshold=self.spin_mirror_thr.value())
+        self.mirror.start()
+        self.offer_mirror(self.view.pose.q)   # 先同步一次当前姿态
+        if self.view.collision is None and self.collision_error is None:
+            self.statusBar().showMessage(f"实时同步到 {host}:{STREAM_PORT}：自碰撞检测就绪后开始发送")
+        else:
+            self.statusBar().showMessage(f"实时同步到 {host}:{STREAM_PORT}")
+
+    def on_mirror_params(self):
+        self.settings.setValue("mirror/max_rate", self.spin_mirror_hz.value())
+        self.settings.setValue("mirror/threshold", self.spin_mirror_thr.value())
+        if self.mirror is not None:
+            self.mirror.max_rate = self.spin_mirror_hz.value()
+            self.mirror.threshold = self.spin_mirror_thr.value()
+
+    # ---------- 机器人实际姿态 ----------
+    def on_state_toggled(self, on):
+        if not on:
+            if self.state_receiver is not None:
+                self.state_receiver.stop()
+                self.state_receiver = None
+            self.view.ghost_source = None
+            self.view.set_ghost(None)
+            self.lbl_state.setText("未连接")
+            return
+        host = self.mirror_host()
+        if not host:
+            self.statusBar().showMessage("显示机器人实际姿态需要先填写机器人地址")
+            self.chk_state.setChecked(False)
+            return
+        self.robot_state = None
+        self.state_receiver = StateReceiver(host, STATE_PORT, on_frame=self.state_signals.frame.emit)
+        self.state_receiver.start()
+        self.view.ghost_source = self.take_robot_state
+        self.show_ghost()
+        self.lbl_state.setText(f"等待 {host}:{STATE_PORT} 的状态流（robot_control.py --state-port）…")
+
+    def on_ghost_side_toggled(self, on):
+        self.settings.setValue("state/side_by_side", on)
+        if self.state_receiver is not None:
+            self.show_ghost()
+
+    def show_ghost(self):
+        """按当前网格重建影子：网格到齐前用占位骨架，之后用 GHOST_LOD 级简化网格"""
+        if self.meshes_ready:
+            meshes = {name: levels[min(GHOST_LOD, len(levels) - 1)] for name, levels in self.lod_meshes.items()}
+        else:
+            meshes = skeleton_meshes(self.view.kin, self.robot.visual_links)
+        offset = (0.0, GHOST_SIDE_OFFSET, 0.0) if self.chk_ghost_side.isChecked() else (0.0, 0.0, 0.0)
+        self.view.set_ghost(meshes, offset)
+
+    def take_robot_state(self):
+        """view._flush_joints 每个显示帧调用一次：取走最新一帧，其间到达的帧已在接收线程里合并"""
+        frame = self.state_receiver.take()
+        if frame is None:
+            return None
+        self.robot_state = frame
+        return frame.q
+
+    def refresh_state_panel(self, recv_rate, draw_rate):
+        r = self.state_receiver
+        if r.error is not None:
+            self.statusBar().showMessage(f"机器人状态流失败：{r.error}")
+            self.chk_state.setChecked(False)
+            return
+        frame = self.robot_state
+        if frame is None:
+            return
+        silent = time.perf_counter() - r.last_recv
+        if silent > STATE_TIMEOUT:
+            self.lbl_state.setText(f"<font color='red'>状态流中断：{silent:.0f} s 未收到</font>")
+            return
+        track = frame.q_cmd - frame.q                              # 机器人端：指令 - 实测
+        diff = self.view.pose.q[self._motor_to_pose] - frame.q     # 模型（按关节名对应）- 实测
+        for row, values in enumerate(zip(frame.q.tolist(), track.tolist(), diff.tolist())):
+            for col, value in enumerate(values):
+                item = self.table_state.item(row, col)
+                item.setText(f"{value:+.3f}")
+                if col:
+                    item.setForeground(self._warn_brush if abs(value) > STATE_ERROR_WARN else self._normal_brush)
+        worst = int(np.argmax(np.abs(track)))
+        st = r.stats
+        self.lbl_state.setText(
+            f"接收 {recv_rate:.0f}/s · 画出 {draw_rate:.0f}/s · 合并 {st['coalesced']} · 丢失 {st['lost']}"
+            f" · 机器人端抽取 {frame.age * 1e3:.1f} ms · 最大跟踪误差 {motor_joints[worst]} {abs(track[worst]):.3f} rad")
+
+    def mirror_host(self):
+        """从上传地址里取机器人主机名：tcp://host[:port] 或 [user@]host"""
+        target = self.save_upload_target()
+        if target.startswith("tcp://"):
+            return target[len("tcp://"):].partition(":")[0]
+        return target.rpartition("@")[2]
+
+    # ---------- 自碰撞 ----------
+    def build_collision(self, meshes):
+        t0 = time.perf_counter()
+        try:
+            model = SelfCollision(self.robot, meshes)
+        except (ValueError, np.linalg.LinAlgError) as e:
+            self.collision_signals.ready.emit(None, e, 0.0)
+            return
+        self.collision_signals.ready.emit(model, None, time.perf_counter() - t0)
+
+    def on_collision_ready(self, model, error, seconds):
+        if error is not None:
+            self.lbl_collision.setText(f"自碰撞检测不可用：{error}")
+            self.collision_error = str(error)
+            self.offer_mirror(self.view.pose.q)
+            return
+        self.mark_startup("自碰撞")
+        print(f"自碰撞：{len(model.link_names)} 个 link → {len(model.radii)} 个球，"
+              f"检测 {len(model.pairs)} 对 link，构建 {seconds * 1e3:.0f} ms")
+        self.view.set_collision(model)
+        self.offer_mirror(self.view.pose.q)   # 等待中的实时同步从当前姿态开始
+
+    # ---------- 姿态库 ----------
+    def open_library(self, path):
+        """打开（或新建）姿态库；大库解析索引要几百毫秒，放到后台线程"""
+        def work():
+            try:
+                lib = PoseLibrary(path, control_joints)
+            except (OSError, ValueError) as e:
+                self.lib_signals.opened.emit(None, e)
+                return
+            self.lib_signals.opened.emit(lib, None)
+
+        self.lbl_library.setText(f"正在打开姿态库 {path} …")
+        threading.Thread(target=work, name="pose_library_open", daemon=True).start()
+
+    def on_library_opened(self, lib, error):
+        if error is not None:
+            self.lbl_library.setText(f"姿态库打开失败：{error}")
+            return
+        self.library = lib
+        self.settings.setValue("library/path", lib.path)
+        self.nearest_worker = NearestWorker(lib, SIMILAR_K, self.lib_signals.similar.emit,
+                                            self.lib_signals.indexed.emit)
+        self.nearest_worker.start()
+        if lib.index_stale:
+            self.lbl_library.setText(f"姿态库 {len(lib)} 条，正在建索引 …")
+        self.nearest_worker.submit(self.view.pose.q)
+
+    def on_library_indexed(self, seconds):
+        print(f"姿态库索引：{self.library.n_indexed} 条，{seconds * 1e3:.0f} ms")
+
+    def show_similar(self, dist, idx, seconds):
+        lib = self.library
+        self.list_similar.clear()
+        for d, i in zip(dist.tolist(), idx.tolist()):
+            tags = f"  [{lib.tags[i]}]" if lib.tags[i] else ""
+            item = QtWidgets.QListWidgetItem(f"{d:.3f}  {lib.names[i]}{tags}")
+            item.setData(QtCore.Qt.UserRole, i)
+            self.list_similar.addItem(item)
+        self.lbl_library.setText(f"姿态库 {len(lib)} 条 · 查询 {seconds * 1e3:.1f} ms")
+
+    def add_to_library(self):
+        lib = self.library
+        if lib is None:
+            self.statusBar().showMessage("姿态库未打开")
+            return
+        name = self.edit_lib_name.text().strip() or None
+        tags = [t.strip() for t in self.edit_lib_tags.text().split(",") if t.strip()]
+        try:
+            i = lib.append(self.view.pose.q, name, tags)
+        except ValueError as e:
+            self.statusBar().showMessage(f"存入姿态库失败：{e}")
+            return
+        self.edit_lib_name.clear()
+        self.statusBar().showMessage(f"已存入姿态库：#{i} {lib.names[i]}")
+        self.nearest_worker.submit(self.view.pose.q)
+
+    def load_from_library(self, item):
+        i = item.data(QtCore.Qt.UserRole)
+        self.view.pose.set(self.library.get(i))   # 记为一步，可撤销
+        self.view.schedule_update()
+        self.statusBar().showMessage(f"已载入 #{i} {self.library.names[i]}")
+
+    def save_upload_target(self):
+        target = self.edit_target.text().strip()
+        self.settings.setValue("upload/target", target)
+        return target
+
+    def on_upload_done(self, result, error):
+        if error is not None:
+            print("（提示）未上传远程：", error)
+            self.statusBar().showMessage(f"上传失败：{error}")
+            return
+        detail = "复用连接" if result.reused else "新建连接"
+        if np.isfinite(result.write_s):
+            detail += f"，机器人端写入 {result.write_s * 1e3:.1f} ms"
+        print(f"✅ target_pose.npy 已上传到机器人（{result.latency * 1e3:.1f} ms）")
+        self.statusBar().showMessage(f"✅ 已上传 target_pose.npy：{result.latency * 1e3:.1f} ms（{detail}）")
+
+    def closeEvent(self, ev):
+        self.uploader.stop()
+        self.chk_mirror.setChecked(False)
+        self.chk_state.setChecked(False)
+        if self.nearest_worker is not None:
+            self.nearest_worker.stop()
+        super().closeEvent(ev)
+
 
 def run_ui():
+    """--profile-startup：打印各启动阶段耗时，网格和自碰撞模型就绪后自动退出"""
+    profile = "--profile-startup" in sys.argv
     app = QtWidgets.QApplication(sys.argv)
     viewer = RobotViewer()
+    if profile:
+        def quit_if_failed(cache, error):
+            if error is not None:
+                app.quit()
+        viewer.mesh_signals.done.connect(quit_if_failed)
+        viewer.collision_signals.ready.connect(app.quit)
     viewer.setWindowTitle("G1 控制")
     viewer.resize(1000, 800)
     viewer.show()
+    viewer.mark_startup("窗口")
     return app.exec_()
 
 